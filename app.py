@@ -1,23 +1,57 @@
+import os
 from flask import Flask, render_template, request, redirect, url_for
 from extensions import csrf
-from config import DevelopmentConfig
+from config import CONFIGURACIONES
 from extensions import db
+from services.tickets import cola_tickets
+from services import almacen_tickets, replica
+from services.carritos import carritos
+from services.metricas import metricas_sql, metricas_request, metricas_pool
+from services.esquema import actualizar_esquema_command
+from services.reservas import purgar_reservas_command
+from services.recetas import migrar_recetas_command
+from services.resumen_ventas import reconstruir_resumen_command
+from services.caja import reconstruir_caja_command
+from services.indices import revisar_indices_command
+from services.datos_sinteticos import generar_datos_command
+from services.precios import cargar_precios_command
+from services.stock import conciliar_existencias_command
+from services.alertas import alertas_resumen_command
 from controller.controller_administracion import admin_bp
 from controller.controller_venta import venta_bp
 from controller.portal_controller import portal_cliente_bp
 from controller.controller_galletas import galletas_bp
 from controller.controller_produccion import produccion_bp
+from controller.controller_dashboard import dashboard_bp
 
 app = Flask(__name__)
-app.config.from_object(DevelopmentConfig)
+app.config.from_object(CONFIGURACIONES[os.getenv('APP_CONFIG', 'development')])
 db.init_app(app)
 csrf.init_app(app)
+almacen_tickets.init_app(app)
+replica.init_app(app)
+cola_tickets.init_app(app)
+carritos.init_app(app)
+metricas_sql.init_app(app)
+metricas_request.init_app(app)
+metricas_pool.init_app(app)
+app.cli.add_command(actualizar_esquema_command)
+app.cli.add_command(purgar_reservas_command)
+app.cli.add_command(migrar_recetas_command)
+app.cli.add_command(reconstruir_resumen_command)
+app.cli.add_command(reconstruir_caja_command)
+app.cli.add_command(revisar_indices_command)
+app.cli.add_command(generar_datos_command)
+app.cli.add_command(cargar_precios_command)
+app.cli.add_command(conciliar_existencias_command)
+app.cli.add_command(alertas_resumen_command)
 
 app.register_blueprint(admin_bp, url_prefix='/administracion')
 app.register_blueprint(venta_bp, url_prefix='/venta')
 app.register_blueprint(produccion_bp, url_prefix='/produccion')
 app.register_blueprint(galletas_bp, url_prefix='/galletas')
 app.register_blueprint(portal_cliente_bp)
+app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
 
 @app.route("/administrador")
 def proveedores():
@@ -0,0 +1,265 @@
+"""
+Pruebas de carga de los flujos de venta, pedidos y producción.
+
+Crea una base nueva (SQLite temporal o la de --db), la llena con el generador de
+datos sintéticos (services/datos_sinteticos.py) y ejecuta cada escenario con varios
+usuarios simulados en hilos, cada uno con su propio cliente de pruebas de Flask
+(sin servidor HTTP). Reporta operaciones por segundo, percentiles de latencia y
+consultas SQL por operación, y los compara contra el archivo de línea base.
+
+    python -m benchmarks.correr                     # chica, 4 usuarios x 50 operaciones
+    python -m benchmarks.correr --guardar-base      # Actualiza benchmarks/linea_base.json (peor de 3 corridas)
+
+La línea base se guarda por escala, usuarios y operaciones. Regresa código 1 si
+algún escenario empeora más que la tolerancia o si no hay línea base para comparar.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+LINEA_BASE = os.path.join(os.path.dirname(__file__), 'linea_base.json')
+
+
+def punto_de_venta(cliente, datos, rng):
+    """Agregar una galleta al carrito del punto de venta (lote automático) y cerrar la venta."""
+    respuesta = cliente.post('/venta/registrar', data={
+        'tipo_venta': '1',
+        'tipo_galleta': rng.choice(datos['galletas']),
+        'lote': 'fefo',
+        'cantidad': rng.randint(1, 12)
+    })
+    if respuesta.status_code != 302:
+        return False
+    respuesta = cliente.post('/venta/finalizar')
+    return respuesta.status_code == 302 and 'registrar' not in respuesta.location
+
+
+def pedido_portal(cliente, datos, rng):
+    """Agregar dos galletas al carrito del portal y confirmar el pedido."""
+    for galleta in rng.sample(datos['galletas'], 2):
+        cliente.post('/portal/portal-cliente', data={
+            'action': 'agregar', 'galleta_id': galleta, 'cantidad': rng.randint(1, 20)})
+    respuesta = cliente.post('/portal/confirmar-pedido')
+    return respuesta.status_code == 302
+
+
+def cobrar_pedido(cliente, datos, rng):
+    """Cobrar uno de los pedidos pendientes (cada pedido se cobra una sola vez)."""
+    try:
+        id_orden = datos['ordenes_pendientes'].pop()
+    except IndexError:
+        return False
+    respuesta = cliente.post(f'/venta/cobrar/{id_orden}')
+    # Si no se pudo cobrar regresa a la lista de pedidos
+    return respuesta.status_code == 302 and 'cobrar-pedido' not in respuesta.location
+
+
+def produccion(cliente, datos, rng):
+    """Registrar un lote de producción; descuenta los insumos de la receta."""
+    from datetime import date
+    hoy = date.today().isoformat()
+    respuesta = cliente.post('/produccion/', data={
+        'galleta_id': rng.choice(datos['galletas_unidad']),
+        'cantidad': 50,
+        'fechaProduccion': hoy,
+        'fechaCaducidad': hoy,
+        'costo': '225.00',
+        'existencia': 50
+    })
+    return respuesta.status_code == 302
+
+
+ESCENARIOS = {
+    'punto_de_venta': punto_de_venta,
+    'pedido_portal': pedido_portal,
+    'cobrar_pedido': cobrar_pedido,
+    'produccion': produccion,
+}
+
+
+def preparar_app(url_db):
+    """Importa la aplicación apuntando a la base de los benchmarks."""
+    os.environ['DATABASE_URL'] = url_db
+    sys.path.insert(0, RAIZ)
+    from app import app
+    app.config.update(TESTING=False, WTF_CSRF_ENABLED=False, SECRET_KEY='benchmarks')
+    return app
+
+
+def ejecutar(app, nombre, datos, usuarios, operaciones, semilla):
+    """Corre un escenario con `usuarios` hilos de `operaciones` cada uno y regresa sus métricas."""
+    from services.metricas import Histograma, metricas_sql
+
+    escenario = ESCENARIOS[nombre]
+    histograma = Histograma()
+    errores = []
+    lock = threading.Lock()
+    metricas_sql.reiniciar()
+
+    def usuario(numero):
+        rng = random.Random(semilla * 1000 + numero)
+        cliente = app.test_client()
+        for _ in range(operaciones):
+            inicio = time.perf_counter()
+            try:
+                exito = escenario(cliente, datos, rng)
+            except Exception as e:  # Un error de un usuario no detiene la prueba
+                exito = False
+                logging.getLogger(__name__).warning("Error en %s: %s", nombre, e)
+            segundos = time.perf_counter() - inicio
+            with lock:
+                histograma.registrar(segundos)
+                if not exito:
+                    errores.append(segundos)
+
+    hilos = [threading.Thread(target=usuario, args=(n,)) for n in range(usuarios)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    with metricas_sql.lock:
+        consultas = sum(total['consultas'] for total in metricas_sql.totales.values())
+    return {
+        'operaciones': histograma.cuenta,
+        'errores': len(errores),
+        'por_segundo': round(histograma.cuenta / duracion, 2),
+        'p50_ms': round(histograma.percentil(50) * 1000, 1),
+        'p95_ms': round(histograma.percentil(95) * 1000, 1),
+        'p99_ms': round(histograma.percentil(99) * 1000, 1),
+        'consultas_por_operacion': round(consultas / max(histograma.cuenta, 1), 1),
+    }
+
+
+def comparar(resultados, base, tolerancia):
+    """Lista de regresiones contra la línea base de la misma escala."""
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            continue
+        if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} -> {actual['p95_ms']} ms")
+        if actual['por_segundo'] < anterior['por_segundo'] * (1 - tolerancia):
+            regresiones.append(f"{nombre}: {anterior['por_segundo']} -> {actual['por_segundo']} operaciones/s")
+        # Las consultas no dependen de la máquina, se comparan casi exactas
+        if actual['consultas_por_operacion'] > anterior['consultas_por_operacion'] * 1.1 + 0.5:
+            regresiones.append(f"{nombre}: {anterior['consultas_por_operacion']} -> "
+                               f"{actual['consultas_por_operacion']} consultas por operación")
+        if actual['errores'] > anterior['errores']:
+            regresiones.append(f"{nombre}: {anterior['errores']} -> {actual['errores']} errores")
+    return regresiones
+
+
+def envolvente(corridas):
+    """Peor resultado de cada métrica entre varias corridas; la línea base no depende de una corrida con suerte."""
+    peor = {}
+    for nombre in corridas[0]:
+        medidas = [corrida[nombre] for corrida in corridas]
+        peor[nombre] = {
+            'operaciones': medidas[0]['operaciones'],
+            'errores': max(m['errores'] for m in medidas),
+            'por_segundo': min(m['por_segundo'] for m in medidas),
+            'p50_ms': max(m['p50_ms'] for m in medidas),
+            'p95_ms': max(m['p95_ms'] for m in medidas),
+            'p99_ms': max(m['p99_ms'] for m in medidas),
+            'consultas_por_operacion': max(m['consultas_por_operacion'] for m in medidas),
+        }
+    return peor
+
+
+def medir(app, args):
+    """Vuelve a crear la base con el generador y corre todos los escenarios una vez."""
+    from extensions import db
+    from services import alertas, catalogo, recetas
+    from services.datos_sinteticos import generar
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        catalogo.limpiar()
+        recetas.invalidar()
+        alertas.limpiar()
+        inicio = time.perf_counter()
+        datos = generar(args.escala, args.semilla)
+        db.session.commit()
+        print(f"Datos '{args.escala}' generados en {time.perf_counter() - inicio:.1f} s")
+        db.session.remove()
+
+    resultados = {}
+    for nombre in args.escenarios.split(','):
+        resultados[nombre] = ejecutar(app, nombre, datos, args.usuarios, args.operaciones, args.semilla)
+        r = resultados[nombre]
+        print(f"{nombre:16} {r['operaciones']:6} ops {r['errores']:4} errores {r['por_segundo']:8} ops/s  "
+              f"p50 {r['p50_ms']:7} ms  p95 {r['p95_ms']:7} ms  p99 {r['p99_ms']:7} ms  "
+              f"{r['consultas_por_operacion']:6} consultas/op")
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', default='chica', help='Escala del generador: chica, mediana o grande')
+    parser.add_argument('--usuarios', type=int, default=4)
+    parser.add_argument('--operaciones', type=int, default=50, help='Operaciones por usuario y escenario')
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--db', help='URL de una base vacía; por omisión un SQLite temporal')
+    parser.add_argument('--base', default=LINEA_BASE)
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help='Margen para tiempos y throughput; las cubetas del histograma miden 19%%')
+    parser.add_argument('--guardar-base', action='store_true')
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help='Corridas con --guardar-base; se guarda el peor valor de cada métrica')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    warnings.simplefilter('ignore')  # Avisos de configuración de los modelos, no del benchmark
+    temporal = None
+    if not args.db:
+        descriptor, temporal = tempfile.mkstemp(suffix='.db')
+        os.close(descriptor)
+    app = preparar_app(args.db or f'sqlite:///{temporal}')
+
+    try:
+        corridas = [medir(app, args) for _ in range(args.repeticiones if args.guardar_base else 1)]
+    finally:
+        # Esperar los tickets que todavía se generan en segundo plano antes de borrar la base
+        from services.tickets import cola_tickets
+        cola_tickets.executor.shutdown(wait=True)
+        if temporal:
+            os.unlink(temporal)
+
+    bases = {}
+    if os.path.exists(args.base):
+        with open(args.base) as archivo:
+            bases = json.load(archivo)
+    clave = f"{args.escala}-{args.usuarios}x{args.operaciones}"
+
+    if args.guardar_base:
+        bases[clave] = envolvente(corridas)
+        with open(args.base, 'w') as archivo:
+            json.dump(bases, archivo, indent=2, sort_keys=True)
+        print(f"Línea base '{clave}' guardada en {args.base} (peor de {len(corridas)} corridas)")
+        return 0
+
+    if clave not in bases:
+        print(f"No hay línea base '{clave}'; use --guardar-base para crearla")
+        return 1
+    regresiones = comparar(corridas[0], bases[clave], args.tolerancia)
+    for regresion in regresiones:
+        print(f"REGRESIÓN {regresion}")
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
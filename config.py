@@ -3,11 +3,89 @@ import os
 
 load_dotenv()
 
+
+def opciones_motor(uri):
+    """
+    Opciones del engine para MySQL/IRIS en producción, configurables por variables de entorno.
+    pool_pre_ping y pool_recycle evitan usar conexiones que el servidor cerró por inactividad
+    (wait_timeout de MySQL); SQLite usa sus propios pools y se deja con los valores por omisión.
+    """
+    from services.metricas import PoolMedido
+
+    if not uri or uri.startswith('sqlite'):
+        return {}
+    opciones = {
+        'poolclass': PoolMedido,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Segundos esperando una conexión libre
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # Menor al wait_timeout del servidor
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        # LIFO reutiliza las conexiones más recientes; las sobrantes se reciclan después de un pico
+        'pool_use_lifo': os.getenv('DB_POOL_LIFO', 'true').lower() == 'true',
+    }
+    if uri.startswith('mysql'):
+        opciones['connect_args'] = {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            'read_timeout': int(os.getenv('DB_READ_TIMEOUT', 30)),
+            'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', 30)),
+        }
+    return opciones
+
+
 class Config(object):
     SECRET_KEY = os.getenv('SECRET_KEY')
     SESSION_COOKIE_SECRET = True
+    WKHTMLTOPDF_PATH = os.getenv('WKHTMLTOPDF_PATH', r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
+    TICKET_WORKERS = int(os.getenv('TICKET_WORKERS', 2))
+    TICKETS_ALMACEN = os.getenv('TICKETS_ALMACEN', 'local')
+    TICKETS_DIR = os.getenv('TICKETS_DIR')
+    TICKETS_GZIP = os.getenv('TICKETS_GZIP', 'false').lower() == 'true'
+    VENTAS_POR_PAGINA = int(os.getenv('VENTAS_POR_PAGINA', 50))
+    CORTES_POR_PAGINA = int(os.getenv('CORTES_POR_PAGINA', 20))
+    PEDIDOS_POR_PAGINA = int(os.getenv('PEDIDOS_POR_PAGINA', 20))
+    CARRITOS_BACKEND = os.getenv('CARRITOS_BACKEND', 'memoria')  # memoria (un solo worker) | sqlite | redis
+    CARRITOS_TTL = int(os.getenv('CARRITOS_TTL', 4 * 60 * 60))
+    CARRITOS_SQLITE_PATH = os.getenv('CARRITOS_SQLITE_PATH')
+    CARRITOS_REDIS_URL = os.getenv('CARRITOS_REDIS_URL', 'redis://localhost:6379/0')
+    RESERVAS_TTL = int(os.getenv('RESERVAS_TTL', 30))  # minutos
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 60))  # segundos
+    METRICAS_SQL = os.getenv('METRICAS_SQL', 'true').lower() == 'true'
+    SQL_LENTA_MS = float(os.getenv('SQL_LENTA_MS', 200))  # Consultas más lentas se registran en el log
+    SQL_LENTAS_GUARDADAS = int(os.getenv('SQL_LENTAS_GUARDADAS', 20))
+    METRICAS_REQUEST = os.getenv('METRICAS_REQUEST', 'true').lower() == 'true'
+    METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')  # Sin token /_metrics solo responde a peticiones locales
+    PERFILADOR_MUESTREO = int(os.getenv('PERFILADOR_MUESTREO', 0))  # Perfilar 1 de cada N requests (0 = nunca)
+    PERFILADOR_HEADER = os.getenv('PERFILADOR_HEADER', 'false').lower() == 'true'  # Permitir X-Perfilar: 1
+    PERFILADOR_DIR = os.getenv('PERFILADOR_DIR')  # Por omisión instance/perfiles
+    PERFILADOR_MIN_MS = float(os.getenv('PERFILADOR_MIN_MS', 0))
+    PERFILADOR_MAXIMO = int(os.getenv('PERFILADOR_MAXIMO', 20))  # Perfiles guardados (los más lentos)
+    REPLICA_PEGAJOSA = float(os.getenv('REPLICA_PEGAJOSA', 5))  # Segundos leyendo de la principal tras escribir
+    CATALOGO_REVISION = float(os.getenv('CATALOGO_REVISION', 2))  # Segundos entre revisiones de la generación
+    ALERTA_EXISTENCIA_MINIMA = int(os.getenv('ALERTA_EXISTENCIA_MINIMA', 30))  # Umbral de galletas sin umbral propio
+    ALERTA_DIAS_CADUCIDAD = int(os.getenv('ALERTA_DIAS_CADUCIDAD', 3))
+    ALERTAS_CACHE_TTL = int(os.getenv('ALERTAS_CACHE_TTL', 300))  # segundos
+    PRODUCCION_HISTORIAL_DIAS = int(os.getenv('PRODUCCION_HISTORIAL_DIAS', 30))  # Lotes agotados que se siguen listando
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Réplica de solo lectura para reportes y catálogos (opcional)
+    SQLALCHEMY_BINDS = {'replica': os.getenv('DATABASE_REPLICA_URL')} if os.getenv('DATABASE_REPLICA_URL') else {}
+
+class ProductionConfig(Config):
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_motor(SQLALCHEMY_DATABASE_URI)
+    # gunicorn corre varios workers: los carritos en memoria no se verían entre ellos
+    CARRITOS_BACKEND = os.getenv('CARRITOS_BACKEND', 'sqlite')
+    SQLALCHEMY_BINDS = {
+        'replica': {'url': os.getenv('DATABASE_REPLICA_URL'), **opciones_motor(os.getenv('DATABASE_REPLICA_URL'))}
+    } if os.getenv('DATABASE_REPLICA_URL') else {}
+
+CONFIGURACIONES = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
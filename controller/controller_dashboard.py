@@ -0,0 +1,86 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from model import dashboard_model
+from services.replica import solo_lectura
+
+dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def leer_fecha(nombre, por_omision=None):
+    valor = request.args.get(nombre)
+    if not valor:
+        return por_omision
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise ParametroInvalido(f"Fecha inválida en '{nombre}', use AAAA-MM-DD")
+
+
+def leer_rango(dias_por_omision=None):
+    hasta = leer_fecha('hasta')
+    desde_omision = None
+    if dias_por_omision is not None:
+        desde_omision = (hasta or datetime.now().date()) - timedelta(days=dias_por_omision)
+    desde = leer_fecha('desde', desde_omision)
+    if desde and hasta and desde > hasta:
+        raise ParametroInvalido("'desde' no puede ser posterior a 'hasta'")
+    return desde, hasta
+
+
+def respuesta_condicional(datos, actualizado):
+    """
+    Respuesta JSON con ETag y Last-Modified; si el navegador ya tiene esa versión
+    regresa 304 sin cuerpo.
+    """
+    respuesta = jsonify(datos)
+    respuesta.add_etag()
+    if actualizado:
+        respuesta.last_modified = actualizado
+    respuesta.cache_control.no_cache = True  # Siempre revalidar, pero sin volver a descargar
+    return respuesta.make_conditional(request)
+
+
+@dashboard_bp.errorhandler(ParametroInvalido)
+def parametro_invalido(error):
+    return jsonify({"error": str(error)}), 400
+
+
+@dashboard_bp.route('/ventas')
+@solo_lectura
+def ventas():
+    desde, hasta = leer_rango(dias_por_omision=7)
+    granularidad = request.args.get('granularidad', 'dia')
+    if granularidad not in dashboard_model.GRANULARIDADES:
+        raise ParametroInvalido(f"Granularidad inválida, use: {', '.join(dashboard_model.GRANULARIDADES)}")
+
+    periodos, totales, cantidades, actualizado = dashboard_model.ventas_por_periodo(desde, hasta, granularidad)
+    return respuesta_condicional({
+        "granularidad": granularidad,
+        "periodos": periodos,
+        "totales": totales,
+        "cantidades": cantidades
+    }, actualizado)
+
+
+@dashboard_bp.route('/productos')
+@solo_lectura
+def productos():
+    desde, hasta = leer_rango()
+    limite = request.args.get('limite', 5, type=int)
+    if not 1 <= limite <= 50:
+        raise ParametroInvalido("El límite debe estar entre 1 y 50")
+
+    nombres, cantidades, actualizado = dashboard_model.productos_mas_vendidos(desde, hasta, limite)
+    return respuesta_condicional({"nombres": nombres, "cantidades": cantidades}, actualizado)
+
+
+@dashboard_bp.route('/presentaciones')
+@solo_lectura
+def presentaciones():
+    desde, hasta = leer_rango()
+    nombres, cantidades, actualizado = dashboard_model.presentaciones_mas_vendidas(desde, hasta)
+    return respuesta_condicional({"nombres": nombres, "cantidades": cantidades}, actualizado)
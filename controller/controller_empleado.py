@@ -204,7 +204,6 @@ def eliminar_empleado():
             except Exception as e:
                 db.session.rollback()
                 flash('Error al eliminar el empleado.', 'danger')
-                print(f"Error: {e}")
         else:
             flash('Empleado no encontrado.', 'danger')
 
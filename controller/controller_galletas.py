@@ -5,22 +5,17 @@ from model.lote_galleta import LoteGalletas
 from model.merma_galletas import MermaGalletas
 from model.receta import Receta
 from forms.galleta_forms import MermaGalletaForm
-from sqlalchemy import func
+from services import catalogo, precios, stock
 
 galletas_bp = Blueprint('galletas', __name__)
 
 
 def obtener_galletas_unidad_con_existencia():
-    subq = db.session.query(
-        LoteGalletas.galleta_id,
-        func.sum(LoteGalletas.existencia).label("total")
-    ).group_by(LoteGalletas.galleta_id).subquery()
-
+    # Galleta.existencia es la suma de sus lotes (la mantiene services/stock.py)
     return db.session.query(Galleta)\
         .join(TipoGalleta, Galleta.tipo_galleta_id == TipoGalleta.id_tipo_galleta)\
-        .join(subq, Galleta.id_galleta == subq.c.galleta_id)\
         .filter(TipoGalleta.nombre == "Unidad")\
-        .filter(subq.c.total > 0)\
+        .filter(Galleta.existencia > 0)\
         .all()
 
 
@@ -36,51 +31,36 @@ def galletas():
         mostrar_modal = True
 
     # Cargar recetas activas
-    recetas = Receta.query.filter_by(estatus=1).all()
-    nueva_form.receta_id.choices = [(r.idReceta, r.nombreReceta) for r in recetas]
+    nueva_form.receta_id.choices = [(r['idReceta'], r['nombreReceta']) for r in catalogo.recetas()]
 
     # Galletas tipo Unidad con existencia (para el modal)
     galletas_con_existencia = obtener_galletas_unidad_con_existencia()
     merma_form.galleta_id.choices = [(g.id_galleta, g.galleta) for g in galletas_con_existencia]
 
-    # Subconsulta para tabla de presentaciones
-    subquery = db.session.query(
-        LoteGalletas.galleta_id,
-        func.sum(LoteGalletas.existencia).label("total_existencia")
-    ).group_by(LoteGalletas.galleta_id).subquery()
-
+    # Existencia de cada galleta Unidad para la tabla de presentaciones
     unidad_base = db.session.query(
         Galleta.id_galleta,
         Galleta.galleta.label("nombre_galleta"),
-        TipoGalleta.costo,
-        func.coalesce(subquery.c.total_existencia, 0).label("existencia")
+        Galleta.existencia
     ).join(TipoGalleta, Galleta.tipo_galleta_id == TipoGalleta.id_tipo_galleta)\
-     .outerjoin(subquery, Galleta.id_galleta == subquery.c.galleta_id)\
      .filter(TipoGalleta.nombre == "Unidad").all()
 
-    galletas_unidad = []
-    galletas_caja_kilo = []
-    galletas_caja_medio_kilo = []
+    # Precio y piezas por empaque salen de la lista de precios compilada en el catálogo
+    tablas = {'unidad': [], 'caja de kilo': [], 'caja de 700 gramos': []}
 
     for g in unidad_base:
-        galletas_unidad.append({
-            'nombre_galleta': g.nombre_galleta,
-            'tipo_empaquetado': 'Unidad',
-            'costo': g.costo,
-            'existencia': g.existencia
-        })
-        galletas_caja_kilo.append({
-            'nombre_galleta': g.nombre_galleta,
-            'tipo_empaquetado': 'Caja de Kilo',
-            'costo': 230.00,
-            'existencia': g.existencia // 25
-        })
-        galletas_caja_medio_kilo.append({
-            'nombre_galleta': g.nombre_galleta,
-            'tipo_empaquetado': 'Caja de 700 gramos',
-            'costo': 160.00,
-            'existencia': g.existencia // 20
-        })
+        for presentacion in catalogo.presentaciones(g.id_galleta):
+            if presentacion['clave'] in tablas:
+                tablas[presentacion['clave']].append({
+                    'nombre_galleta': g.nombre_galleta,
+                    'tipo_empaquetado': presentacion['etiqueta'],
+                    'costo': presentacion['precio'],
+                    'existencia': g.existencia // presentacion['unidades'] if presentacion['unidades'] > 0 else 0
+                })
+
+    galletas_unidad = tablas['unidad']
+    galletas_caja_kilo = tablas['caja de kilo']
+    galletas_caja_medio_kilo = tablas['caja de 700 gramos']
 
     return render_template(
         "galleta/galletas.html",
@@ -99,13 +79,14 @@ def galletas():
 def agregar_galleta():
     from forms.galleta_forms import NuevaGalletaForm
     form = NuevaGalletaForm()
-    form.receta_id.choices = [(r.idReceta, r.nombreReceta) for r in Receta.query.filter_by(estatus=1).all()]
+    form.receta_id.choices = [(r['idReceta'], r['nombreReceta']) for r in catalogo.recetas()]
 
     if form.validate_on_submit():
         nombre = form.nombre_galleta.data
         receta_id = form.receta_id.data
 
         tipos = TipoGalleta.query.all()
+        nuevas = []
         for tipo in tipos:
             nueva = Galleta(
                 tipo_galleta_id=tipo.id_tipo_galleta,
@@ -114,6 +95,11 @@ def agregar_galleta():
                 receta_id=receta_id
             )
             db.session.add(nueva)
+            nuevas.append(nueva)
+        db.session.flush()
+        # Sus renglones en la lista de precios, con los precios vigentes
+        db.session.add_all(precios.filas_iniciales(nuevas))
+        catalogo.invalidar()
         db.session.commit()
         flash("Galleta creada en sus tres presentaciones", "success")
 
@@ -146,7 +132,12 @@ def merma_galleta():
             flash(f"La cantidad solicitada ({cantidad}) excede la existencia del lote ({lote.existencia}).", "danger")
             return redirect(url_for("galletas.galletas"))
 
-        lote.existencia -= cantidad
+        try:
+            stock.mermar(lote, cantidad)
+        except stock.ExistenciaInsuficiente:
+            db.session.rollback()
+            flash("La existencia del lote cambió; intenta de nuevo.", "danger")
+            return redirect(url_for("galletas.galletas"))
 
         nueva_merma = MermaGalletas(
             tipo_merma=form.tipo_merma.data,
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from model.galleta import db, Galleta
 from model.lote_galleta import LoteGalletas
 from model.receta import Receta
@@ -6,13 +6,15 @@ from model.merma_galletas import MermaGalletas
 from model.merma_insumo import MermasInsumos
 from model.insumo import Insumos
 from model.lote_insumo import LoteInsumo
+from services import produccion as consumo
+from services import catalogo
+from services import stock
+from services import alertas
 
 from sqlalchemy import text
 from forms.produccion_forms import LoteGalletasForm, MermaGalletaForm, MermaInsumoForm
 import datetime
 from datetime import date
-import json
-from collections import defaultdict
 from flask_wtf.csrf import generate_csrf
 
 produccion_bp = Blueprint('produccion', __name__)
@@ -22,19 +24,25 @@ def produccion():
     form = LoteGalletasForm()
     merma_form = MermaGalletaForm()
     
-    tipo_unidad = db.session.execute(
-    text("SELECT id_tipo_galleta FROM tipo_galleta WHERE nombre = 'Unidad'")
-    ).scalar()
+    unidad = catalogo.tipo_por_nombre('Unidad')
+    tipo_unidad = unidad['id_tipo_galleta'] if unidad else None
     merma_insumo_form = MermaInsumoForm()
     merma_insumo_form.insumo_id.choices = [(i.id_insumo, i.nombreInsumo) for i in Insumos.query.all()]
 
      # Cargar opciones para el select
     form.galleta_id.choices = [
-        (g.id_galleta, g.galleta) for g in Galleta.query.filter_by(tipo_galleta_id=tipo_unidad).all()
+        (g['id_galleta'], g['galleta']) for g in catalogo.galletas(tipo_unidad)
+    ] if tipo_unidad else []
+
+    # Solo los lotes con existencia pueden tener merma
+    merma_form.lote_id.choices = [
+        (id_lote, f"{nombre} | {fecha}")
+        for id_lote, nombre, fecha in db.session.query(LoteGalletas.id_lote, Galleta.galleta, LoteGalletas.fechaProduccion)
+        .join(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
+        .filter(LoteGalletas.existencia > 0)
+        .order_by(LoteGalletas.fechaProduccion.desc())
     ]
 
-    merma_form.lote_id.choices = [(l.id_lote, f"{l.galleta.galleta} | {l.fechaProduccion}") for l in LoteGalletas.query.order_by(LoteGalletas.fechaProduccion.desc()).all()]
-
 
     mostrar_modal = False
     mostrar_modal_merma = False
@@ -48,12 +56,12 @@ def produccion():
         form.galleta_id.data = galleta_id
         mostrar_modal = True
 
-        galleta = Galleta.query.get(galleta_id)
-        receta = Receta.query.get(galleta.receta_id)
+        galleta = catalogo.galleta(galleta_id)
+        receta = catalogo.receta(galleta['receta_id'])
 
-        form.cantidad.data = receta.cantidad_galletas
-        form.costo.data = receta.cantidad_galletas * 4.5
-        form.existencia.data = receta.cantidad_galletas
+        form.cantidad.data = receta['cantidad_galletas']
+        form.costo.data = receta['cantidad_galletas'] * 4.5
+        form.existencia.data = receta['cantidad_galletas']
 
     lote_merma = None
     if 'merma_lote_id' in request.args:
@@ -66,53 +74,22 @@ def produccion():
     if form.validate_on_submit():
         galleta = Galleta.query.get(form.galleta_id.data)
         receta = Receta.query.get(galleta.receta_id)
-        ingredientes = receta.ingredientes
-        if isinstance(ingredientes, str):
-            ingredientes = json.loads(ingredientes)
-
-
-        for ingrediente in ingredientes:
-            nombre_ingrediente = ingrediente['insumo']
-            unidad = ingrediente['unidad']
-            cantidad_base = int(ingrediente['cantidad'])
-
-            cantidad_total = cantidad_base * form.cantidad.data // receta.cantidad_galletas
-
-            insumo = db.session.execute(
-                text("SELECT * FROM insumos WHERE nombreInsumo = :nombre AND unidad = :unidad"),
-                {'nombre': nombre_ingrediente, 'unidad': unidad}
-            ).mappings().first()
-
-            if not insumo:
-                flash(f"Insumo '{nombre_ingrediente}' con unidad '{unidad}' no encontrado.", 'danger')
-                return redirect(url_for('produccion.produccion'))
-
-            lotes = db.session.execute(
-                text("SELECT * FROM loteinsumo WHERE id_insumo = :id AND cantidad > 0 ORDER BY fechaIngreso ASC"),
-                {'id': insumo['id_insumo']}
-            ).mappings().all()
-
-            cantidad_faltante = cantidad_total
-            for lote in lotes:
-                if cantidad_faltante <= 0:
-                    break
-                if lote['cantidad'] >= cantidad_faltante:
-                    db.session.execute(
-                        text("UPDATE loteinsumo SET cantidad = cantidad - :descontar WHERE idLote = :id"),
-                        {'descontar': cantidad_faltante, 'id': lote['idLote']}
-                    )
-                    cantidad_faltante = 0
-                else:
-                    db.session.execute(
-                        text("UPDATE loteinsumo SET cantidad = 0 WHERE idLote = :id"),
-                        {'id': lote['idLote']}
-                    )
-                    cantidad_faltante -= lote['cantidad']
-
-            if cantidad_faltante > 0:
-                flash(f"No hay suficiente '{nombre_ingrediente}' para producir {form.cantidad.data} galletas.", 'danger')
-                db.session.rollback()
-                return redirect(url_for('produccion.produccion'))
+
+        # Consumo FIFO de insumos calculado antes de tocar existencias
+        plan = consumo.planear_consumo(receta, form.cantidad.data)
+        for nombre_ingrediente, unidad in plan['no_encontrados']:
+            flash(f"Insumo '{nombre_ingrediente}' con unidad '{unidad}' no encontrado.", 'danger')
+        for faltante in plan['faltantes']:
+            flash(f"No hay suficiente '{faltante['insumo']}' para producir {form.cantidad.data} galletas.", 'danger')
+        if plan['no_encontrados'] or plan['faltantes']:
+            return redirect(url_for('produccion.produccion'))
+
+        try:
+            consumo.aplicar_consumo(plan)
+        except consumo.ConsumoIncompleto as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return redirect(url_for('produccion.produccion'))
 
         # Crear lote de galletas
         nueva_fecha_caducidad = form.fechaProduccion.data + datetime.timedelta(days=7)
@@ -124,8 +101,7 @@ def produccion():
             costo=form.costo.data,
             existencia=form.cantidad.data
         )
-        galleta.existencia += form.cantidad.data
-        db.session.add(nuevo_lote)
+        stock.agregar_lote(nuevo_lote)
         db.session.commit()
         flash('Producción registrada con éxito.', 'success')
         return redirect(url_for('produccion.produccion'))
@@ -158,7 +134,12 @@ def produccion():
             descripcion=merma_form.descripcion.data
         )
 
-        lote.existencia -= cantidad_merma
+        try:
+            stock.mermar(lote, cantidad_merma)
+        except stock.ExistenciaInsuficiente:
+            db.session.rollback()
+            flash("La existencia del lote cambió; no alcanza para la merma.", 'danger')
+            return redirect(url_for('produccion.produccion'))
         db.session.add(nueva_merma)
         db.session.commit()
 
@@ -166,7 +147,9 @@ def produccion():
         return redirect(url_for('produccion.produccion'))
 
 
-    # Consulta de lotes existentes
+    # Lotes con existencia y los agotados en los últimos PRODUCCION_HISTORIAL_DIAS días;
+    # el historial completo no se lista para que la página no crezca con los años
+    historial_dias = current_app.config['PRODUCCION_HISTORIAL_DIAS']
     galletas = db.session.execute(text("""
         SELECT 
             lotesGalletas.id_lote,
@@ -181,44 +164,24 @@ def produccion():
         FROM lotesGalletas
         JOIN galletas ON lotesGalletas.galleta_id = galletas.id_galleta
         JOIN receta ON galletas.receta_id = receta.idReceta
-        WHERE galletas.tipo_galleta_id = (
-            SELECT id_tipo_galleta FROM tipo_galleta WHERE nombre = 'Unidad'
-        )
+        WHERE galletas.tipo_galleta_id = :tipo_unidad
+          AND (lotesGalletas.existencia > 0 OR lotesGalletas.fechaProduccion >= :desde)
         ORDER BY lotesGalletas.fechaProduccion DESC;
-    """)).mappings().all()
-
-    
+    """), {'tipo_unidad': tipo_unidad,
+           'desde': fecha_hoy - datetime.timedelta(days=historial_dias)}
+    ).mappings().all()
 
-    alertas_agotamiento = []
-    alertas_caducidad = []
-
-    # Agrupar existencia total por tipo de galleta
-    galletas_dict = defaultdict(int)
-
-    for lote in galletas:
-        galletas_dict[lote['galleta']] += lote['existencia']
-
-    for nombre, total in galletas_dict.items():
-        if total == 0:
-            alertas_agotamiento.append({'nombre': nombre, 'total': total})
-        elif total <= 30:
-            alertas_agotamiento.append({'nombre': nombre, 'total': total})
-
-    # Revisar caducidad por lote
-    for lote in galletas:
-        dias_restantes = (lote['fechaCaducidad'] - fecha_hoy).days
-        if dias_restantes <= 3:
-            alertas_caducidad.append({
-                'nombre': lote['galleta'],
-                'existencia': lote['existencia'],
-                'dias_restantes': dias_restantes
-            }) 
+    # Alertas calculadas en SQL y guardadas hasta el siguiente movimiento de existencias
+    resumen_alertas = alertas.alertas(fecha_hoy)
+    alertas_agotamiento = resumen_alertas['agotamiento']
+    alertas_caducidad = resumen_alertas['caducidad']
 
     return render_template(
         'produccion/produccion.html',
         form=form,
         merma_form=merma_form,
         galletas=galletas,
+        historial_dias=historial_dias,
         fecha_hoy=fecha_hoy.isoformat(),
         fecha_caducidad=(fecha_hoy + datetime.timedelta(days=7)).isoformat(),
         mostrar_modal=mostrar_modal,
@@ -233,6 +196,60 @@ def produccion():
     )
 
 
+@produccion_bp.route('/alertas', methods=['GET'])
+def obtener_alertas():
+    """Galletas por agotarse y lotes por caducar en JSON."""
+    resultado = alertas.alertas()
+    return jsonify({
+        "agotamiento": resultado['agotamiento'],
+        "caducidad": [dict(alerta, fecha_caducidad=alerta['fecha_caducidad'].isoformat())
+                      for alerta in resultado['caducidad']]
+    })
+
+
+@produccion_bp.route('/alertas/umbral', methods=['POST'])
+def umbral_alerta():
+    """Cambia la existencia mínima de una galleta; sin `umbral` vuelve al valor general."""
+    galleta_id = request.form.get('galleta_id', type=int)
+    valor = request.form.get('umbral', '').strip()
+    galleta = Galleta.query.get(galleta_id) if galleta_id else None
+    if not galleta:
+        return jsonify({"error": "Galleta no encontrada"}), 404
+    try:
+        umbral = int(valor) if valor else None
+    except ValueError:
+        return jsonify({"error": "El umbral debe ser un número entero"}), 400
+    if umbral is not None and umbral < 0:
+        return jsonify({"error": "El umbral no puede ser negativo"}), 400
+
+    galleta.umbral_alerta = umbral
+    alertas.invalidar()
+    db.session.commit()
+    return jsonify({"galleta_id": galleta.id_galleta, "umbral": umbral})
+
+
+@produccion_bp.route('/simular', methods=['GET'])
+def simular_produccion():
+    """Reporta el consumo y los faltantes de insumos de una producción sin tocar existencias."""
+    galleta_id = request.args.get('galleta_id', type=int)
+    cantidad = request.args.get('cantidad', type=int)
+    if not galleta_id or not cantidad or cantidad <= 0:
+        return jsonify({"error": "Indique galleta_id y cantidad"}), 400
+
+    galleta = Galleta.query.get(galleta_id)
+    if not galleta:
+        return jsonify({"error": "Galleta no encontrada"}), 404
+    receta = Receta.query.get(galleta.receta_id)
+
+    plan = consumo.planear_consumo(receta, cantidad)
+    return jsonify({
+        "suficiente": not plan['faltantes'] and not plan['no_encontrados'],
+        "consumo": [{"lote": id_lote, "cantidad": cantidad_lote} for id_lote, cantidad_lote in plan['descuentos']],
+        "faltantes": plan['faltantes'],
+        "no_encontrados": [{"insumo": nombre, "unidad": unidad} for nombre, unidad in plan['no_encontrados']]
+    })
+
+
 @produccion_bp.route('/eliminar-lote', methods=['POST'])
 def eliminar_lote():
     lote_id = request.form.get('lote_id')
@@ -251,7 +268,7 @@ def eliminar_lote():
     # 🔥 Eliminar primero las mermas relacionadas
     MermaGalletas.query.filter_by(lote_id=lote.id_lote).delete()
 
-    db.session.delete(lote)
+    stock.eliminar_lote(lote)
     db.session.commit()
 
     flash(f"El lote de la galleta '{galleta_nombre}' ha sido eliminado con éxito.", "success")
@@ -1,8 +1,7 @@
-from flask import Blueprint, redirect, url_for, render_template, request, session, flash, jsonify, make_response
+from flask import Blueprint, redirect, url_for, render_template, request, flash, jsonify, send_file, current_app
 from model.venta import Venta
+from collections import defaultdict
 from datetime import datetime, date
-import pdfkit
-import base64
 from io import BytesIO
 from forms.venta_form import VentaForm
 from forms.corte_form import CorteCajaForm
@@ -22,106 +21,217 @@ from model.solicitud_produccion import SolicitudProduccion
 from model.corte_caja import CorteCaja
 from model.venta import Venta
 from model.detalle_venta import DetalleVentaGalletas
+from services.tickets import cola_tickets, estatus_ticket, leer_ticket, LISTO, ERROR
+from services.carritos import carritos, clave_carrito
+from services import reservas, stock, resumen_ventas, caja
+from services.replica import solo_lectura
+from services import catalogo
 
 venta_bp = Blueprint('venta', __name__, url_prefix='/venta')
 
+def codificar_cursor(venta):
+    return f"{venta.fecha.isoformat()}_{venta.hora.strftime('%H:%M:%S.%f')}_{venta.id_venta}"
+
+def decodificar_cursor(cursor):
+    fecha, hora, id_venta = cursor.split('_')
+    return (datetime.strptime(fecha, '%Y-%m-%d').date(),
+            datetime.strptime(hora, '%H:%M:%S.%f').time(),
+            int(id_venta))
+
+def leer_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
+
+def paginar_ventas(cursor=None, desde=None, hasta=None, tipo_venta=None, limite=50):
+    """
+    Página de ventas de la más reciente a la más antigua.
+    Usa paginación por llave (fecha, hora, id_venta) en lugar de OFFSET, así el costo
+    no crece con el historial, y no carga la columna del ticket.
+    Regresa la lista de ventas y el cursor de la siguiente página (o None).
+    """
+    query = db.session.query(
+        Venta.id_venta,
+        Venta.fecha,
+        Venta.hora,
+        Venta.total,
+        Venta.tipoVenta
+    )
+
+    if desde:
+        query = query.filter(Venta.fecha >= desde)
+    if hasta:
+        query = query.filter(Venta.fecha <= hasta)
+    if tipo_venta:
+        query = query.filter(Venta.tipoVenta == tipo_venta)
+
+    if cursor:
+        fecha, hora, id_venta = decodificar_cursor(cursor)
+        query = query.filter(db.or_(
+            Venta.fecha < fecha,
+            db.and_(Venta.fecha == fecha, Venta.hora < hora),
+            db.and_(Venta.fecha == fecha, Venta.hora == hora, Venta.id_venta < id_venta)
+        ))
+
+    ventas = (query
+              .order_by(Venta.fecha.desc(), Venta.hora.desc(), Venta.id_venta.desc())
+              .limit(limite + 1)
+              .all())
+
+    siguiente = codificar_cursor(ventas[limite - 1]) if len(ventas) > limite else None
+    return ventas[:limite], siguiente
+
+def filtros_ventas():
+    return {
+        'desde': leer_fecha(request.args.get('desde')),
+        'hasta': leer_fecha(request.args.get('hasta')),
+        'tipo_venta': request.args.get('tipo') or None
+    }
+
 @venta_bp.route("/")
 @venta_bp.route("/catálago", methods=['GET', 'POST'])
+@solo_lectura
 def ventas():
     form = VentaForm(request.form)
-    ventas = Venta.query.all()
-    
-    return render_template("ventas/ventas.html", active_page="ventas", ventas=ventas, form=form)
+    filtros = filtros_ventas()
+
+    try:
+        ventas, siguiente = paginar_ventas(
+            cursor=request.args.get('cursor'),
+            limite=current_app.config.get('VENTAS_POR_PAGINA', 50),
+            **filtros
+        )
+    except ValueError:
+        flash("La página solicitada no es válida.", "danger")
+        return redirect(url_for('venta.ventas'))
+
+    return render_template("ventas/ventas.html", active_page="ventas", ventas=ventas, form=form,
+                           siguiente=siguiente, filtros=request.args)
+
+@venta_bp.route("/catalogo/json")
+@solo_lectura
+def ventas_json():
+    try:
+        ventas, siguiente = paginar_ventas(
+            cursor=request.args.get('cursor'),
+            limite=current_app.config.get('VENTAS_POR_PAGINA', 50),
+            **filtros_ventas()
+        )
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
+
+    return jsonify({
+        "ventas": [
+            {
+                "id_venta": venta.id_venta,
+                "fecha": venta.fecha.isoformat(),
+                "hora": venta.hora.strftime('%H:%M:%S'),
+                "total": float(venta.total),
+                "tipoVenta": venta.tipoVenta
+            }
+            for venta in ventas
+        ],
+        "siguiente": siguiente
+    })
 
 @venta_bp.route('/registrar', methods=['GET', 'POST'])
 def registrar_venta():
     form = VentaForm(request.form)
-
-    if 'detalle_venta' not in session:
-        session['detalle_venta'] = []
+    clave = clave_carrito('venta')
+    detalle_venta = carritos.obtener(clave)
 
     if request.method == 'POST' and form.validate():
         tipo_galleta_id = request.form.get('tipo_galleta')
         lote_id = request.form.get('lote')
         existencia_lote = request.form.get('existencia_lote')
-        fecha_caducidad_lote = request.form.get('fecha_caducidad_lote')
         cantidad = form.cantidad.data
 
+        automatico = lote_id == 'fefo'
         try:
             existencia_lote = int(existencia_lote) if existencia_lote else 0
             cantidad = int(cantidad)
-            lote_id = int(lote_id)
+            lote_id = None if automatico else int(lote_id)
         except ValueError:
             flash("Error: eligé una galleta y lote.", "danger")
             return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                                detalle_venta=session['detalle_venta'])
+                                detalle_venta=detalle_venta)
+
+        tipo_galleta = catalogo.galleta(tipo_galleta_id)
+        if not tipo_galleta:
+            flash("Error: La galleta seleccionada no existe.", "danger")
+            return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
+                                detalle_venta=detalle_venta)
 
-        # Validar fecha de caducidad
-        if fecha_caducidad_lote:
-            fecha_caducidad = datetime.strptime(fecha_caducidad_lote, '%Y/%m/%d').date()
-            hoy = datetime.now().date()
-            if fecha_caducidad < hoy:
+        if automatico:
+            # Repartir entre los lotes vigentes, primero los que caducan antes
+            plan, faltante = reservas.asignar_fefo(tipo_galleta['id_galleta'], cantidad)
+            if faltante > 0:
+                flash(f"Error: No hay suficiente existencia disponible. Existencia actual: {cantidad - faltante}", "danger")
+                return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
+                                    detalle_venta=detalle_venta)
+        else:
+            # Obtenemos el lote actual de la base de datos para tener la cantidad real
+            lote_actual = LoteGalletas.query.get(lote_id)
+            if not lote_actual:
+                flash("Error: El lote seleccionado no existe.", "danger")
+                return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
+                                    detalle_venta=detalle_venta)
+            # La caducidad se valida con la del lote, no con la que manda el formulario
+            if lote_actual.fechaCaducidad < date.today():
                 flash("Error: El lote seleccionado está caducado.", "danger")
                 return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                                    detalle_venta=session['detalle_venta'])
+                                    detalle_venta=detalle_venta)
+            plan = [(lote_id, cantidad)]
+
+        # Apartar en los lotes; las reservas de todas las cajas cuentan contra la existencia
+        reservado, existencia_disponible = True, 0
+        for lote_plan, cantidad_plan in plan:
+            reservado, existencia_disponible = reservas.reservar(clave, lote_plan, cantidad_plan)
+            if not reservado:
+                break
+        if reservado:
+            db.session.commit()
+        else:
+            db.session.rollback()
 
-        # Obtenemos el lote actual de la base de datos para tener la cantidad real
-        lote_actual = LoteGalletas.query.get(lote_id)
-        if not lote_actual:
-            flash("Error: El lote seleccionado no existe.", "danger")
-            return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                                detalle_venta=session['detalle_venta'])
-        
-        # Calcular las reservas actuales para este lote específico
-        reservas_totales = sum(item["cantidad"] for item in session['detalle_venta'] if item["lote_id"] == lote_id)
-        
-        # Calcular existencia real disponible
-        existencia_disponible = lote_actual.existencia - reservas_totales
-        
         # Validar que no se venda más de lo disponible
-        if cantidad > existencia_disponible:
+        if not reservado:
             flash(f"Error: No hay suficiente existencia disponible en el lote. Existencia actual: {existencia_disponible}", "danger")
             return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                                detalle_venta=session['detalle_venta'])
-
-        tipo_galleta = Galleta.query.get(tipo_galleta_id)
-        if not tipo_galleta:
-            flash("Error: La galleta seleccionada no existe.", "danger")
-            return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                                detalle_venta=session['detalle_venta'])
-
-        precio = tipo_galleta.tipo.costo
-        subtotal = cantidad * precio
-
-        nueva_venta = {
-            "id_galleta": tipo_galleta_id,
-            "nombre": tipo_galleta.galleta,
-            "tipo": tipo_galleta.tipo.nombre,
-            "cantidad": cantidad,
-            "precio_unitario": float(precio),
-            "subtotal": float(subtotal),
-            "lote_id": lote_id
-        }
-
-        # Guardar la venta en la sesión
-        session['detalle_venta'].append(nueva_venta)
-        session.modified = True
+                                detalle_venta=detalle_venta)
+
+        precio = tipo_galleta['precio']
+
+        # Guardar un renglón por lote en el carrito del servidor
+        for lote_plan, cantidad_plan in plan:
+            carritos.agregar(clave, {
+                "id_galleta": tipo_galleta_id,
+                "nombre": tipo_galleta['galleta'],
+                "tipo": tipo_galleta['tipo'],
+                "cantidad": cantidad_plan,
+                "precio_unitario": float(precio),
+                "subtotal": float(cantidad_plan * precio),
+                "lote_id": lote_plan
+            })
 
         return redirect(url_for('venta.registrar_venta'))
 
     return render_template('ventas/registrar_ventas.html', form=form, active_page="ventas", 
-                        detalle_venta=session['detalle_venta'])
+                        detalle_venta=detalle_venta)
 
 @venta_bp.route('/finalizar', methods=['POST'])
 def finalizar_venta():
-    if 'detalle_venta' not in session or not session['detalle_venta']:
+    clave = clave_carrito('venta')
+    detalle_venta = carritos.obtener(clave)
+    if not detalle_venta:
         flash("Error: No hay productos en la venta.", "danger")
         return redirect(url_for('venta.registrar_venta'))
 
     try:
         tipo_venta = "Punto de Venta"
 
-        total = sum(item['subtotal'] for item in session['detalle_venta'])
+        total = sum(item['subtotal'] for item in detalle_venta)
         ahora = datetime.now()
         fecha_venta = ahora.date()
         hora_venta = ahora.time()
@@ -140,37 +250,33 @@ def finalizar_venta():
         db.session.add(nueva_venta)
         db.session.flush()  # Para obtener el ID de la venta
 
-        # Registrar detalles y actualizar existencias
-        for detalle in session['detalle_venta']:
-            # Registrar detalle
-            nuevo_detalle = DetalleVentaGalletas(
-                venta_id=nueva_venta.id_venta,
-                lote_id=detalle['lote_id'],
-                cantidad=detalle['cantidad'],
-                subtotal=detalle['subtotal']
-            )
-            db.session.add(nuevo_detalle)
-
-            # Actualizar existencia real
-            lote = LoteGalletas.query.get(detalle['lote_id'])
-            if lote:
-                lote.existencia -= detalle['cantidad']
-                if lote.existencia < 0:
-                    db.session.rollback()
-                    flash(f"Error: Existencia insuficiente en lote {lote.id_lote}. La venta no se completó.", "danger")
-                    return redirect(url_for('venta.registrar_venta'))
-
+        # Descontar existencias y registrar detalles en lote
+        try:
+            stock.descontar_lotes(detalle_venta, clave)
+        except stock.ExistenciaInsuficiente as e:
+            db.session.rollback()
+            for faltante in e.faltantes:
+                flash(f"Error: Existencia insuficiente en lote {faltante['lote_id']} "
+                      f"(se piden {faltante['solicitado']}, hay {faltante['existencia']}).", "danger")
+            flash("La venta no se completó.", "danger")
+            return redirect(url_for('venta.registrar_venta'))
+        stock.insertar_detalles(nueva_venta.id_venta, detalle_venta)
+        resumen_ventas.acumular(fecha_venta, detalle_venta)
+        caja.registrar_venta(nueva_venta)
+
+        # Lo apartado ya se descontó de la existencia
+        reservas.liberar(clave)
+
+        # El PDF del ticket se genera fuera del request
+        trabajo = cola_tickets.encolar(nueva_venta.id_venta)
         db.session.commit()
+        cola_tickets.despachar(trabajo)
 
-        # Limpiar la sesión después de una venta exitosa
-        venta_id = nueva_venta.id_venta  # Guardar el ID antes de limpiar la sesión
-        session.pop('detalle_venta', None)
-        session.modified = True
+        # Limpiar el carrito después de una venta exitosa
+        carritos.limpiar(clave)
 
         flash("Venta registrada exitosamente!", "success")
-        
-        # Redirigir a la generación del ticket
-        return redirect(url_for('venta.generar_ticket', venta_id=venta_id))
+        return redirect(url_for('venta.ventas'))
 
     except Exception as e:
         db.session.rollback()
@@ -178,6 +284,7 @@ def finalizar_venta():
         return redirect(url_for('venta.registrar_venta'))
     
 @venta_bp.route("/detalles", methods=['GET', 'POST'])
+@solo_lectura
 def detalles_venta():
     if request.method == 'GET':
         id_venta = request.args.get('idVenta')
@@ -190,7 +297,8 @@ def detalles_venta():
             DetalleVentaGalletas,
             Galleta.galleta,
             TipoGalleta.nombre.label('tipo_galleta'),
-            TipoGalleta.costo.label('precio_unitario')
+            # Precio con que se vendió; las ventas anteriores a la lista de precios usan el del tipo
+            db.func.coalesce(DetalleVentaGalletas.precioUnitario, TipoGalleta.costo).label('precio_unitario')
         ).join(
             LoteGalletas, DetalleVentaGalletas.lote_id == LoteGalletas.id_lote
         ).join(
@@ -210,151 +318,111 @@ def detalles_venta():
 
 @venta_bp.route('/obtener_galletas/<int:tipo_venta_id>')
 def obtener_galletas(tipo_venta_id):
-    galletas = (db.session.query(Galleta)
-            .filter(Galleta.tipo_galleta_id == tipo_venta_id)
-            .all())
-
-    galletas_json = [{"id": g.id_galleta, "nombre": f"{g.galleta} - {g.tipo.nombre}"} for g in galletas]
+    galletas_json = [{"id": g['id_galleta'], "nombre": f"{g['galleta']} - {g['tipo']}"}
+                     for g in catalogo.galletas(tipo_venta_id)]
     
     return jsonify(galletas_json)
 
 @venta_bp.route('/obtener_lotes/<int:galleta_id>')
 def obtener_lotes(galleta_id):
-    # Asegurarse que existe la variable de sesión
-    if 'detalle_venta' not in session:
-        session['detalle_venta'] = []
-    
-    # Obtener todos los lotes válidos para esta galleta
-    lotes = (db.session.query(LoteGalletas)
-            .options(db.joinedload(LoteGalletas.galleta))
-            .filter(LoteGalletas.galleta_id == galleta_id)
-            .filter(LoteGalletas.existencia > 0)
-            .all()
-            )
-    
-    lotes_json = []
-    for lote in lotes:
-        # Calcular reservas para este lote específico
-        reservas = sum(item["cantidad"] for item in session['detalle_venta'] 
-                       if item["lote_id"] == lote.id_lote)
-        
-        existencia_disponible = lote.existencia - reservas
-        
-        # Solo incluir lotes con existencia disponible positiva
-        if existencia_disponible > 0:
-            lotes_json.append({
-                "id": lote.id_lote,
-                "existencia": existencia_disponible,  # Mostrar la existencia disponible
-                "fechaCaducidad": lote.fechaCaducidad.strftime('%Y/%m/%d'),
-                "existencia_real": lote.existencia  # Mantener referencia a la existencia real
-            })
-    
+    # Lotes con existencia menos lo apartado por todas las cajas, en una sola consulta
+    lotes_json = [
+        {
+            "id": lote.id_lote,
+            "existencia": int(disponible),  # Mostrar la existencia disponible
+            "fechaCaducidad": lote.fechaCaducidad.strftime('%Y/%m/%d'),
+            "existencia_real": lote.existencia  # Mantener referencia a la existencia real
+        }
+        for lote, disponible in reservas.disponibles(galleta_id)
+    ]
+
     return jsonify(lotes_json)
 
 @venta_bp.route('/generar_ticket/<int:venta_id>')
 def generar_ticket(venta_id):
     try:
-        # Obtener la información de la venta
         venta = Venta.query.get_or_404(venta_id)
-        detalles = DetalleVentaGalletas.query.filter_by(venta_id=venta_id).all()
-
-        # Preparar los datos para el template
-        items = []
-        for detalle in detalles:
-            lote = LoteGalletas.query.get(detalle.lote_id)
-            galleta = Galleta.query.get(lote.galleta_id) if lote else None
-
-            if galleta:
-                precio_unitario = detalle.subtotal / detalle.cantidad
-                items.append({
-                    'nombre': galleta.galleta,
-                    'cantidad': detalle.cantidad,
-                    'precio': precio_unitario,
-                    'subtotal': detalle.subtotal
-                })
-
-        total = venta.total
-        fecha_actual = datetime.now().strftime("%d/%m/%Y")
-        hora_actual = datetime.now().strftime("%H:%M:%S")
-
-        # Renderizar HTML del ticket
-        html = render_template(
-            'ventas/ticket.html',
-            fecha=fecha_actual,
-            hora=hora_actual,
-            items=items,
-            total=total,
-            ticket_num=venta.ticket
-        )
-
-        # Opciones para PDF
-        options = {
-            'page-size': 'A7',
-            'margin-top': '0mm',
-            'margin-right': '0mm',
-            'margin-bottom': '0mm',
-            'margin-left': '0mm',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': ''
-        }
-
-        ruta_wkhtmltopdf = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-        config = pdfkit.configuration(wkhtmltopdf=ruta_wkhtmltopdf)
-
-        # Generar el PDF en memoria
-        pdf_bytes = pdfkit.from_string(html, False, options=options, configuration=config)
 
-        # Convertir PDF a Base64
-        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-
-        # Guardar en la base de datos (suponiendo que `Venta` tiene un campo `ticket_pdf`)
-        venta.ticket = pdf_base64
+        # Encolar la generación del PDF; obtener_ticket indica cuando está listo
+        trabajo = cola_tickets.encolar(venta.id_venta)
         db.session.commit()
+        cola_tickets.despachar(trabajo)
 
         return redirect(url_for('venta.ventas'))
 
     except Exception as e:
+        db.session.rollback()
         return f"Error al generar ticket: {str(e)}", 500
 
 @venta_bp.route('/obtener_ticket/<int:venta_id>', methods=['GET'])
 def obtener_ticket(venta_id):
     try:
         venta = Venta.query.filter(Venta.id_venta == venta_id).first()
-
-        if not venta.ticket:
+        if not venta:
+            return jsonify({"error": "Venta no encontrada"}), 404
+
+        trabajo = estatus_ticket(venta_id)
+        if trabajo and trabajo.estatus != LISTO:
+            if not cola_tickets.revisar(trabajo) and trabajo.estatus == ERROR:
+                return jsonify({"estatus": "error", "error": trabajo.error}), 500
+            if trabajo.estatus != LISTO:
+                return jsonify({"estatus": "pendiente"}), 202
+
+        clave, ruta, datos = leer_ticket(venta)
+        if not clave:
             return jsonify({"error": "No se encontró el ticket en la base de datos"}), 404
 
-        print(jsonify({"ticket_base64": venta.ticket}))
-        return jsonify({"ticket_base64": venta.ticket})
+        # send_file con conditional=True responde ETag, If-None-Match y Range
+        return send_file(
+            ruta or BytesIO(datos),
+            mimetype='application/pdf',
+            download_name=f"ticket_{venta_id}.pdf",
+            conditional=True,
+            etag=clave,
+            max_age=3600
+        )
 
+    except FileNotFoundError:
+        return jsonify({"error": "No se encontró el archivo del ticket"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @venta_bp.route('/cancelar_venta', methods=['POST'])
 def cancelar_venta():
-    if "detalle_venta" in session:
-        # Eliminar toda la lista de detalle_venta
-        session["detalle_venta"] = []
-        session.modified = True
-        print("Venta cancelada: todos los detalles han sido eliminados")
-    
+    # Eliminar todos los renglones del carrito y liberar lo apartado
+    clave = clave_carrito('venta')
+    carritos.limpiar(clave)
+    reservas.liberar(clave)
+    db.session.commit()
+
     flash("Venta cancelada correctamente", "success")
     return redirect(url_for('venta.registrar_venta'))
 
 @venta_bp.route('/eliminar_detalle/<int:session_id>', methods=['POST'])
 def eliminar_detalle(session_id):
-    if "detalle_venta" in session:
-        if 0 <= session_id < len(session["detalle_venta"]):  # Verificar si el índice es válido
-            del session["detalle_venta"][session_id]  # Eliminar el elemento
-            session.modified = True  # Marcar la sesión como modificada
-    
+    clave = clave_carrito('venta')
+    detalle_venta = carritos.obtener(clave)
+
+    if 0 <= session_id < len(detalle_venta):  # Verificar si el índice es válido
+        detalle = detalle_venta[session_id]
+        carritos.quitar(clave, indice=session_id)
+        reservas.liberar(clave, detalle['lote_id'], detalle['cantidad'])
+        db.session.commit()
+
     return redirect(url_for('venta.registrar_venta'))
 
+def paginar_cortes(antes=None, limite=20):
+    """Cortes de caja del más reciente al más antiguo, paginados por fecha."""
+    query = CorteCaja.query
+    if antes:
+        query = query.filter(CorteCaja.fecha < antes)
+    cortes = query.order_by(CorteCaja.fecha.desc()).limit(limite + 1).all()
+    siguiente = cortes[limite - 1].fecha.isoformat() if len(cortes) > limite else None
+    return cortes[:limite], siguiente
+
 @venta_bp.route('/corte-caja', methods=['GET', 'POST'])
 def corte_caja():
     form = CorteCajaForm(request.form)
-    cortes = CorteCaja.query.all()
     
     if request.method == 'POST' and form.validate():
         # Verificar si ya existe un corte de caja para la fecha seleccionada
@@ -365,8 +433,8 @@ def corte_caja():
             flash("Ya se ha realizado un corte de caja para esta fecha.", "danger")
             return redirect(url_for('venta.corte_caja'))
         
-        # Calcular el total de ventas para la fecha seleccionada
-        total_venta = db.session.query(db.func.sum(Venta.total)).filter(Venta.fecha == fecha_corte).scalar()
+        # Total de ventas del día desde la caja acumulada, sin recorrer las ventas
+        total_venta = caja.total_dia(fecha_corte)
         
         # Si no hay ventas en esa fecha, mostrar mensaje de error
         if total_venta is None:
@@ -389,9 +457,19 @@ def corte_caja():
         flash("Corte de caja registrado correctamente.", "success")
         return redirect(url_for('venta.corte_caja'))
 
-    return render_template("ventas/corte_caja.html", form=form, active_page="ventas", cortes=cortes)
+    cortes, siguiente = paginar_cortes(
+        antes=leer_fecha(request.args.get('antes')),
+        limite=current_app.config.get('CORTES_POR_PAGINA', 20)
+    )
+    fecha_desglose = leer_fecha(request.args.get('fecha')) or date.today()
+    desglose = caja.desglose_dia(fecha_desglose)
+
+    return render_template("ventas/corte_caja.html", form=form, active_page="ventas", cortes=cortes,
+                           siguiente=siguiente, desglose=desglose, fecha_desglose=fecha_desglose)
+
 
 @venta_bp.route('/cobrar-pedido', methods=['GET', 'POST'])
+@solo_lectura
 def pedido_portal():
     pedidos = (
     db.session.query(
@@ -436,68 +514,19 @@ def registrar_venta(id_orden, total, tipo_venta, detalles):
         )
         db.session.add(nueva_venta)
         db.session.flush()  # Para obtener el id_venta generado
+        nueva_venta.ticket = f"Venta-{nueva_venta.id_venta}"
+
+        # Descontar los lotes asignados y registrar los detalles
+        stock.descontar_lotes(detalles)
+        stock.insertar_detalles(nueva_venta.id_venta, detalles)
+        resumen_ventas.acumular(nueva_venta.fecha, detalles)
+        caja.registrar_venta(nueva_venta)
+
+        # El PDF del ticket se genera fuera del request
+        trabajo = cola_tickets.encolar(nueva_venta.id_venta)
 
-        # Registrar los detalles de la venta sin validar lotes
-        items = []
-        for detalle in detalles:
-            # Crear el detalle de venta sin verificar existencias
-            nuevo_detalle = DetalleVentaGalletas(
-                venta_id=nueva_venta.id_venta,
-                lote_id=detalle['lote_id'],
-                cantidad=detalle['cantidad'],
-                subtotal=detalle['subtotal']
-            )
-            db.session.add(nuevo_detalle)
-            
-            # Agregar información para el ticket
-            galleta = db.session.query(Galleta).get(detalle['galleta_id'])
-            precio_unitario = detalle['subtotal'] / detalle['cantidad']
-            items.append({
-                'nombre': galleta.galleta if galleta else detalle['nombre_galleta'],
-                'cantidad': detalle['cantidad'],
-                'precio': precio_unitario,
-                'subtotal': detalle['subtotal']
-            })
-        
-        # Ahora generar el ticket en base64
-        fecha_actual = datetime.now().strftime("%d/%m/%Y")
-        hora_actual = datetime.now().strftime("%H:%M:%S")
-        
-        # Renderizar HTML del ticket
-        html = render_template(
-            'ventas/ticket.html',
-            fecha=fecha_actual,
-            hora=hora_actual,
-            items=items,
-            total=total,
-            ticket_num=f"Venta-{nueva_venta.id_venta}"
-        )
-        
-        # Opciones para PDF
-        options = {
-            'page-size': 'A7',
-            'margin-top': '0mm',
-            'margin-right': '0mm',
-            'margin-bottom': '0mm',
-            'margin-left': '0mm',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': ''
-        }
-        
-        ruta_wkhtmltopdf = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-        config = pdfkit.configuration(wkhtmltopdf=ruta_wkhtmltopdf)
-        
-        # Generar el PDF en memoria
-        pdf_bytes = pdfkit.from_string(html, False, options=options, configuration=config)
-        
-        # Convertir PDF a Base64
-        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-        
-        # Actualizar el ticket en la venta con el PDF en base64
-        nueva_venta.ticket = pdf_base64
-        
         db.session.commit()
+        cola_tickets.despachar(trabajo)
         flash("Venta registrada exitosamente.", "success")
         return nueva_venta.id_venta  # Devolver el ID de la venta para poder redirigir si es necesario
     
@@ -518,25 +547,40 @@ def cobrar_pedido(id_orden):
                 .filter(DetalleVentaOrden.orden_id == id_orden)
                 .all())
     
+    # Repartir cada galleta entre sus lotes vigentes (FEFO) en una sola consulta
+    solicitudes = defaultdict(int)
+    for d, galleta in detalles:
+        solicitudes[galleta.id_galleta] += d.cantidad
+    planes = reservas.planear_fefo(solicitudes)
+
+    sin_existencia = [galleta.galleta for d, galleta in detalles if planes[galleta.id_galleta][1] > 0]
+    if sin_existencia:
+        flash(f"No hay existencia suficiente de: {', '.join(sorted(set(sin_existencia)))}", "danger")
+        return redirect(url_for('venta.pedido_portal'))
+
     detalle_data = []
     for d, galleta in detalles:
-        # Buscar un lote para esta galleta según su ID y tipo
-        lote = (db.session.query(LoteGalletas)
-            .join(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
-            .filter(
-                LoteGalletas.galleta_id == galleta.id_galleta,
-                Galleta.tipo_galleta_id == galleta.tipo_galleta_id  # Asumiendo que la tabla Galleta tiene un campo tipo_id
-            )
-            .first())
-        lote_id = lote.id_lote if lote else 1  # Valor predeterminado si no hay lote
-        
-        detalle_data.append({
-            'lote_id': lote_id,
-            'galleta_id': d.galletas_id,
-            'nombre_galleta': galleta.galleta,
-            'cantidad': d.cantidad,
-            'subtotal': d.subtotal
-        })
+        precio_unitario = d.subtotal / d.cantidad
+        plan = planes[galleta.id_galleta][0]
+        pendiente = d.cantidad
+        # Tomar del plan de la galleta lo que pide este renglón (puede venir en varios lotes)
+        while pendiente > 0:
+            lote_id, disponible = plan[0]
+            tomar = min(disponible, pendiente)
+            if tomar == disponible:
+                plan.pop(0)
+            else:
+                plan[0] = (lote_id, disponible - tomar)
+            pendiente -= tomar
+
+            detalle_data.append({
+                'lote_id': lote_id,
+                'galleta_id': d.galletas_id,
+                'nombre_galleta': galleta.galleta,
+                'cantidad': tomar,
+                'precio_unitario': precio_unitario,
+                'subtotal': precio_unitario * tomar
+            })
     
     venta_id = registrar_venta(id_orden, pedido.total, pedido.tipoVenta, detalle_data)
     
@@ -623,8 +667,8 @@ def merma_galletas():
                 descripcion=descripcion
             )
 
-            # Descontar la cantidad de la merma del lote
-            lote.existencia -= cantidad
+            # Descontar la cantidad de la merma del lote y de la galleta
+            stock.mermar(lote, cantidad)
 
             # Guardar los cambios en la base de datos
             db.session.add(nueva_merma)
@@ -640,6 +684,7 @@ def merma_galletas():
     return render_template("ventas/registrar_merma.html", active_page="ventas", form=form)
 
 @venta_bp.route('/obtener/lotes', methods=['GET'])
+@solo_lectura
 def get_lotes():
     try:
         lotes = db.session.query(
@@ -1,4 +1,5 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 from model.tipo_galleta import db, TipoGalleta
 from model.galleta import db, Galleta
@@ -8,6 +9,9 @@ from model.usuario import db, Usuario
 from model.cliente import db, Cliente
 from model.persona import db, Persona
 from model.solicitud_produccion import SolicitudProduccion
+from services.carritos import carritos, clave_carrito
+from services.replica import en_replica
+from services import catalogo
 
 portal_cliente_bp = Blueprint('portal_cliente', __name__, 
                             url_prefix='/portal',
@@ -32,14 +36,7 @@ def portal_cliente():
     cliente_id = session.get('cliente_id', CLIENTE_PRUEBA_ID) if MODO_PRUEBA else session.get('cliente_id')
     
     # Obtener tipos de galletas para el select
-    tipos_galletas = TipoGalleta.query.all()
-    
-    # Inicializar carrito si no existe para este cliente
-    if 'carritos' not in session:
-        session['carritos'] = {}
-    
-    if str(cliente_id) not in session['carritos']:
-        session['carritos'][str(cliente_id)] = []
+    tipos_galletas = catalogo.tipos()
     
     # Procesar formulario cuando se envía
     if request.method == 'POST':
@@ -61,7 +58,7 @@ def portal_cliente():
         galletas = Galleta.query.filter_by(tipo_galleta_id=tipo_seleccionado).all()
     
     # Calcular total del carrito
-    carrito = session['carritos'].get(str(cliente_id), [])
+    carrito = carritos.obtener(clave_portal(cliente_id))
     total = sum(item['subtotal'] for item in carrito)
     
     return render_template('portal/portal_cliente.html',
@@ -72,6 +69,10 @@ def portal_cliente():
                          total=total,
                          modo_prueba=MODO_PRUEBA)
 
+def clave_portal(cliente_id):
+    """Clave del carrito del cliente en el navegador actual"""
+    return clave_carrito(f"portal:{cliente_id}")
+
 def agregar_al_carrito(cliente_id):
     galleta_id = request.form.get('galleta_id')
     cantidad = int(request.form.get('cantidad', 1))
@@ -80,59 +81,59 @@ def agregar_al_carrito(cliente_id):
         flash('Debe seleccionar una galleta', 'error')
         return redirect(url_for('portal_cliente.portal_cliente'))
     
-    galleta = Galleta.query.get(galleta_id)
+    galleta = catalogo.galleta(galleta_id)
     if galleta:
-        # Verificar disponibilidad
-        if cantidad > galleta.existencia:
-            flash(f'No hay suficiente existencia. Disponibles: {galleta.existencia}', 'error')
+        # Nombre y precio salen del catálogo en memoria; solo la existencia se consulta
+        existencia = (db.session.query(Galleta.existencia)
+                      .filter(Galleta.id_galleta == galleta['id_galleta'])
+                      .scalar())
+        if cantidad > existencia:
+            flash(f'No hay suficiente existencia. Disponibles: {existencia}', 'error')
             return redirect(url_for('portal_cliente.portal_cliente'))
-        
-        tipo = TipoGalleta.query.get(galleta.tipo_galleta_id)
 
         item = {
-            'galleta_id': galleta.id_galleta,
-            'nombre': galleta.galleta,
-            'tipo': tipo.nombre,
-            'precio': float(tipo.costo),
+            'galleta_id': galleta['id_galleta'],
+            'nombre': galleta['galleta'],
+            'tipo': galleta['tipo'],
+            'precio': float(galleta['precio']),
             'cantidad': cantidad,
-            'subtotal': float(tipo.costo) * cantidad
+            'subtotal': float(galleta['precio']) * cantidad
         }
         
-        # Buscar si ya existe el item en el carrito
-        carrito = session['carritos'][str(cliente_id)]
-        for i, item_carrito in enumerate(carrito):
-            if item_carrito['galleta_id'] == item['galleta_id']:
-                # Actualizar cantidad y subtotal
-                nueva_cantidad = item_carrito['cantidad'] + cantidad
-                if nueva_cantidad > galleta.existencia:
-                    flash(f'No hay suficiente existencia. Disponibles: {galleta.existencia}', 'error')
-                    return redirect(url_for('portal_cliente.portal_cliente'))
-                
-                carrito[i]['cantidad'] = nueva_cantidad
-                carrito[i]['subtotal'] = item_carrito['precio'] * nueva_cantidad
-                break
-        else:
-            # Si no existe, agregarlo
-            carrito.append(item)
-        
-        session.modified = True
+        def sumar(carrito):
+            # Buscar si ya existe el item en el carrito
+            for i, item_carrito in enumerate(carrito):
+                if item_carrito['galleta_id'] == item['galleta_id']:
+                    # Actualizar cantidad y subtotal
+                    nueva_cantidad = item_carrito['cantidad'] + cantidad
+                    if nueva_cantidad > existencia:
+                        return None
+
+                    carrito[i]['cantidad'] = nueva_cantidad
+                    carrito[i]['subtotal'] = item_carrito['precio'] * nueva_cantidad
+                    break
+            else:
+                # Si no existe, agregarlo
+                carrito.append(item)
+            return carrito
+
+        # Leer y guardar el carrito en un solo paso para no perder renglones de otra pestaña
+        if carritos.modificar(clave_portal(cliente_id), sumar) is None:
+            flash(f'No hay suficiente existencia. Disponibles: {existencia}', 'error')
+            return redirect(url_for('portal_cliente.portal_cliente'))
         flash('Producto agregado al carrito', 'success')
     
     return redirect(url_for('portal_cliente.portal_cliente'))
 
 def eliminar_del_carrito(cliente_id):
     galleta_id = int(request.form.get('galleta_id'))
-    if 'carritos' in session and str(cliente_id) in session['carritos']:
-        session['carritos'][str(cliente_id)] = [item for item in session['carritos'][str(cliente_id)] if item['galleta_id'] != galleta_id]
-        session.modified = True
-        flash('Producto eliminado del carrito', 'info')
+    carritos.quitar(clave_portal(cliente_id), galleta_id=galleta_id)
+    flash('Producto eliminado del carrito', 'info')
     return redirect(url_for('portal_cliente.portal_cliente'))
 
 def limpiar_carrito(cliente_id):
-    if 'carritos' in session and str(cliente_id) in session['carritos']:
-        session['carritos'][str(cliente_id)] = []
-        session.modified = True
-        flash('Carrito vaciado', 'info')
+    carritos.limpiar(clave_portal(cliente_id))
+    flash('Carrito vaciado', 'info')
     return redirect(url_for('portal_cliente.portal_cliente'))
 
 def obtener_cliente_actual():
@@ -195,7 +196,9 @@ def crear_cliente_temporal():
 def confirmar_pedido():
     cliente_id = session.get('cliente_id', CLIENTE_PRUEBA_ID) if MODO_PRUEBA else session.get('cliente_id')
     
-    if 'carritos' not in session or str(cliente_id) not in session['carritos'] or not session['carritos'][str(cliente_id)]:
+    clave = clave_portal(cliente_id)
+    carrito = carritos.obtener(clave)
+    if not carrito:
         flash('No hay productos en el carrito', 'error')
         return redirect(url_for('portal_cliente.portal_cliente'))
     
@@ -209,7 +212,7 @@ def confirmar_pedido():
         # Crear la orden
         nueva_orden = Orden(
             descripcion="Pedido de galletas",
-            total=sum(item['subtotal'] for item in session['carritos'][str(cliente_id)]),
+            total=sum(item['subtotal'] for item in carrito),
             fechaAlta=datetime.now(),
             fechaEntrega=datetime.now() + timedelta(days=3),
             tipoVenta="Portal Cliente",
@@ -220,7 +223,7 @@ def confirmar_pedido():
         db.session.flush()  # Necesario para obtener id_orden antes de commit
         
         # Crear los detalles de la orden y las solicitudes de producción
-        for item in session['carritos'][str(cliente_id)]:
+        for item in carrito:
             detalle = DetalleVentaOrden(
                 galletas_id=item['galleta_id'],
                 cantidad=item['cantidad'],
@@ -241,8 +244,7 @@ def confirmar_pedido():
         db.session.commit()
         
         # Limpiar carrito
-        session['carritos'][str(cliente_id)] = []
-        session.modified = True
+        carritos.limpiar(clave)
         
         flash(f'Pedido confirmado con éxito! Número de orden: {nueva_orden.id_orden}', 'success')
         return redirect(url_for('portal_cliente.portal_cliente'))
@@ -252,19 +254,58 @@ def confirmar_pedido():
         flash(f'Error al confirmar el pedido: {str(e)}', 'error')
         return redirect(url_for('portal_cliente.portal_cliente'))
 
-    
+
+def paginar_ordenes(cliente_id, cursor=None, limite=20):
+    """
+    Órdenes del cliente de la más reciente a la más antigua, con sus detalles,
+    galletas y tipos cargados en una consulta por tabla (sin N+1).
+    Paginación por llave (fechaAlta, id_orden); el cursor es "fecha_id".
+    Regresa la lista de órdenes y el cursor de la siguiente página (o None).
+    """
+    query = (Orden.query
+             .filter(Orden.cliente_id == cliente_id)
+             .options(selectinload(Orden.detalles)
+                      .selectinload(DetalleVentaOrden.galleta)
+                      .selectinload(Galleta.tipo)))
+
+    if cursor:
+        fecha, id_orden = cursor.split('_')
+        fecha, id_orden = datetime.fromisoformat(fecha), int(id_orden)
+        query = query.filter(db.or_(
+            Orden.fechaAlta < fecha,
+            db.and_(Orden.fechaAlta == fecha, Orden.id_orden < id_orden)
+        ))
+
+    ordenes = (query
+               .order_by(Orden.fechaAlta.desc(), Orden.id_orden.desc())
+               .limit(limite + 1)
+               .all())
+
+    siguiente = None
+    if len(ordenes) > limite:
+        ultima = ordenes[limite - 1]
+        siguiente = f"{ultima.fechaAlta.isoformat()}_{ultima.id_orden}"
+    return ordenes[:limite], siguiente
+
 @portal_cliente_bp.route('/mis-pedidos')
 def mis_pedidos():
-    # Obtener cliente actual
+    # El cliente se busca (o se crea) en la principal; con la réplica atrasada se duplicaría
     cliente = obtener_cliente_actual()
     if not cliente:
         flash('No se pudo identificar al cliente', 'error')
         return redirect(url_for('portal_cliente.portal_cliente'))
     
-    # Obtener órdenes del cliente
-    ordenes = Orden.query.filter_by(cliente_id=cliente.idCliente)\
-                       .order_by(Orden.fechaAlta.desc())\
-                       .all()
+    # Órdenes del cliente con sus detalles, galletas y tipos en consultas fijas
+    try:
+        with en_replica():
+            ordenes, siguiente = paginar_ordenes(
+                cliente.idCliente,
+                cursor=request.args.get('cursor'),
+                limite=current_app.config.get('PEDIDOS_POR_PAGINA', 20)
+            )
+    except ValueError:
+        flash('La página solicitada no es válida.', 'error')
+        return redirect(url_for('portal_cliente.mis_pedidos'))
     
     # Preparar datos para la vista
     pedidos = []
@@ -277,16 +318,10 @@ def mis_pedidos():
             'detalles': []
         }
         
-        # Consultar los detalles de la orden directamente desde la tabla DetalleVentaOrden
-        detalles = DetalleVentaOrden.query.filter_by(orden_id=orden.id_orden).all()
-        
-        for detalle in detalles:
-            # Obtener la galleta usando el ID del detalle
-            galleta = Galleta.query.get(detalle.galletas_id)
+        for detalle in orden.detalles:
+            galleta = detalle.galleta
             if galleta:
-                # Obtener el tipo de galleta
-                tipo_galleta = TipoGalleta.query.get(galleta.tipo_galleta_id)
-                tipo_nombre = tipo_galleta.nombre if tipo_galleta else "Sin tipo"
+                tipo_nombre = galleta.tipo.nombre if galleta.tipo else "Sin tipo"
                 
                 pedido['detalles'].append({
                     'nombre': galleta.galleta,
@@ -297,4 +332,4 @@ def mis_pedidos():
         
         pedidos.append(pedido)
     
-    return render_template('portal/mis_pedidos.html', pedidos=pedidos, active_page='mis_pedidos')
\ No newline at end of file
+    return render_template('portal/mis_pedidos.html', pedidos=pedidos, siguiente=siguiente, active_page='mis_pedidos')
\ No newline at end of file
@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from model.receta import db, Receta
 from forms.forms import RecetaForm
+from services import recetas as recetas_bom
+from services import catalogo
 import json
 
 recetas_bp = Blueprint('recetas', __name__, url_prefix='/recetas', template_folder='view')
@@ -41,16 +43,27 @@ def agregar():
             for i, c, u in zip(insumos, cantidades, unidades)
             if i and c and u
         ]
-        
+
+        invalidas = recetas_bom.cantidades_invalidas(ingredientes)
+        for ingrediente in invalidas:
+            flash(f"La cantidad '{ingrediente['cantidad']}' de '{ingrediente['insumo']}' no es válida; "
+                  f"debe ser un número mayor a cero.", "danger")
+        if invalidas:
+            return render_template('administracion/recetas/agregar_receta.html', form=receta_form)
+
         nueva_receta = Receta(
             nombreReceta=nombre,
             Descripccion=descripcion, 
-            ingredientes=ingredientes,
             cantidad_galletas=cantidad_galletas,
             estatus=1
         )
-        
+
+        no_encontrados = recetas_bom.guardar_ingredientes(nueva_receta, ingredientes)
+        for insumo, unidad in no_encontrados:
+            flash(f"Insumo '{insumo}' con unidad '{unidad}' no registrado; regístralo antes de producir.", "warning")
+
         db.session.add(nueva_receta)
+        catalogo.invalidar()
         db.session.commit()
         
         flash("Receta agregada correctamente", "success")
@@ -65,6 +78,7 @@ def eliminar():
     
     if receta:
         receta.estatus = 0
+        catalogo.invalidar()
         db.session.commit()
         flash("Receta desactivada correctamente", "success")
     else:
@@ -79,6 +93,7 @@ def activar():
     
     if receta:
         receta.estatus = 1
+        catalogo.invalidar()
         db.session.commit()
         flash("Receta activada correctamente", "success")
     else:
@@ -110,12 +125,27 @@ def modificar():
         cantidades = request.form.getlist('cantidad[]')
         unidades = request.form.getlist('unidad[]')
 
-        receta.ingredientes = [
+        ingredientes = [
             {'insumo': i, 'cantidad': c, 'unidad': u}
             for i, c, u in zip(insumos, cantidades, unidades)
             if i and c and u
         ]
 
+        invalidas = recetas_bom.cantidades_invalidas(ingredientes)
+        for ingrediente in invalidas:
+            flash(f"La cantidad '{ingrediente['cantidad']}' de '{ingrediente['insumo']}' no es válida; "
+                  f"debe ser un número mayor a cero.", "danger")
+        if invalidas:
+            db.session.rollback()
+            return render_template('administracion/recetas/modificar_receta.html', form=receta_form, idReceta=idReceta, receta=receta,
+                                   active_page="administracion", active_page_admin="recetas")
+
+        no_encontrados = recetas_bom.guardar_ingredientes(receta, ingredientes)
+        for insumo, unidad in no_encontrados:
+            flash(f"Insumo '{insumo}' con unidad '{unidad}' no registrado; regístralo antes de producir.", "warning")
+
+        # Subir la generación hace que todos los workers recompilen la lista de materiales
+        catalogo.invalidar()
         db.session.commit()
         flash("Receta actualizada correctamente", "success")
         return redirect(url_for('administracion.recetas.recetas'))
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
+from services.replica import SesionEnrutada
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
 csrf = CSRFProtect()
\ No newline at end of file
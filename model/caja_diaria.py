@@ -0,0 +1,14 @@
+from extensions import db
+
+class CajaDiaria(db.Model):
+    """Acumulado de caja por día, tipo de venta y hora; se suma al registrar cada venta."""
+    __tablename__ = 'cajaDiaria'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    tipoVenta = db.Column(db.String(50), primary_key=True)
+    hora = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 a 23
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    ventas = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CajaDiaria {self.fecha} {self.tipoVenta} {self.hora}>'
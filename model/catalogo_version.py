@@ -0,0 +1,11 @@
+from extensions import db
+
+class CatalogoVersion(db.Model):
+    """Generación del catálogo; cada cambio la sube para que los demás workers recarguen su copia."""
+    __tablename__ = 'catalogoVersion'
+
+    id = db.Column(db.Integer, primary_key=True)  # Un solo renglón, id 1
+    generacion = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogoVersion {self.generacion}>'
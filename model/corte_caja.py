@@ -4,7 +4,7 @@ class CorteCaja(db.Model):
     __tablename__ = 'corte_caja'
     
     id_ganancia = db.Column(db.Integer, primary_key=True, autoincrement=True) 
-    fecha = db.Column(db.Date, nullable=False)
+    fecha = db.Column(db.Date, nullable=False, index=True)
     totalVenta = db.Column(db.Float, nullable=False)
     cantidadCaja = db.Column(db.Numeric(10, 2), nullable=False)               
     diferencial = db.Column(db.Numeric(10, 2), nullable=False)
@@ -1,11 +1,122 @@
 # model/dashboard_model.py
+import threading
+from functools import wraps
+
+from cachetools import TTLCache
+from flask import current_app
 from extensions import db
 from datetime import datetime, timedelta
-from model.venta import Venta  # Actualizado
-from model.detalle_venta import DetalleVentaGalletas  # Actualizado
-from model.lote_galleta import LoteGalletas  # Actualizado
 from model.galleta import Galleta  # Actualizado
 from model.tipo_galleta import TipoGalleta  # Actualizado
+from model.venta_diaria import VentaDiaria
+
+# Las consultas leen del resumen diario (ventasDiarias) y se guardan unos segundos en memoria
+_cache = None
+_lock = threading.Lock()
+
+def _cache_dashboard():
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(maxsize=256, ttl=current_app.config.get('DASHBOARD_CACHE_TTL', 60))
+    return _cache
+
+def cacheado(funcion):
+    """Guarda el resultado por función y argumentos durante DASHBOARD_CACHE_TTL segundos."""
+    @wraps(funcion)
+    def envoltura(*args):
+        clave = (funcion.__name__,) + args
+        cache = _cache_dashboard()
+        with _lock:
+            if clave in cache:
+                return cache[clave]
+        resultado = funcion(*args)
+        with _lock:
+            cache[clave] = resultado
+        return resultado
+    return envoltura
+
+def limpiar_cache():
+    with _lock:
+        if _cache is not None:
+            _cache.clear()
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+
+def inicio_periodo(fecha, granularidad):
+    """Primer día del periodo (día, semana que inicia en lunes o mes) al que pertenece la fecha."""
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+def _rango(query, desde, hasta):
+    if desde:
+        query = query.filter(VentaDiaria.fecha >= desde)
+    if hasta:
+        query = query.filter(VentaDiaria.fecha <= hasta)
+    return query
+
+@cacheado
+def ventas_por_periodo(desde, hasta, granularidad='dia'):
+    """
+    Ventas del rango agrupadas por día, semana o mes.
+    La consulta agrupa por día en el resumen y los días se juntan por periodo en memoria,
+    así funciona igual en cualquier motor de base de datos.
+    Retorna (periodos, totales, cantidades, actualizado).
+    """
+    result = (_rango(db.session.query(VentaDiaria.fecha,
+                                      db.func.sum(VentaDiaria.total),
+                                      db.func.sum(VentaDiaria.cantidad),
+                                      db.func.max(VentaDiaria.actualizado)), desde, hasta)
+              .group_by(VentaDiaria.fecha)
+              .order_by(VentaDiaria.fecha)
+              .all())
+
+    periodos = {}
+    actualizado = None
+    for fecha, total, cantidad, modificado in result:
+        periodo = inicio_periodo(fecha, granularidad)
+        acumulado = periodos.setdefault(periodo, [0.0, 0])
+        acumulado[0] += float(total)
+        acumulado[1] += int(cantidad)
+        if modificado and (actualizado is None or modificado > actualizado):
+            actualizado = modificado
+
+    formato = '%Y-%m' if granularidad == 'mes' else '%Y-%m-%d'
+    return ([periodo.strftime(formato) for periodo in periodos],
+            [round(valores[0], 2) for valores in periodos.values()],
+            [valores[1] for valores in periodos.values()],
+            actualizado)
+
+@cacheado
+def productos_mas_vendidos(desde=None, hasta=None, limite=5):
+    """Galletas más vendidas en el rango. Retorna (nombres, cantidades, actualizado)."""
+    result = (_rango(db.session.query(Galleta.galleta,
+                                      db.func.sum(VentaDiaria.cantidad).label('cantidad_vendida'),
+                                      db.func.max(VentaDiaria.actualizado)), desde, hasta)
+              .join(Galleta, VentaDiaria.galleta_id == Galleta.id_galleta)
+              .group_by(Galleta.galleta)
+              .order_by(db.desc('cantidad_vendida'))
+              .limit(limite)
+              .all())
+
+    modificados = [row[2] for row in result if row[2]]
+    return [row[0] for row in result], [int(row[1]) for row in result], max(modificados, default=None)
+
+@cacheado
+def presentaciones_mas_vendidas(desde=None, hasta=None):
+    """Presentaciones más vendidas en el rango. Retorna (nombres, cantidades, actualizado)."""
+    result = (_rango(db.session.query(TipoGalleta.nombre,
+                                      db.func.sum(VentaDiaria.cantidad).label('cantidad_vendida'),
+                                      db.func.max(VentaDiaria.actualizado)), desde, hasta)
+              .join(TipoGalleta, VentaDiaria.tipo_galleta_id == TipoGalleta.id_tipo_galleta)
+              .group_by(TipoGalleta.nombre)
+              .order_by(db.desc('cantidad_vendida'))
+              .all())
+
+    modificados = [row[2] for row in result if row[2]]
+    return [row[0] for row in result], [int(row[1]) for row in result], max(modificados, default=None)
 
 def get_ventas_diarias():
     """
@@ -14,16 +125,7 @@ def get_ventas_diarias():
     """
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=7)
-
-    # Usar el ORM para obtener las ventas diarias
-    result = (db.session.query(Venta.fecha, db.func.sum(Venta.total).label('total_ventas'))
-              .filter(Venta.fecha.between(start_date, end_date))
-              .group_by(Venta.fecha)
-              .order_by(Venta.fecha)
-              .all())
-
-    fechas = [row[0].strftime('%Y-%m-%d') for row in result]
-    totales = [float(row[1]) for row in result]
+    fechas, totales, _, _ = ventas_por_periodo(start_date, end_date, 'dia')
     return fechas, totales
 
 def get_productos_mas_vendidos():
@@ -31,17 +133,7 @@ def get_productos_mas_vendidos():
     Obtiene los 5 productos más vendidos.
     Retorna una lista de nombres de productos y una lista de cantidades vendidas.
     """
-    # Usar el ORM para obtener los productos más vendidos
-    result = (db.session.query(Galleta.galleta, db.func.sum(DetalleVentaGalletas.cantidad).label('cantidad_vendida'))
-              .join(LoteGalletas, LoteGalletas.galleta_id == Galleta.id_galleta)
-              .join(DetalleVentaGalletas, DetalleVentaGalletas.lote_id == LoteGalletas.id_lote)
-              .group_by(Galleta.galleta)
-              .order_by(db.desc('cantidad_vendida'))
-              .limit(5)
-              .all())
-
-    nombres = [row[0] for row in result]
-    cantidades = [int(row[1]) for row in result]
+    nombres, cantidades, _ = productos_mas_vendidos(None, None, 5)
     return nombres, cantidades
 
 def get_presentaciones_mas_vendidas():
@@ -49,15 +141,5 @@ def get_presentaciones_mas_vendidas():
     Obtiene las presentaciones más vendidas.
     Retorna una lista de nombres de presentaciones y una lista de cantidades vendidas.
     """
-    # Usar el ORM para obtener las presentaciones más vendidas
-    result = (db.session.query(TipoGalleta.nombre, db.func.sum(DetalleVentaGalletas.cantidad).label('cantidad_vendida'))
-              .join(Galleta, Galleta.tipo_galleta_id == TipoGalleta.id_tipo_galleta)
-              .join(LoteGalletas, LoteGalletas.galleta_id == Galleta.id_galleta)
-              .join(DetalleVentaGalletas, DetalleVentaGalletas.lote_id == LoteGalletas.id_lote)
-              .group_by(TipoGalleta.nombre)
-              .order_by(db.desc('cantidad_vendida'))
-              .all())
-
-    nombres = [row[0] for row in result]
-    cantidades = [int(row[1]) for row in result]
-    return nombres, cantidades
\ No newline at end of file
+    nombres, cantidades, _ = presentaciones_mas_vendidas(None, None)
+    return nombres, cantidades
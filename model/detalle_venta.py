@@ -4,12 +4,16 @@ from model.venta import Venta
 
 class DetalleVentaGalletas(db.Model):
     __tablename__ = "detalleVentaGalletas"
+    __table_args__ = (
+        db.Index("ix_detalleVentaGalletas_venta", "venta_id"),
+    )
 
     id_detalleVentaGalletas = db.Column(db.Integer, primary_key=True, autoincrement=True)
     venta_id = db.Column(db.Integer, db.ForeignKey("ventas.id_venta"), nullable=False)
     lote_id = db.Column(db.Integer, db.ForeignKey("lotesGalletas.id_lote"), nullable=False)
     cantidad = db.Column(db.Integer, nullable=False)
     subtotal = db.Column(db.Numeric(10, 2), nullable=False)
+    precioUnitario = db.Column(db.Numeric(10, 2))  # Precio al momento de la venta
 
     # Elimina esta línea porque no es necesario definirla explícitamente
     # venta = db.relationship("Venta", backref=db.backref("detalles", lazy=True))  # No es necesario definir otro backref
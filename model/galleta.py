@@ -10,6 +10,7 @@ class Galleta(db.Model):
     galleta = db.Column(db.String(100), nullable=False)
     existencia = db.Column(db.Integer, nullable=False)
     receta_id = db.Column(db.Integer, db.ForeignKey('receta.idReceta'), nullable=False)
+    umbral_alerta = db.Column(db.Integer)  # Existencia mínima antes de alertar; None usa ALERTA_EXISTENCIA_MINIMA
     
     # Relación con receta
     receta = db.relationship('Receta', backref=db.backref('galletas', lazy=True))  # Este backref permanece igual
@@ -0,0 +1,18 @@
+from extensions import db
+
+class ListaPrecios(db.Model):
+    """Precio y piezas por empaque de cada galleta en cada presentación (tipo de galleta)."""
+    __tablename__ = 'listaPrecios'
+    __table_args__ = (
+        db.UniqueConstraint('galleta_id', 'tipo_galleta_id', name='uq_listaPrecios_galleta_tipo'),
+        db.CheckConstraint('unidades > 0', name='ck_listaPrecios_unidades'),
+    )
+
+    id_precio = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    galleta_id = db.Column(db.Integer, db.ForeignKey('galletas.id_galleta'), nullable=False)
+    tipo_galleta_id = db.Column(db.Integer, db.ForeignKey('tipo_galleta.id_tipo_galleta'), nullable=False)
+    precio = db.Column(db.Numeric(10, 2), nullable=False)
+    unidades = db.Column(db.Integer, nullable=False, default=1)  # Galletas por empaque
+
+    def __repr__(self):
+        return f'<ListaPrecios {self.galleta_id} {self.tipo_galleta_id} {self.precio}>'
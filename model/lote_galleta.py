@@ -3,7 +3,14 @@ from model.galleta import Galleta
 
 class LoteGalletas(db.Model):
     __tablename__ = 'lotesGalletas'
-    
+    __table_args__ = (
+        # Para repartir las ventas por fecha de caducidad (FEFO)
+        db.Index('ix_lotesGalletas_galleta_caducidad', 'galleta_id', 'fechaCaducidad'),
+        # Lotes con existencia de una galleta (producción, inventario)
+        db.Index('ix_lotesGalletas_galleta_existencia', 'galleta_id', 'existencia'),
+        # Lotes por caducar (alertas)
+        db.Index('ix_lotesGalletas_caducidad', 'fechaCaducidad'),
+    )
 
     id_lote = db.Column(db.Integer, primary_key=True, autoincrement=True)
     galleta_id = db.Column(db.Integer, db.ForeignKey('galletas.id_galleta'), nullable=False)
@@ -2,6 +2,12 @@ from extensions import db
 
 class LoteInsumo(db.Model):
     __tablename__ = 'loteinsumo'
+    __table_args__ = (
+        # Consumo de insumos por orden de ingreso (FIFO): igualdad en id_insumo y orden por
+        # fechaIngreso. cantidad va al final para filtrar `cantidad > 0` desde el índice; antes
+        # de fechaIngreso ese rango impediría usar el índice para el orden.
+        db.Index('ix_loteinsumo_insumo_ingreso', 'id_insumo', 'fechaIngreso', 'cantidad'),
+    )
     idLote = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_insumo = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
     fechaIngreso = db.Column(db.Date, nullable=False)
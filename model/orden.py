@@ -4,6 +4,10 @@ from datetime import datetime
 
 class Orden(db.Model):
     __tablename__ = 'orden'
+    __table_args__ = (
+        # Pedidos de un cliente del más reciente al más antiguo
+        db.Index('ix_orden_cliente_alta', 'cliente_id', 'fechaAlta'),
+    )
 
     id_orden = db.Column(db.Integer, primary_key=True, autoincrement=True)
     descripcion = db.Column(db.Text)
@@ -0,0 +1,22 @@
+from extensions import db
+from model.receta import Receta
+from model.insumo import Insumos
+
+class RecetaInsumo(db.Model):
+    __tablename__ = 'receta_insumo'
+    __table_args__ = (
+        db.Index('ix_receta_insumo_receta', 'receta_id'),
+    )
+
+    id_receta_insumo = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    receta_id = db.Column(db.Integer, db.ForeignKey('receta.idReceta'), nullable=False)
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumos.id_insumo'), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)  # Para receta.cantidad_galletas galletas
+    unidad = db.Column(db.String(50), nullable=False)
+
+    # Relaciones
+    receta = db.relationship('Receta', backref=db.backref('insumos_receta', lazy=True, cascade='all, delete-orphan'))
+    insumo = db.relationship('Insumos', lazy='joined')
+
+    def __repr__(self):
+        return f'<RecetaInsumo {self.receta_id}-{self.insumo_id}>'
@@ -0,0 +1,17 @@
+from extensions import db
+
+class ReservaLote(db.Model):
+    __tablename__ = 'reservasLote'
+    __table_args__ = (
+        db.Index('ix_reservasLote_lote_expira', 'lote_id', 'expira'),
+        db.Index('ix_reservasLote_carrito', 'carrito'),
+    )
+
+    id_reserva = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    lote_id = db.Column(db.Integer, db.ForeignKey('lotesGalletas.id_lote'), nullable=False)
+    carrito = db.Column(db.String(80), nullable=False)  # Clave del carrito que aparta
+    cantidad = db.Column(db.Integer, nullable=False)
+    expira = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ReservaLote {self.id_reserva}>'
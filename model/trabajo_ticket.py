@@ -0,0 +1,21 @@
+from extensions import db
+from datetime import datetime
+
+class TrabajoTicket(db.Model):
+    __tablename__ = 'trabajosTicket'
+
+    id_trabajo = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id_venta'), nullable=False)
+    estatus = db.Column(db.Integer, nullable=False, default=0)  # 0: Pendiente; 1: En proceso; 2: Listo; 3: Error
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    url_base = db.Column(db.String(255))
+    error = db.Column(db.String(255))
+    fechaAlta = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    fechaInicio = db.Column(db.DateTime)
+    fechaFin = db.Column(db.DateTime)
+
+    # Relación con la venta
+    venta = db.relationship('Venta', backref=db.backref('trabajos_ticket', lazy=True))
+
+    def __repr__(self):
+        return f'<TrabajoTicket {self.id_trabajo}>'
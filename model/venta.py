@@ -3,12 +3,17 @@ from model.lote_galleta import LoteGalletas
 
 class Venta(db.Model):
     __tablename__ = 'ventas'
+    __table_args__ = (
+        # Mismo orden que la paginación por llave y las sumas por día
+        db.Index('ix_ventas_fecha_hora', 'fecha', 'hora', 'id_venta'),
+    )
     
     id_venta = db.Column(db.Integer, primary_key=True, autoincrement=True)
     total = db.Column(db.Numeric(10, 2), nullable=False)
     fecha = db.Column(db.Date, nullable=False)
     hora = db.Column(db.Time, nullable=False)
     ticket = db.Column(db.Text)
+    ticket_ref = db.Column(db.String(80))  # Clave del PDF en el almacén de tickets
     tipoVenta = db.Column(db.String(50), nullable=False)    
 
     # Relación con detalleVentaGalletas (uno a muchos)
@@ -0,0 +1,16 @@
+from extensions import db
+from datetime import datetime
+
+class VentaDiaria(db.Model):
+    """Resumen de ventas por día, galleta y presentación; se acumula al registrar cada venta."""
+    __tablename__ = 'ventasDiarias'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    galleta_id = db.Column(db.Integer, db.ForeignKey('galletas.id_galleta'), primary_key=True)
+    tipo_galleta_id = db.Column(db.Integer, db.ForeignKey('tipo_galleta.id_tipo_galleta'), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow)  # Para Last-Modified del dashboard
+
+    def __repr__(self):
+        return f'<VentaDiaria {self.fecha} {self.galleta_id}>'
@@ -0,0 +1,60 @@
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+
+
+def sumar_o_insertar(modelo, filas, llaves, sumar, asignar=()):
+    """
+    Suma las columnas `sumar` de cada fila al renglón con las mismas `llaves`,
+    o lo inserta si no existe, en una sola sentencia por lote de filas.
+    Las columnas `asignar` se reemplazan con el valor nuevo.
+    El commit lo hace quien llama.
+    """
+    if not filas:
+        return
+    tabla = modelo.__table__
+    dialecto = db.session.get_bind().dialect.name
+
+    if dialecto == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as insert_mysql
+        sentencia = insert_mysql(tabla)
+        valores = {columna: tabla.c[columna] + sentencia.inserted[columna] for columna in sumar}
+        valores.update({columna: sentencia.inserted[columna] for columna in asignar})
+        db.session.execute(sentencia.on_duplicate_key_update(**valores), filas)
+        return
+
+    if dialecto in ('sqlite', 'postgresql'):
+        if dialecto == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        sentencia = insert_dialecto(tabla)
+        valores = {columna: tabla.c[columna] + sentencia.excluded[columna] for columna in sumar}
+        valores.update({columna: sentencia.excluded[columna] for columna in asignar})
+        db.session.execute(sentencia.on_conflict_do_update(index_elements=list(llaves), set_=valores), filas)
+        return
+
+    # Otros motores (p. ej. IRIS)
+    _actualizar_o_insertar(tabla, filas, llaves, sumar, asignar)
+
+
+def _actualizar_o_insertar(tabla, filas, llaves, sumar, asignar=()):
+    """
+    Actualiza y, si el renglón no existe, lo inserta. Si otra transacción insertó el
+    mismo renglón entre el UPDATE y el INSERT, la llave única lo rechaza y se vuelve
+    a sumar sobre el renglón ya existente.
+    """
+    for fila in filas:
+        valores = {columna: tabla.c[columna] + fila[columna] for columna in sumar}
+        valores.update({columna: fila[columna] for columna in asignar})
+        sentencia = (update(tabla)
+                     .where(*[tabla.c[llave] == fila[llave] for llave in llaves])
+                     .values(**valores))
+        if db.session.execute(sentencia).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(tabla), [fila])
+        except IntegrityError:
+            if not db.session.execute(sentencia).rowcount:
+                raise
@@ -0,0 +1,118 @@
+"""
+Alertas de galletas por agotarse y de lotes por caducar.
+
+Se calculan con dos consultas que no dependen del historial de lotes: el
+agotamiento compara el contador Galleta.existencia (que mantiene services/stock.py)
+contra el umbral de cada galleta, o ALERTA_EXISTENCIA_MINIMA si no tiene; la
+caducidad solo trae lotes con existencia que caducan en ALERTA_DIAS_CADUCIDAD
+días o antes. El resultado se guarda en memoria hasta que se confirma un
+movimiento de existencias o pasan ALERTAS_CACHE_TTL segundos (para ver los
+movimientos hechos en otros workers).
+
+`flask alertas-resumen` imprime el resumen del día; está pensado para correrse
+desde cron y enviar la salida por correo.
+"""
+import threading
+from datetime import date, timedelta
+
+import click
+from cachetools import TTLCache
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from extensions import db
+from model.galleta import Galleta
+from model.lote_galleta import LoteGalletas
+from services import catalogo
+
+_cache = None
+_lock = threading.Lock()
+
+
+def _cache_alertas():
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(maxsize=16, ttl=current_app.config.get('ALERTAS_CACHE_TTL', 300))
+    return _cache
+
+
+def agotamiento(tipo_id):
+    """Galletas del tipo con existencia en o bajo su umbral, de la más escasa a la menos."""
+    umbral = func.coalesce(Galleta.umbral_alerta, current_app.config.get('ALERTA_EXISTENCIA_MINIMA', 30))
+    filas = (db.session.query(Galleta.id_galleta, Galleta.galleta, Galleta.existencia, umbral)
+             .filter(Galleta.tipo_galleta_id == tipo_id, Galleta.existencia <= umbral)
+             .order_by(Galleta.existencia, Galleta.galleta)
+             .all())
+    return [{'galleta_id': galleta_id, 'nombre': nombre, 'total': existencia, 'umbral': limite}
+            for galleta_id, nombre, existencia, limite in filas]
+
+
+def caducidad(tipo_id, hoy):
+    """Lotes del tipo que todavía tienen existencia y caducan dentro de ALERTA_DIAS_CADUCIDAD días."""
+    limite = hoy + timedelta(days=current_app.config.get('ALERTA_DIAS_CADUCIDAD', 3))
+    filas = (db.session.query(LoteGalletas.id_lote, Galleta.id_galleta, Galleta.galleta,
+                              LoteGalletas.existencia, LoteGalletas.fechaCaducidad)
+             .join(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
+             .filter(Galleta.tipo_galleta_id == tipo_id,
+                     LoteGalletas.existencia > 0,
+                     LoteGalletas.fechaCaducidad <= limite)
+             .order_by(LoteGalletas.fechaCaducidad, LoteGalletas.id_lote)
+             .all())
+    return [{'lote_id': lote_id, 'galleta_id': galleta_id, 'nombre': nombre, 'existencia': existencia,
+             'fecha_caducidad': caduca, 'dias_restantes': (caduca - hoy).days}
+            for lote_id, galleta_id, nombre, existencia, caduca in filas]
+
+
+def alertas(hoy=None):
+    """Alertas de las galletas por Unidad: {'agotamiento': [...], 'caducidad': [...]}."""
+    hoy = hoy or date.today()
+    cache = _cache_alertas()
+    with _lock:
+        if hoy in cache:
+            return cache[hoy]
+
+    unidad = catalogo.tipo_por_nombre('Unidad')
+    if unidad is None:
+        resultado = {'agotamiento': [], 'caducidad': []}
+    else:
+        resultado = {'agotamiento': agotamiento(unidad['id_tipo_galleta']),
+                     'caducidad': caducidad(unidad['id_tipo_galleta'], hoy)}
+    with _lock:
+        cache[hoy] = resultado
+    return resultado
+
+
+def invalidar():
+    """Las alertas se recalculan después del commit de la transacción actual."""
+    db.session.info['alertas_invalidadas'] = True
+
+
+def limpiar():
+    with _lock:
+        if _cache is not None:
+            _cache.clear()
+
+
+@event.listens_for(Session, 'after_commit')
+def _despues_de_commit(sesion):
+    if sesion.info.pop('alertas_invalidadas', False):
+        limpiar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _despues_de_rollback(sesion):
+    sesion.info.pop('alertas_invalidadas', None)
+
+
+@click.command('alertas-resumen')
+def alertas_resumen_command():
+    """Imprime las galletas por agotarse y los lotes por caducar."""
+    resultado = alertas()
+    click.echo(f"Alertas de galletas al {date.today().isoformat()}")
+    click.echo(f"Por agotarse: {len(resultado['agotamiento'])}")
+    for alerta in resultado['agotamiento']:
+        click.echo(f"  {alerta['nombre']}: {alerta['total']} en existencia (umbral {alerta['umbral']})")
+    click.echo(f"Por caducar: {len(resultado['caducidad'])}")
+    for alerta in resultado['caducidad']:
+        click.echo(f"  {alerta['nombre']}, lote {alerta['lote_id']}: {alerta['existencia']} piezas, "
+                   f"caduca {alerta['fecha_caducidad'].isoformat()} ({alerta['dias_restantes']} días)")
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+
+
+class AlmacenLocal:
+    """
+    Almacén de PDFs de tickets en el sistema de archivos, con directorios repartidos
+    por prefijo del hash. Los PDFs se guardan por el hash de su contenido; la venta
+    solo guarda la clave.
+    """
+
+    def __init__(self, raiz, comprimir=False):
+        self.raiz = raiz
+        self.comprimir = comprimir
+
+    @staticmethod
+    def calcular_clave(datos):
+        return hashlib.sha256(datos).hexdigest()
+
+    def _ruta_archivo(self, clave, comprimido):
+        extension = '.pdf.gz' if comprimido else '.pdf'
+        return os.path.join(self.raiz, clave[:2], clave[2:4], clave + extension)
+
+    def _buscar(self, clave):
+        # Se busca en ambos formatos por si cambió la configuración de compresión
+        for comprimido in (self.comprimir, not self.comprimir):
+            ruta = self._ruta_archivo(clave, comprimido)
+            if os.path.exists(ruta):
+                return ruta, comprimido
+        return None, None
+
+    def guardar(self, datos):
+        clave = self.calcular_clave(datos)
+        if self.existe(clave):
+            return clave
+
+        ruta = self._ruta_archivo(clave, self.comprimir)
+        directorio = os.path.dirname(ruta)
+        os.makedirs(directorio, exist_ok=True)
+
+        contenido = gzip.compress(datos) if self.comprimir else datos
+
+        # Escribir en un temporal y renombrar para que nunca se lea un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=directorio)
+        try:
+            with os.fdopen(fd, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+        return clave
+
+    def leer(self, clave):
+        ruta, comprimido = self._buscar(clave)
+        if ruta is None:
+            raise FileNotFoundError(clave)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        return gzip.decompress(contenido) if comprimido else contenido
+
+    def existe(self, clave):
+        return self._buscar(clave)[0] is not None
+
+    def ruta(self, clave):
+        """Ruta en disco del PDF sin comprimir, o None si no se puede servir directo."""
+        ruta, comprimido = self._buscar(clave)
+        return ruta if ruta and not comprimido else None
+
+
+ALMACENES = {
+    'local': lambda app: AlmacenLocal(
+        app.config.get('TICKETS_DIR') or os.path.join(app.instance_path, 'tickets'),
+        comprimir=app.config.get('TICKETS_GZIP', False)
+    ),
+}
+
+
+def init_app(app):
+    tipo = app.config.get('TICKETS_ALMACEN', 'local')
+    app.extensions['almacen_tickets'] = ALMACENES[tipo](app)
+
+
+def almacen_actual():
+    return current_app.extensions['almacen_tickets']
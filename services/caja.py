@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+import click
+from sqlalchemy import insert
+from extensions import db
+from model.venta import Venta
+from model.caja_diaria import CajaDiaria
+from services.acumulados import sumar_o_insertar
+
+
+def registrar_venta(venta):
+    """Suma la venta a la caja del día. Se llama en la transacción de la venta."""
+    sumar_o_insertar(CajaDiaria, [{
+        'fecha': venta.fecha,
+        'tipoVenta': venta.tipoVenta,
+        'hora': venta.hora.hour,
+        'total': Decimal(str(venta.total)),
+        'ventas': 1
+    }], llaves=('fecha', 'tipoVenta', 'hora'), sumar=('total', 'ventas'))
+
+
+def total_dia(fecha):
+    """Total vendido en el día, o None si no hubo ventas. Lee a lo más 24 renglones por tipo de venta."""
+    return (db.session.query(db.func.sum(CajaDiaria.total))
+            .filter(CajaDiaria.fecha == fecha)
+            .scalar())
+
+
+def desglose_dia(fecha):
+    """Totales del día por tipo de venta y por hora."""
+    renglones = (db.session.query(CajaDiaria.tipoVenta, CajaDiaria.hora, CajaDiaria.total, CajaDiaria.ventas)
+                 .filter(CajaDiaria.fecha == fecha)
+                 .order_by(CajaDiaria.hora)
+                 .all())
+
+    por_tipo = {}
+    por_hora = {}
+    for tipo_venta, hora, total, ventas in renglones:
+        tipo = por_tipo.setdefault(tipo_venta, {'total': Decimal('0'), 'ventas': 0})
+        tipo['total'] += total
+        tipo['ventas'] += ventas
+        acumulado = por_hora.setdefault(hora, {'total': Decimal('0'), 'ventas': 0})
+        acumulado['total'] += total
+        acumulado['ventas'] += ventas
+    return {'por_tipo': por_tipo, 'por_hora': por_hora}
+
+
+def reconstruir(desde=None):
+    """Recalcula la caja diaria desde la tabla de ventas."""
+    borrar = db.session.query(CajaDiaria)
+    if desde:
+        borrar = borrar.filter(CajaDiaria.fecha >= desde)
+    borrar.delete(synchronize_session=False)
+
+    ventas = (db.session.query(Venta.fecha, Venta.tipoVenta, Venta.hora, Venta.total)
+              .order_by(Venta.fecha))
+    if desde:
+        ventas = ventas.filter(Venta.fecha >= desde)
+
+    # La hora se agrupa en Python porque cada motor extrae la hora distinto
+    acumulado = {}
+    for fecha, tipo_venta, hora, total in ventas.yield_per(1000):
+        renglon = acumulado.setdefault((fecha, tipo_venta, hora.hour), [Decimal('0'), 0])
+        renglon[0] += total
+        renglon[1] += 1
+
+    filas = [
+        {'fecha': fecha, 'tipoVenta': tipo_venta, 'hora': hora, 'total': total, 'ventas': cantidad}
+        for (fecha, tipo_venta, hora), (total, cantidad) in acumulado.items()
+    ]
+    if filas:
+        db.session.execute(insert(CajaDiaria), filas)
+
+
+@click.command('reconstruir-caja')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), help='Solo a partir de esta fecha.')
+def reconstruir_caja_command(desde):
+    """Recalcula la caja diaria a partir de las ventas registradas."""
+    reconstruir(desde.date() if desde else None)
+    db.session.commit()
+    click.echo("Caja diaria reconstruida.")
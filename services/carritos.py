@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from cachetools import TTLCache
+from flask import session
+
+
+class CarritosMemoria:
+    """Carritos en memoria del proceso (LRU con expiración). Solo sirve con un worker."""
+
+    def __init__(self, ttl, maximo):
+        self.cache = TTLCache(maxsize=maximo, ttl=ttl)
+        self.lock = threading.Lock()
+
+    def leer(self, clave):
+        with self.lock:
+            lineas = self.cache.get(clave)
+            if lineas is not None:
+                # Se vuelve a guardar para renovar la expiración
+                self.cache[clave] = lineas
+            return [dict(linea) for linea in lineas] if lineas else []
+
+    def escribir(self, clave, lineas):
+        with self.lock:
+            self.cache[clave] = [dict(linea) for linea in lineas]
+
+    def borrar(self, clave):
+        with self.lock:
+            self.cache.pop(clave, None)
+
+    def modificar(self, clave, cambio):
+        with self.lock:
+            lineas = cambio([dict(linea) for linea in self.cache.get(clave) or []])
+            if lineas is None:
+                return None
+            if lineas:
+                self.cache[clave] = [dict(linea) for linea in lineas]
+            else:
+                self.cache.pop(clave, None)
+            return lineas
+
+
+class CarritosSQLite:
+    """Carritos en un archivo SQLite local, compartido entre los workers del servidor."""
+
+    def __init__(self, ruta, ttl):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conexion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS carritos ("
+                "clave TEXT PRIMARY KEY, datos TEXT NOT NULL, expira REAL NOT NULL)"
+            )
+
+    def _conexion(self):
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=5)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            self.local.conexion = conexion
+        return conexion
+
+    def leer(self, clave):
+        conexion = self._conexion()
+        fila = conexion.execute(
+            "SELECT datos FROM carritos WHERE clave = ? AND expira > ?", (clave, time.time())
+        ).fetchone()
+        return json.loads(fila[0]) if fila else []
+
+    def escribir(self, clave, lineas):
+        with self._conexion() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO carritos (clave, datos, expira) VALUES (?, ?, ?)",
+                (clave, json.dumps(lineas), time.time() + self.ttl)
+            )
+            # Limpieza ocasional de carritos vencidos
+            if uuid.uuid4().int % 100 == 0:
+                conexion.execute("DELETE FROM carritos WHERE expira <= ?", (time.time(),))
+
+    def borrar(self, clave):
+        with self._conexion() as conexion:
+            conexion.execute("DELETE FROM carritos WHERE clave = ?", (clave,))
+
+    def modificar(self, clave, cambio):
+        # BEGIN IMMEDIATE toma el candado de escritura antes de leer: otro worker espera
+        with self._conexion() as conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            fila = conexion.execute(
+                "SELECT datos FROM carritos WHERE clave = ? AND expira > ?", (clave, time.time())
+            ).fetchone()
+            lineas = cambio(json.loads(fila[0]) if fila else [])
+            if lineas is None:
+                return None
+            if lineas:
+                conexion.execute(
+                    "INSERT OR REPLACE INTO carritos (clave, datos, expira) VALUES (?, ?, ?)",
+                    (clave, json.dumps(lineas), time.time() + self.ttl)
+                )
+            else:
+                conexion.execute("DELETE FROM carritos WHERE clave = ?", (clave,))
+            return lineas
+
+
+class CarritosRedis:
+    """Carritos en cualquier servidor compatible con Redis (Redis, Valkey, KeyDB...)."""
+
+    def __init__(self, url, ttl):
+        import redis  # Dependencia opcional, solo se requiere con este backend
+        self.cliente = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.conflicto = redis.WatchError
+
+    def leer(self, clave):
+        datos = self.cliente.get(f"carrito:{clave}")
+        if datos is None:
+            return []
+        self.cliente.expire(f"carrito:{clave}", self.ttl)
+        return json.loads(datos)
+
+    def escribir(self, clave, lineas):
+        self.cliente.set(f"carrito:{clave}", json.dumps(lineas), ex=self.ttl)
+
+    def borrar(self, clave):
+        self.cliente.delete(f"carrito:{clave}")
+
+    def modificar(self, clave, cambio):
+        # WATCH: si otro worker cambia el carrito antes del EXEC se vuelve a intentar
+        llave = f"carrito:{clave}"
+        with self.cliente.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(llave)
+                    datos = pipe.get(llave)
+                    lineas = cambio(json.loads(datos) if datos else [])
+                    if lineas is None:
+                        return None
+                    pipe.multi()
+                    if lineas:
+                        pipe.set(llave, json.dumps(lineas), ex=self.ttl)
+                    else:
+                        pipe.delete(llave)
+                    pipe.execute()
+                    return lineas
+                except self.conflicto:
+                    continue
+
+
+class Carritos:
+    """
+    Carritos guardados del lado del servidor. La cookie de sesión solo guarda
+    el identificador del carrito, no sus renglones.
+
+    Los cambios que dependen de lo que ya tiene el carrito (agregar, quitar,
+    modificar) leen y escriben de forma atómica por carrito, así dos pestañas
+    o dos workers no se pisan los renglones.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        tipo = app.config.get('CARRITOS_BACKEND', 'memoria')
+        ttl = app.config.get('CARRITOS_TTL', 4 * 60 * 60)
+
+        if tipo == 'sqlite':
+            ruta = app.config.get('CARRITOS_SQLITE_PATH') or os.path.join(app.instance_path, 'carritos.db')
+            self.backend = CarritosSQLite(ruta, ttl)
+        elif tipo == 'redis':
+            self.backend = CarritosRedis(app.config['CARRITOS_REDIS_URL'], ttl)
+        else:
+            self.backend = CarritosMemoria(ttl, app.config.get('CARRITOS_MAX', 10000))
+        app.extensions['carritos'] = self
+
+    def obtener(self, clave):
+        return self.backend.leer(clave)
+
+    def guardar(self, clave, lineas):
+        if lineas:
+            self.backend.escribir(clave, lineas)
+        else:
+            self.backend.borrar(clave)
+
+    def modificar(self, clave, cambio):
+        """
+        Aplica `cambio(lineas)` al carrito bajo un candado por carrito y guarda lo que
+        regresa. Si regresa None el carrito no se toca. Regresa los renglones nuevos o None.
+        """
+        return self.backend.modificar(clave, cambio)
+
+    def agregar(self, clave, linea):
+        return self.modificar(clave, lambda lineas: lineas + [linea])
+
+    def quitar(self, clave, indice=None, **criterio):
+        """Quita el renglón en `indice`, o los renglones cuyos campos coinciden con `criterio`."""
+        def cambio(lineas):
+            if indice is not None:
+                if 0 <= indice < len(lineas):
+                    del lineas[indice]
+            elif criterio:
+                lineas = [linea for linea in lineas
+                          if any(linea.get(campo) != valor for campo, valor in criterio.items())]
+            return lineas
+        return self.modificar(clave, cambio)
+
+    def limpiar(self, clave):
+        self.backend.borrar(clave)
+
+    def reservas(self, clave, campo='lote_id'):
+        """Cantidad apartada en el carrito agrupada por `campo` (por lote, por galleta...)."""
+        apartado = defaultdict(int)
+        for linea in self.obtener(clave):
+            apartado[linea[campo]] += linea['cantidad']
+        return dict(apartado)
+
+
+carritos = Carritos()
+
+
+def clave_carrito(prefijo):
+    """Clave del carrito de la sesión actual; se genera un identificador la primera vez."""
+    if 'carrito_id' not in session:
+        session['carrito_id'] = uuid.uuid4().hex
+    return f"{prefijo}:{session['carrito_id']}"
@@ -0,0 +1,166 @@
+"""
+Catálogo en memoria del proceso: tipos de galleta (nombre y precio), galletas, recetas
+y la lista de precios compilada (services/precios.py).
+
+Son tablas chicas que casi no cambian y se consultan en cada venta y en cada
+visita al portal. Se cargan completas en cuatro consultas y se guardan junto con la
+generación de la tabla catalogoVersion; a lo más cada CATALOGO_REVISION segundos
+se compara la generación con la de la base y, si otro worker la subió, se recarga.
+Quien modifique tipos, galletas, recetas o precios debe llamar a invalidar() antes del commit.
+
+Los renglones son dicts con los mismos nombres que las columnas del modelo, así que
+las plantillas pueden usarlos igual que los objetos (tipo.nombre, galleta.galleta).
+La existencia de las galletas no está aquí: cambia con cada venta.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from extensions import db
+from model.catalogo_version import CatalogoVersion
+from model.tipo_galleta import TipoGalleta
+from model.galleta import Galleta
+from model.receta import Receta
+from model.lista_precio import ListaPrecios
+from services import precios as lista_precios
+
+_lock = threading.Lock()
+_catalogo = None
+_revisado = 0.0
+
+
+def _generacion():
+    return db.session.query(CatalogoVersion.generacion).filter(CatalogoVersion.id == 1).scalar() or 0
+
+
+def _cargar(generacion):
+    tipos = {
+        id_tipo: {'id_tipo_galleta': id_tipo, 'nombre': nombre, 'costo': costo}
+        for id_tipo, nombre, costo in db.session.query(TipoGalleta.id_tipo_galleta, TipoGalleta.nombre,
+                                                       TipoGalleta.costo)
+    }
+    galletas = {}
+    for id_galleta, nombre, tipo_id, receta_id in db.session.query(
+            Galleta.id_galleta, Galleta.galleta, Galleta.tipo_galleta_id, Galleta.receta_id):
+        tipo = tipos.get(tipo_id, {})
+        galletas[id_galleta] = {'id_galleta': id_galleta, 'galleta': nombre, 'tipo_galleta_id': tipo_id,
+                                'receta_id': receta_id, 'tipo': tipo.get('nombre'), 'costo': tipo.get('costo')}
+    recetas = {
+        id_receta: {'idReceta': id_receta, 'nombreReceta': nombre, 'estatus': estatus,
+                    'cantidad_galletas': cantidad}
+        for id_receta, nombre, estatus, cantidad in db.session.query(
+            Receta.idReceta, Receta.nombreReceta, Receta.estatus, Receta.cantidad_galletas)
+    }
+    filas = db.session.query(ListaPrecios.galleta_id, ListaPrecios.tipo_galleta_id,
+                             ListaPrecios.precio, ListaPrecios.unidades).all()
+    precios, presentaciones = lista_precios.compilar(tipos, galletas, filas)
+    for id_galleta, galleta in galletas.items():
+        galleta['precio'], galleta['unidades'] = precios[id_galleta]
+    return {'generacion': generacion, 'tipos': tipos, 'galletas': galletas, 'recetas': recetas,
+            'presentaciones': presentaciones}
+
+
+def catalogo():
+    """Copia vigente del catálogo; la carga o recarga si hace falta."""
+    global _catalogo, _revisado
+    ahora = time.monotonic()
+    with _lock:
+        actual, revisado = _catalogo, _revisado
+    if actual is not None and ahora - revisado < current_app.config.get('CATALOGO_REVISION', 2):
+        return actual
+
+    generacion = _generacion()
+    if actual is None or actual['generacion'] != generacion:
+        actual = _cargar(generacion)
+    with _lock:
+        _catalogo, _revisado = actual, ahora
+    return actual
+
+
+def _id(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def tipos():
+    """Tipos de galleta ordenados por id."""
+    return [tipo for _, tipo in sorted(catalogo()['tipos'].items())]
+
+
+def tipo(id_tipo):
+    return catalogo()['tipos'].get(_id(id_tipo))
+
+
+def tipo_por_nombre(nombre):
+    return next((tipo for tipo in tipos() if tipo['nombre'] == nombre), None)
+
+
+def galleta(id_galleta):
+    """Galleta con su nombre, el costo de su tipo y su precio de lista, o None."""
+    return catalogo()['galletas'].get(_id(id_galleta))
+
+
+def precio(id_galleta):
+    """Precio de venta de la galleta en su propia presentación, o None si no existe."""
+    galleta_ = galleta(id_galleta)
+    return galleta_['precio'] if galleta_ else None
+
+
+def presentaciones(id_galleta):
+    """Presentaciones en que se vende la galleta: clave, etiqueta, precio y piezas por empaque."""
+    return catalogo()['presentaciones'].get(_id(id_galleta), [])
+
+
+def galletas(tipo_id=None):
+    """Galletas ordenadas por id, opcionalmente de un solo tipo."""
+    tipo_id = _id(tipo_id) if tipo_id is not None else None
+    return [galleta for _, galleta in sorted(catalogo()['galletas'].items())
+            if tipo_id is None or galleta['tipo_galleta_id'] == tipo_id]
+
+
+def receta(id_receta):
+    return catalogo()['recetas'].get(_id(id_receta))
+
+
+def recetas(activas=True):
+    """Recetas ordenadas por id; por omisión solo las activas."""
+    return [receta for _, receta in sorted(catalogo()['recetas'].items())
+            if not activas or receta['estatus'] == 1]
+
+
+def invalidar():
+    """
+    Sube la generación en la base para que los demás workers recarguen y descarta
+    la copia local. El commit lo hace quien llama; al confirmarse se vuelve a
+    descartar la copia local por si otro hilo la recargó antes del commit.
+    """
+    resultado = db.session.execute(
+        update(CatalogoVersion).where(CatalogoVersion.id == 1)
+        .values(generacion=CatalogoVersion.generacion + 1)
+    )
+    if not resultado.rowcount:
+        db.session.add(CatalogoVersion(id=1, generacion=1))
+    db.session.info['catalogo_invalidado'] = True
+    limpiar()
+
+
+def limpiar():
+    """Descarta la copia local; la siguiente consulta vuelve a cargar el catálogo."""
+    global _catalogo
+    with _lock:
+        _catalogo = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _despues_de_commit(sesion):
+    if sesion.info.pop('catalogo_invalidado', False):
+        limpiar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _despues_de_rollback(sesion):
+    sesion.info.pop('catalogo_invalidado', None)
@@ -0,0 +1,285 @@
+"""
+Generador de datos sintéticos para perfilar con volúmenes de producción.
+
+Llena una base vacía con catálogo, personal, clientes, inventario, pedidos y un
+año de ventas consistentes entre sí: cada venta sale de un lote producido antes de
+la fecha de venta y aún vigente, la existencia de cada lote es lo producido menos
+lo vendido y la de cada galleta es la suma de sus lotes. Con la misma escala y la
+misma semilla se generan siempre los mismos datos.
+
+Se inserta en bloques con INSERT de varios renglones e ids explícitos.
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from math import ceil
+
+import click
+from sqlalchemy import bindparam, insert, update
+from werkzeug.security import generate_password_hash
+from extensions import db
+from model.tipo_galleta import TipoGalleta
+from model.proveedor import Proveedor
+from model.insumo import Insumos
+from model.lote_insumo import LoteInsumo
+from model.receta import Receta
+from model.receta_insumo import RecetaInsumo
+from model.galleta import Galleta
+from model.lote_galleta import LoteGalletas
+from model.persona import Persona
+from model.usuario import Usuario
+from model.cliente import Cliente
+from model.empleado import Empleado
+from model.orden import Orden
+from model.detalle_venta_orden import DetalleVentaOrden
+from model.solicitud_produccion import SolicitudProduccion
+from model.venta import Venta
+from model.detalle_venta import DetalleVentaGalletas
+from services import resumen_ventas, caja, catalogo, precios, alertas
+
+ESCALAS = {
+    'chica': dict(clientes=50, empleados=6, proveedores=3, insumos=30, galletas=20, lotes=20,
+                  ordenes=400, pendientes=200, ventas=2000, renglones=5),
+    'mediana': dict(clientes=500, empleados=20, proveedores=10, insumos=60, galletas=60, lotes=30,
+                    ordenes=3000, pendientes=500, ventas=20000, renglones=8),
+    # 100 mil ventas de 10 renglones en promedio: alrededor de un millón de detalles
+    'grande': dict(clientes=2000, empleados=50, proveedores=20, insumos=100, galletas=100, lotes=50,
+                   ordenes=10000, pendientes=1000, ventas=100000, renglones=10),
+}
+
+TIPOS = [(1, 'Unidad', 10), (2, 'Caja De Kilo', 250), (3, 'Caja De 700 Gramos', 180)]
+SABORES = ['Chispas', 'Nuez', 'Avena', 'Mantequilla', 'Chocolate', 'Coco', 'Canela', 'Limón', 'Fresa', 'Vainilla']
+INSUMOS = ['Harina', 'Azúcar', 'Mantequilla', 'Huevo', 'Leche', 'Chocolate', 'Nuez', 'Avena', 'Vainilla', 'Canela']
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Sofía', 'Carlos', 'Lucía', 'Miguel', 'Elena', 'Jorge']
+APELLIDOS = ['Pérez', 'López', 'García', 'Hernández', 'Martínez', 'Gómez', 'Ramírez', 'Torres', 'Flores', 'Luna']
+ROLES = [('ADMI', 'Administrador'), ('CAJA', 'Cajero'), ('PROD', 'Producción')]
+
+CONTRASENIA = 'galletas123'  # Misma contraseña para todos los usuarios generados
+DIAS = 365
+CADUCIDAD_DIAS = 30
+BLOQUE = 5000
+
+
+def _insertar(modelo, filas):
+    for inicio in range(0, len(filas), BLOQUE):
+        db.session.execute(insert(modelo.__table__), filas[inicio:inicio + BLOQUE])
+
+
+def _persona(i, rng):
+    return {'idPersona': i, 'genero': rng.choice('MFO'), 'apPaterno': rng.choice(APELLIDOS),
+            'apMaterno': rng.choice(APELLIDOS), 'nombre': rng.choice(NOMBRES),
+            'telefono': f'477{rng.randint(0, 9999999):07d}', 'calle': 'Hidalgo', 'numero': rng.randint(1, 999),
+            'colonia': 'Centro', 'codigoPostal': 37000 + rng.randint(0, 999), 'email': f'persona{i}@example.com',
+            'fechaNacimiento': date(1960, 1, 1) + timedelta(days=rng.randint(0, 15000))}
+
+
+def base_vacia():
+    """True si la base no tiene catálogo ni personas (los ids se insertan explícitos)."""
+    return (db.session.query(Galleta.id_galleta).first() is None
+            and db.session.query(Persona.idPersona).first() is None)
+
+
+def generar(escala='chica', semilla=1, existencia=1_000_000, **volumenes):
+    """
+    Llena la base vacía con la escala indicada; `volumenes` sobrescribe cualquier
+    cantidad de ESCALAS. `existencia` es lo que queda en cada lote vigente.
+    Regresa los ids que usan los benchmarks y el número de renglones por tabla.
+    El commit lo hace quien llama.
+    """
+    volumen = dict(ESCALAS[escala], **{k: v for k, v in volumenes.items() if v is not None})
+    rng = random.Random(semilla)
+    hoy = date.today()
+    inicio = hoy - timedelta(days=DIAS)
+    contrasenia = generate_password_hash(CONTRASENIA)
+
+    _insertar(TipoGalleta, [{'id_tipo_galleta': i, 'nombre': n, 'costo': c} for i, n, c in TIPOS])
+
+    # Personas: primero los clientes (el 1 es el cliente de prueba del portal) y después los empleados
+    clientes = range(1, volumen['clientes'] + 1)
+    empleados = range(volumen['clientes'] + 1, volumen['clientes'] + volumen['empleados'] + 1)
+    _insertar(Persona, [_persona(i, rng) for i in (*clientes, *empleados)])
+    _insertar(Usuario, [{'idUsuario': i, 'nombreUsuario': f'cliente{i}', 'estatus': 1,
+                         'contrasenia': contrasenia, 'rol': 'CLIE'} for i in clientes])
+    _insertar(Usuario, [{'idUsuario': i, 'nombreUsuario': f'empleado{i}', 'estatus': 1,
+                         'contrasenia': contrasenia, 'rol': ROLES[n % len(ROLES)][0]}
+                        for n, i in enumerate(empleados)])
+    _insertar(Cliente, [{'idCliente': i, 'idPersona': i, 'idUsuario': i} for i in clientes])
+    _insertar(Empleado, [{'idEmpleado': n + 1, 'puesto': ROLES[n % len(ROLES)][1], 'curp': f'XEXX{i:014d}',
+                          'rfc': f'XAXX{i:09d}', 'salarioBruto': rng.randint(8000, 30000),
+                          'fechaIngreso': inicio - timedelta(days=rng.randint(0, 2000)), 'idPersona': i,
+                          'idUsuario': i} for n, i in enumerate(empleados)])
+
+    # Proveedores e insumos con lotes de sobra para que la producción no se detenga
+    proveedores = range(1, volumen['proveedores'] + 1)
+    _insertar(Proveedor, [{'id_proveedor': i, 'empresa': f'Proveedor {i}', 'fechaRegistro': inicio,
+                           'estatus': 1, 'calle': 'Juárez', 'numero': i, 'colonia': 'Industrial',
+                           'codigoPostal': 37000, 'telefono': f'477{i:07d}', 'email': f'ventas{i}@example.com',
+                           'rfc': f'PRO{i:09d}'} for i in proveedores])
+    insumos = range(1, volumen['insumos'] + 1)
+    nombre_insumo = {i: f'{INSUMOS[(i - 1) % len(INSUMOS)]} {(i - 1) // len(INSUMOS) + 1}' for i in insumos}
+    lotes_insumo = [{'id_insumo': i, 'fechaIngreso': hoy - timedelta(days=7 * n),
+                     'fechaCaducidad': hoy + timedelta(days=180 - 7 * n), 'cantidad': 10_000_000, 'costo': 100}
+                    for i in insumos for n in range(5)]
+    _insertar(Insumos, [{'id_insumo': i, 'nombreInsumo': nombre_insumo[i], 'marca': 'Genérica', 'unidad': 'Gramos',
+                         'total': 5 * 10_000_000, 'id_proveedor': proveedores[i % len(proveedores)]}
+                        for i in insumos])
+    _insertar(LoteInsumo, lotes_insumo)
+
+    # Una receta de cuatro insumos por galleta
+    galletas = range(1, volumen['galletas'] + 1)
+    recetas, renglones_receta = [], []
+    for i in galletas:
+        elegidos = rng.sample(list(insumos), min(4, len(insumos)))
+        cantidades = [rng.randint(50, 500) for _ in elegidos]
+        recetas.append({'idReceta': i, 'nombreReceta': f'Receta {i}', 'estatus': 1, 'cantidad_galletas': 50,
+                        'ingredientes': [{'insumo': nombre_insumo[e], 'unidad': 'Gramos', 'cantidad': str(c)}
+                                         for e, c in zip(elegidos, cantidades)]})
+        renglones_receta.extend({'receta_id': i, 'insumo_id': e, 'cantidad': c, 'unidad': 'Gramos'}
+                                for e, c in zip(elegidos, cantidades))
+    _insertar(Receta, recetas)
+    _insertar(RecetaInsumo, renglones_receta)
+
+    tipo_de = {i: TIPOS[(i - 1) % len(TIPOS)][0] for i in galletas}
+    precio_de = {tipo: costo for tipo, _, costo in TIPOS}
+    _insertar(Galleta, [{'id_galleta': i, 'tipo_galleta_id': tipo_de[i], 'existencia': 0, 'receta_id': i,
+                         'galleta': f'{SABORES[(i - 1) % len(SABORES)]} {(i - 1) // len(SABORES) + 1}'}
+                        for i in galletas])
+    db.session.add_all(precios.filas_iniciales())
+
+    # Lotes repartidos a lo largo del año: cada venta usa el último lote producido antes de su fecha
+    por_galleta = volumen['lotes']
+    paso = DIAS / por_galleta
+    lotes = []
+    for i in galletas:
+        for n in range(por_galleta):
+            produccion = inicio + timedelta(days=int(n * paso))
+            lotes.append({'id_lote': len(lotes) + 1, 'galleta_id': i, 'fechaProduccion': produccion,
+                          'fechaCaducidad': produccion + timedelta(days=ceil(paso) + CADUCIDAD_DIAS),
+                          'cantidad': 0, 'costo': 450, 'existencia': 0})
+    _insertar(LoteGalletas, lotes)
+
+    def lote_de(galleta, fecha):
+        n = min(int((fecha - inicio).days / paso), por_galleta - 1)
+        return (galleta - 1) * por_galleta + n + 1
+
+    vendidos = defaultdict(int)
+    ventas, detalles = [], []
+    conteo = defaultdict(int)
+
+    def vender(fecha, hora, tipo_venta, renglones):
+        id_venta = conteo['ventas'] + 1
+        conteo['ventas'] += 1
+        total = 0
+        for galleta, cantidad in renglones:
+            lote = lote_de(galleta, fecha)
+            subtotal = cantidad * precio_de[tipo_de[galleta]]
+            vendidos[lote] += cantidad
+            total += subtotal
+            detalles.append({'venta_id': id_venta, 'lote_id': lote, 'cantidad': cantidad, 'subtotal': subtotal,
+                             'precioUnitario': precio_de[tipo_de[galleta]]})
+        ventas.append({'id_venta': id_venta, 'total': total, 'fecha': fecha, 'hora': hora,
+                       'ticket': f'Venta-{id_venta}', 'tipoVenta': tipo_venta})
+
+    def vaciar():
+        _insertar(Venta, ventas)
+        _insertar(DetalleVentaGalletas, detalles)
+        conteo['detalles'] += len(detalles)
+        ventas.clear()
+        detalles.clear()
+
+    # Pedidos: los pendientes son de la última semana, los demás se entregaron y se cobraron
+    ordenes, detalles_orden, solicitudes, pendientes = [], [], [], []
+    entregas = defaultdict(list)
+    for id_orden in range(1, volumen['ordenes'] + 1):
+        pendiente = id_orden > volumen['ordenes'] - volumen['pendientes']
+        dias = rng.randint(0, 7) if pendiente else rng.randint(10, DIAS - 1)
+        alta = datetime.combine(hoy - timedelta(days=dias), time(rng.randint(8, 21), rng.randint(0, 59)))
+        renglones = [(rng.choice(galletas), rng.randint(1, 20)) for _ in range(rng.randint(1, 3))]
+        for galleta, cantidad in renglones:
+            detalles_orden.append({'id_detalleVentaOrden': len(detalles_orden) + 1, 'galletas_id': galleta,
+                                   'cantidad': cantidad, 'subtotal': cantidad * precio_de[tipo_de[galleta]],
+                                   'orden_id': id_orden})
+            solicitudes.append({'detalleorden_id': len(detalles_orden), 'estatus': 1 if pendiente else 2,
+                                'fechaCaducidad': alta.date() + timedelta(days=CADUCIDAD_DIAS)})
+        ordenes.append({'id_orden': id_orden, 'descripcion': 'Pedido de galletas', 'fechaAlta': alta,
+                        'total': sum(cantidad * precio_de[tipo_de[g]] for g, cantidad in renglones),
+                        'fechaEntrega': alta + timedelta(days=3), 'tipoVenta': 'Portal Cliente',
+                        'cliente_id': rng.choice(clientes)})
+        if pendiente:
+            pendientes.append(id_orden)
+        else:
+            entregas[(alta + timedelta(days=3)).date()].append(renglones)
+    _insertar(Orden, ordenes)
+    _insertar(DetalleVentaOrden, detalles_orden)
+    _insertar(SolicitudProduccion, solicitudes)
+
+    # Ventas día por día para que los ids sigan el orden cronológico
+    por_dia, sobrantes = divmod(volumen['ventas'], DIAS)
+    for dia in range(DIAS):
+        fecha = inicio + timedelta(days=dia)
+        horas = sorted(time(rng.randint(9, 20), rng.randint(0, 59)) for _ in range(por_dia + (dia < sobrantes)))
+        for hora in horas:
+            vender(fecha, hora, 'Punto de Venta',
+                   [(rng.choice(galletas), rng.randint(1, 12))
+                    for _ in range(rng.randint(1, volumen['renglones'] * 2 - 1))])
+        for renglones in entregas.get(fecha, []):
+            vender(fecha, time(20, 30), 'Portal Cliente', renglones)
+        if len(detalles) >= BLOQUE * 4:
+            vaciar()
+    vaciar()
+
+    # Cada lote produjo lo vendido más lo que le queda si sigue vigente
+    existencias = {}
+    for lote in lotes:
+        existencias[lote['id_lote']] = existencia if lote['fechaCaducidad'] >= hoy else 0
+    tabla = LoteGalletas.__table__
+    db.session.execute(
+        update(tabla).where(tabla.c.id_lote == bindparam('b_lote'))
+        .values(cantidad=bindparam('b_cantidad'), existencia=bindparam('b_existencia')),
+        [{'b_lote': id_lote, 'b_cantidad': vendidos[id_lote] + restante, 'b_existencia': restante}
+         for id_lote, restante in existencias.items()]
+    )
+    por_galleta_existencia = defaultdict(int)
+    for lote in lotes:
+        por_galleta_existencia[lote['galleta_id']] += existencias[lote['id_lote']]
+    tabla = Galleta.__table__
+    db.session.execute(
+        update(tabla).where(tabla.c.id_galleta == bindparam('b_galleta'))
+        .values(existencia=bindparam('b_existencia')),
+        [{'b_galleta': i, 'b_existencia': por_galleta_existencia[i]} for i in galletas]
+    )
+
+    resumen_ventas.reconstruir()
+    caja.reconstruir()
+    catalogo.invalidar()
+    alertas.invalidar()
+
+    return {
+        'galletas': list(galletas),
+        'galletas_unidad': [i for i in galletas if tipo_de[i] == 1],
+        'ordenes_pendientes': pendientes,
+        'renglones': {
+            'personas': len(clientes) + len(empleados), 'insumos': len(insumos),
+            'lotes_insumo': len(lotes_insumo), 'galletas': len(galletas), 'lotes': len(lotes),
+            'ordenes': len(ordenes), 'detalles_orden': len(detalles_orden),
+            'ventas': conteo['ventas'], 'detalles_venta': conteo['detalles'],
+        },
+    }
+
+
+@click.command('generar-datos')
+@click.option('--escala', type=click.Choice(list(ESCALAS)), default='chica', show_default=True)
+@click.option('--semilla', type=int, default=1, show_default=True, help='Misma semilla, mismos datos.')
+@click.option('--clientes', type=int, help='Sobrescribe el número de clientes de la escala.')
+@click.option('--galletas', type=int, help='Sobrescribe el número de galletas de la escala.')
+@click.option('--ordenes', type=int, help='Sobrescribe el número de pedidos de la escala.')
+@click.option('--ventas', type=int, help='Sobrescribe el número de ventas de la escala.')
+def generar_datos_command(escala, semilla, clientes, galletas, ordenes, ventas):
+    """Llena una base vacía con datos sintéticos para pruebas de volumen."""
+    if not base_vacia():
+        raise click.ClickException("La base ya tiene datos; el generador necesita una base vacía.")
+    resultado = generar(escala, semilla, clientes=clientes, galletas=galletas, ordenes=ordenes, ventas=ventas)
+    db.session.commit()
+    for tabla, cantidad in resultado['renglones'].items():
+        click.echo(f"{tabla:16} {cantidad:>10}")
+    click.echo(f"Usuarios cliente<n> y empleado<n> con contraseña '{CONTRASENIA}'.")
@@ -0,0 +1,85 @@
+import click
+from sqlalchemy import inspect, literal, text
+from extensions import db
+
+
+def columnas_faltantes():
+    """Compara los modelos con la base de datos y regresa las columnas que faltan por tabla."""
+    inspector = inspect(db.engine)
+    tablas_existentes = set(inspector.get_table_names())
+
+    faltantes = {}
+    for tabla in db.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            continue
+        existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        nuevas = [columna for columna in tabla.columns if columna.name not in existentes]
+        if nuevas:
+            faltantes[tabla.name] = nuevas
+    return faltantes
+
+
+def indices_faltantes():
+    """Índices declarados en los modelos que no existen en tablas ya creadas."""
+    inspector = inspect(db.engine)
+    tablas_existentes = set(inspector.get_table_names())
+
+    faltantes = []
+    for tabla in db.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            continue
+        existentes = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+        faltantes.extend(indice for indice in tabla.indexes if indice.name not in existentes)
+    return faltantes
+
+
+def llenados():
+    """
+    Tablas de acumulados que se llenan desde las ventas cuando se crean sobre una
+    base que ya tiene historial; sin esto la caja y el dashboard verían vacíos los días anteriores.
+    """
+    from services import caja, resumen_ventas
+
+    return {'cajaDiaria': caja.reconstruir, 'ventasDiarias': resumen_ventas.reconstruir}
+
+
+def actualizar_esquema():
+    """
+    Crea las tablas nuevas y agrega las columnas e índices nuevos a las tablas existentes.
+    No hay herramienta de migraciones en el proyecto, así que solo se agregan
+    columnas e índices (nunca se borran ni se cambian). Las tablas de acumulados
+    recién creadas se llenan con el historial de ventas.
+    """
+    tablas_existentes = set(inspect(db.engine).get_table_names())
+    db.create_all()
+
+    agregadas = []
+    for tabla, columnas in columnas_faltantes().items():
+        for columna in columnas:
+            tipo = columna.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE {tabla} ADD COLUMN {columna.name} {tipo}'
+            if columna.default is not None and columna.default.is_scalar:
+                valor = literal(columna.default.arg).compile(
+                    dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+                ddl += f' DEFAULT {valor}'
+            db.session.execute(text(ddl))
+            agregadas.append(f'{tabla}.{columna.name}')
+    for tabla, llenar in llenados().items():
+        if tabla not in tablas_existentes:
+            llenar()
+            agregadas.append(f'{tabla} (llenada con el historial de ventas)')
+    db.session.commit()
+
+    for indice in indices_faltantes():
+        indice.create(db.engine)
+        agregadas.append(f'{indice.table.name}.{indice.name}')
+    return agregadas
+
+
+@click.command('actualizar-esquema')
+def actualizar_esquema_command():
+    """Crea tablas, columnas e índices nuevos de los modelos."""
+    agregadas = actualizar_esquema()
+    for columna in agregadas:
+        click.echo(f"Agregado: {columna}")
+    click.echo("Esquema actualizado.")
@@ -0,0 +1,103 @@
+import re
+from datetime import date
+
+import click
+from extensions import db
+from model.venta import Venta
+from model.detalle_venta import DetalleVentaGalletas
+from model.lote_galleta import LoteGalletas
+from model.lote_insumo import LoteInsumo
+from model.solicitud_produccion import SolicitudProduccion
+from model.orden import Orden
+from services.esquema import indices_faltantes
+
+
+def consultas():
+    """
+    Consultas frecuentes de la aplicación, armadas igual que en los controladores
+    y servicios, con valores de ejemplo. Regresa [(nombre, sentencia)].
+    """
+    hoy = date.today()
+    return [
+        ('lotes FEFO por galleta',
+         db.select(LoteGalletas.id_lote, LoteGalletas.existencia)
+         .where(LoteGalletas.galleta_id.in_([1, 2]), LoteGalletas.fechaCaducidad >= hoy)
+         .order_by(LoteGalletas.galleta_id, LoteGalletas.fechaCaducidad, LoteGalletas.id_lote)),
+        ('lotes con existencia de una galleta',
+         db.select(LoteGalletas.id_lote)
+         .where(LoteGalletas.galleta_id == 1, LoteGalletas.existencia > 0)),
+        ('lotes por caducar',
+         db.select(LoteGalletas.id_lote)
+         .where(LoteGalletas.existencia > 0, LoteGalletas.fechaCaducidad <= hoy)),
+        ('ventas del día',
+         db.select(db.func.sum(Venta.total)).where(Venta.fecha == hoy)),
+        ('página de ventas',
+         db.select(Venta.id_venta, Venta.fecha, Venta.hora)
+         .where(Venta.fecha <= hoy)
+         .order_by(Venta.fecha.desc(), Venta.hora.desc(), Venta.id_venta.desc())
+         .limit(50)),
+        ('detalles de una venta',
+         db.select(DetalleVentaGalletas.lote_id, DetalleVentaGalletas.cantidad)
+         .where(DetalleVentaGalletas.venta_id == 1)),
+        ('lotes de insumo FIFO',
+         db.select(LoteInsumo.id_insumo, LoteInsumo.idLote, LoteInsumo.cantidad)
+         .where(LoteInsumo.id_insumo.in_([1, 2]), LoteInsumo.cantidad > 0)
+         .order_by(LoteInsumo.id_insumo, LoteInsumo.fechaIngreso, LoteInsumo.idLote)),
+        ('solicitudes de producción pendientes',
+         db.select(SolicitudProduccion.idSolicitud).where(SolicitudProduccion.estatus == 1)),
+        ('pedidos de un cliente',
+         db.select(Orden.id_orden)
+         .where(Orden.cliente_id == 1)
+         .order_by(Orden.fechaAlta.desc())),
+    ]
+
+
+def _tablas_recorridas(sentencia):
+    """Corre la sentencia con EXPLAIN y regresa las tablas que se leen completas."""
+    dialecto = db.engine.dialect
+    sql = str(sentencia.compile(dialect=dialecto, compile_kwargs={'literal_binds': True}))
+
+    if dialecto.name == 'sqlite':
+        plan = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)).all()
+        # "SCAN tabla" sin "USING ... INDEX" es un recorrido completo
+        return [re.match(r'SCAN (\S+)', fila[-1]).group(1) for fila in plan
+                if fila[-1].startswith('SCAN ') and 'INDEX' not in fila[-1]]
+
+    if dialecto.name == 'mysql':
+        plan = db.session.execute(db.text('EXPLAIN ' + sql)).mappings().all()
+        return [fila['table'] for fila in plan if fila['type'] == 'ALL']
+
+    if dialecto.name == 'postgresql':
+        plan = db.session.execute(db.text('EXPLAIN ' + sql)).scalars().all()
+        return [m.group(1) for linea in plan for m in [re.search(r'Seq Scan on (\S+)', linea)] if m]
+
+    raise click.ClickException(f"EXPLAIN no soportado para {dialecto.name}")
+
+
+def revisar():
+    """Regresa [(nombre, tablas)] de las consultas que leen alguna tabla completa."""
+    reporte = []
+    for nombre, sentencia in consultas():
+        tablas = _tablas_recorridas(sentencia)
+        if tablas:
+            reporte.append((nombre, tablas))
+    return reporte
+
+
+@click.command('revisar-indices')
+@click.option('--crear', is_flag=True, help='Crear los índices declarados en los modelos que falten.')
+def revisar_indices_command(crear):
+    """Revisa con EXPLAIN las consultas frecuentes y reporta recorridos completos de tablas."""
+    faltantes = indices_faltantes()
+    for indice in faltantes:
+        if crear:
+            indice.create(db.engine)
+            click.echo(f"Creado: {indice.table.name}.{indice.name}")
+        else:
+            click.echo(f"Falta: {indice.table.name}.{indice.name}")
+
+    reporte = revisar()
+    for nombre, tablas in reporte:
+        click.echo(f"Recorrido completo en {', '.join(tablas)}: {nombre}")
+    if not reporte:
+        click.echo("Ninguna consulta recorre tablas completas.")
@@ -0,0 +1,514 @@
+import bisect
+import cProfile
+import heapq
+import logging
+import os
+import random
+import re
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import (g, request, has_request_context, jsonify, abort, current_app, Response, template_rendered,
+                   before_render_template)
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Endpoints que no se miden
+EXCLUIDOS = {'static', 'metricas', 'metricas_lentas'}
+
+
+def solo_monitoreo(vista):
+    """
+    Las métricas exponen endpoints y sentencias SQL: con METRICAS_TOKEN se pide
+    `Authorization: Bearer <token>`; sin él solo se atienden peticiones locales.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        token = current_app.config.get('METRICAS_TOKEN')
+        if token:
+            autorizado = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        else:
+            autorizado = request.remote_addr in ('127.0.0.1', '::1')
+        if not autorizado:
+            abort(403)
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricasSQL:
+    """
+    Cuenta las consultas SQL y el tiempo en base de datos de cada request.
+    Se engancha a los eventos del Engine de SQLAlchemy; agrega el encabezado
+    Server-Timing, acumula totales por endpoint para /_metrics (formato Prometheus)
+    y registra en el log las consultas que pasan de SQL_LENTA_MS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.lock = threading.Lock()
+        self.totales = {}
+        self.lentas = []  # Montículo con las consultas más lentas: (segundos, endpoint, sentencia)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['metricas_sql'] = self
+        if not app.config.get('METRICAS_SQL', True):
+            return
+
+        # Se escucha en la clase Engine porque el engine de Flask-SQLAlchemy se crea después
+        if not event.contains(Engine, 'before_cursor_execute', _antes_de_consulta):
+            event.listen(Engine, 'before_cursor_execute', _antes_de_consulta)
+            event.listen(Engine, 'after_cursor_execute', _despues_de_consulta)
+
+        app.before_request(self._iniciar_request)
+        app.after_request(self._terminar_request)
+        app.add_url_rule('/_metrics', 'metricas', solo_monitoreo(self.exportar))
+        app.add_url_rule('/_metrics/lentas', 'metricas_lentas', solo_monitoreo(self.exportar_lentas))
+
+    def reiniciar(self):
+        with self.lock:
+            self.totales.clear()
+            self.lentas.clear()
+
+    def _iniciar_request(self):
+        g.sql_consultas = 0
+        g.sql_segundos = 0.0
+
+    def registrar_consulta(self, segundos, sentencia):
+        """Suma una consulta al request actual; se llama desde el evento del engine."""
+        if not has_request_context() or 'sql_consultas' not in g:
+            return
+        g.sql_consultas += 1
+        g.sql_segundos += segundos
+
+        if segundos * 1000 < self.app.config.get('SQL_LENTA_MS', 200):
+            return
+        endpoint = request.endpoint or request.path
+        g.sql_lentas = g.get('sql_lentas', 0) + 1
+        logger.warning("Consulta lenta (%.1f ms) en %s: %s", segundos * 1000, endpoint, sentencia)
+        with self.lock:
+            entrada = (segundos, endpoint, sentencia)
+            if len(self.lentas) < self.app.config.get('SQL_LENTAS_GUARDADAS', 20):
+                heapq.heappush(self.lentas, entrada)
+            else:
+                heapq.heappushpop(self.lentas, entrada)
+
+    def _terminar_request(self, response):
+        if 'sql_consultas' not in g or request.endpoint in EXCLUIDOS:
+            return response
+
+        consultas, segundos = g.sql_consultas, g.sql_segundos
+        response.headers.add(
+            'Server-Timing', f'db;dur={segundos * 1000:.1f};desc="{consultas} consultas"')
+
+        endpoint = request.endpoint or 'sin_endpoint'
+        with self.lock:
+            total = self.totales.setdefault(
+                endpoint, {'solicitudes': 0, 'consultas': 0, 'segundos_sql': 0.0, 'lentas': 0})
+            total['solicitudes'] += 1
+            total['consultas'] += consultas
+            total['segundos_sql'] += segundos
+            total['lentas'] += g.get('sql_lentas', 0)
+        return response
+
+    def exportar(self):
+        """Totales por endpoint en el formato de texto de Prometheus."""
+        metricas = [
+            ('galleteria_solicitudes_total', 'solicitudes', 'Solicitudes atendidas.'),
+            ('galleteria_sql_consultas_total', 'consultas', 'Consultas SQL ejecutadas.'),
+            ('galleteria_sql_segundos_total', 'segundos_sql', 'Tiempo total en la base de datos.'),
+            ('galleteria_sql_lentas_total', 'lentas', 'Consultas que pasaron de SQL_LENTA_MS.'),
+        ]
+        with self.lock:
+            totales = {endpoint: dict(valores) for endpoint, valores in self.totales.items()}
+
+        lineas = []
+        for nombre, campo, ayuda in metricas:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} counter')
+            for endpoint in sorted(totales):
+                lineas.append(f'{nombre}{{endpoint="{_escapar(endpoint)}"}} {totales[endpoint][campo]}')
+        if metricas_request.app is not None:
+            lineas.extend(metricas_request.exportar())
+        if metricas_pool.app is not None:
+            lineas.extend(metricas_pool.exportar())
+        return Response('\n'.join(lineas) + '\n', mimetype='text/plain; version=0.0.4')
+
+    def exportar_lentas(self):
+        """Las consultas más lentas registradas, de la más lenta a la más rápida."""
+        with self.lock:
+            lentas = sorted(self.lentas, reverse=True)
+        return jsonify([
+            {'ms': round(segundos * 1000, 1), 'endpoint': endpoint, 'sentencia': sentencia}
+            for segundos, endpoint, sentencia in lentas
+        ])
+
+
+metricas_sql = MetricasSQL()
+
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_metricas = time.perf_counter()
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_metricas', None)
+    if inicio is not None and metricas_sql.app is not None:
+        metricas_sql.registrar_consulta(time.perf_counter() - inicio, statement)
+
+
+class Histograma:
+    """
+    Histograma de latencias con cubetas exponenciales (estilo HDR): cada cubeta es
+    2^(1/4) veces la anterior, de 1 ms a ~65 s, así el error de un percentil es menor al 19%.
+    """
+    LIMITES = [0.001 * 2 ** (i / 4) for i in range(65)]
+
+    def __init__(self):
+        self.cubetas = [0] * (len(self.LIMITES) + 1)  # La última es para lo que pasa de ~65 s
+        self.cuenta = 0
+        self.suma = 0.0
+
+    def registrar(self, segundos):
+        self.cubetas[bisect.bisect_left(self.LIMITES, segundos)] += 1
+        self.cuenta += 1
+        self.suma += segundos
+
+    def percentil(self, p):
+        """Límite superior de la cubeta donde cae el percentil p (0-100)."""
+        if not self.cuenta:
+            return 0.0
+        objetivo = self.cuenta * p / 100
+        acumulado = 0
+        for i, cantidad in enumerate(self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return self.LIMITES[min(i, len(self.LIMITES) - 1)]
+        return self.LIMITES[-1]
+
+    def acumuladas(self, cada=4):
+        """Cuentas acumuladas en uno de cada `cada` límites, para exportar cubetas 'le'."""
+        acumulado = 0
+        resultado = []
+        for i, cantidad in enumerate(self.cubetas[:-1]):
+            acumulado += cantidad
+            if i % cada == 0:
+                resultado.append((self.LIMITES[i], acumulado))
+        return resultado
+
+
+COMPONENTES = ('db', 'render', 'pdf', 'otro')
+PERCENTILES = (50, 95, 99)
+
+
+@contextmanager
+def medir(componente):
+    """
+    Mide un bloque (p. ej. la generación del PDF). Dentro de un request se suma al desglose
+    del request; fuera de uno (hilos de tickets) se registra como su propio histograma.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        if has_request_context() and 'tiempos' in g:
+            g.tiempos[componente] = g.tiempos.get(componente, 0.0) + segundos
+        elif metricas_request.app is not None:
+            metricas_request.registrar(componente, segundos, {componente: segundos})
+
+
+class MetricasRequest:
+    """
+    Tiempo total de cada request con histogramas por endpoint (p50/p95/p99) y el desglose
+    en base de datos, render de Jinja, PDF y el resto (código Python).
+    Opcionalmente perfila 1 de cada PERFILADOR_MUESTREO requests (o los que traen el
+    encabezado X-Perfilar) con cProfile y guarda los .pstats de los más lentos.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.lock = threading.Lock()
+        self.histogramas = {}
+        self.desglose = {}
+        self.perfiles = []  # Montículo (segundos, ruta) con los perfiles guardados
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['metricas_request'] = self
+        if not app.config.get('METRICAS_REQUEST', True):
+            return
+
+        app.before_request(self._iniciar_request)
+        app.after_request(self._terminar_request)
+        before_render_template.connect(self._antes_de_render, app)
+        template_rendered.connect(self._despues_de_render, app)
+
+    def reiniciar(self):
+        with self.lock:
+            self.histogramas.clear()
+            self.desglose.clear()
+
+    def _antes_de_render(self, sender, template, context, **extra):
+        g.inicio_render = time.perf_counter()
+
+    def _despues_de_render(self, sender, template, context, **extra):
+        inicio = g.pop('inicio_render', None)
+        if inicio is not None and 'tiempos' in g:
+            g.tiempos['render'] = g.tiempos.get('render', 0.0) + time.perf_counter() - inicio
+
+    def _perfilar(self):
+        configuracion = self.app.config
+        if configuracion.get('PERFILADOR_HEADER') and request.headers.get('X-Perfilar'):
+            return True
+        muestreo = configuracion.get('PERFILADOR_MUESTREO', 0)
+        return bool(muestreo) and random.randrange(muestreo) == 0
+
+    def _iniciar_request(self):
+        g.tiempos = {}
+        g.inicio_request = time.perf_counter()
+        if self._perfilar():
+            g.perfil = cProfile.Profile()
+            g.perfil.enable()
+
+    def _terminar_request(self, response):
+        if 'inicio_request' not in g or request.endpoint in EXCLUIDOS:
+            return response
+        perfil = g.pop('perfil', None)
+        if perfil is not None:
+            perfil.disable()
+
+        total = time.perf_counter() - g.inicio_request
+        tiempos = dict(g.tiempos)
+        tiempos['db'] = g.get('sql_segundos', 0.0)
+        tiempos['otro'] = max(total - sum(tiempos.get(c, 0.0) for c in ('db', 'render', 'pdf')), 0.0)
+
+        endpoint = request.endpoint or 'sin_endpoint'
+        self.registrar(endpoint, total, tiempos)
+        for componente in ('render', 'pdf'):
+            if componente in tiempos:
+                response.headers.add('Server-Timing', f'{componente};dur={tiempos[componente] * 1000:.1f}')
+        response.headers.add('Server-Timing', f'total;dur={total * 1000:.1f}')
+
+        if perfil is not None:
+            self._guardar_perfil(perfil, endpoint, total)
+        return response
+
+    def registrar(self, endpoint, total, tiempos):
+        with self.lock:
+            self.histogramas.setdefault(endpoint, Histograma()).registrar(total)
+            desglose = self.desglose.setdefault(endpoint, dict.fromkeys(COMPONENTES, 0.0))
+            for componente, segundos in tiempos.items():
+                desglose[componente] = desglose.get(componente, 0.0) + segundos
+
+    def _guardar_perfil(self, perfil, endpoint, segundos):
+        """Guarda el .pstats si está entre los PERFILADOR_MAXIMO requests más lentos."""
+        configuracion = self.app.config
+        if segundos * 1000 < configuracion.get('PERFILADOR_MIN_MS', 0):
+            return
+        directorio = configuracion.get('PERFILADOR_DIR') or os.path.join(self.app.instance_path, 'perfiles')
+        maximo = configuracion.get('PERFILADOR_MAXIMO', 20)
+
+        with self.lock:
+            if len(self.perfiles) >= maximo and segundos <= self.perfiles[0][0]:
+                return
+            os.makedirs(directorio, exist_ok=True)
+            nombre = re.sub(r'[^\w.-]', '_', endpoint)
+            ruta = os.path.join(directorio, f'{nombre}-{segundos * 1000:.0f}ms-{time.time_ns()}.pstats')
+            perfil.dump_stats(ruta)
+            heapq.heappush(self.perfiles, (segundos, ruta))
+            if len(self.perfiles) > maximo:
+                _, descartado = heapq.heappop(self.perfiles)
+                if os.path.exists(descartado):
+                    os.remove(descartado)
+        logger.info("Perfil de %s (%.1f ms) guardado en %s", endpoint, segundos * 1000, ruta)
+
+    def percentiles(self, endpoint):
+        with self.lock:
+            histograma = self.histogramas.get(endpoint)
+            return {p: histograma.percentil(p) for p in PERCENTILES} if histograma else {}
+
+    def exportar(self):
+        """Histogramas, percentiles y desglose por endpoint en formato Prometheus."""
+        with self.lock:
+            lineas = [
+                '# HELP galleteria_request_segundos Duración de los requests.',
+                '# TYPE galleteria_request_segundos histogram',
+            ]
+            for endpoint in sorted(self.histogramas):
+                histograma = self.histogramas[endpoint]
+                etiqueta = f'endpoint="{_escapar(endpoint)}"'
+                for limite, cuenta in histograma.acumuladas():
+                    lineas.append(f'galleteria_request_segundos_bucket{{{etiqueta},le="{limite:.6g}"}} {cuenta}')
+                lineas.append(f'galleteria_request_segundos_bucket{{{etiqueta},le="+Inf"}} {histograma.cuenta}')
+                lineas.append(f'galleteria_request_segundos_sum{{{etiqueta}}} {histograma.suma:.6f}')
+                lineas.append(f'galleteria_request_segundos_count{{{etiqueta}}} {histograma.cuenta}')
+
+            lineas.append('# HELP galleteria_request_percentil_segundos Percentiles de duración (p50, p95, p99).')
+            lineas.append('# TYPE galleteria_request_percentil_segundos gauge')
+            for endpoint in sorted(self.histogramas):
+                for p in PERCENTILES:
+                    lineas.append(f'galleteria_request_percentil_segundos{{endpoint="{_escapar(endpoint)}",'
+                                  f'quantile="{p / 100}"}} {self.histogramas[endpoint].percentil(p):.6f}')
+
+            lineas.append('# HELP galleteria_tiempo_segundos_total Tiempo por componente: db, render, pdf u otro.')
+            lineas.append('# TYPE galleteria_tiempo_segundos_total counter')
+            for endpoint in sorted(self.desglose):
+                for componente, segundos in self.desglose[endpoint].items():
+                    lineas.append(f'galleteria_tiempo_segundos_total{{endpoint="{_escapar(endpoint)}",'
+                                  f'componente="{componente}"}} {segundos:.6f}')
+        return lineas
+
+
+metricas_request = MetricasRequest()
+
+
+class EstadisticasPool:
+    """Tiempo para obtener conexión del pool y veces que se agotó (pool_timeout)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.espera = Histograma()
+        self.agotado = 0
+
+
+class PoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout por una conexión. Se usa con
+    `poolclass` en SQLALCHEMY_ENGINE_OPTIONS (ver config.opciones_motor).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estadisticas = EstadisticasPool()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.estadisticas.lock:
+                self.estadisticas.agotado += 1
+            raise
+        finally:
+            with self.estadisticas.lock:
+                self.estadisticas.espera.registrar(time.perf_counter() - inicio)
+
+    def recreate(self):
+        # dispose() crea un pool nuevo; las estadísticas siguen acumulando
+        nuevo = super().recreate()
+        nuevo.estadisticas = self.estadisticas
+        return nuevo
+
+
+class MetricasPool:
+    """
+    Estado del pool de cada engine (conexiones en uso, libres y de overflow), tiempo de
+    espera por conexión y desconexiones detectadas (pre-ping o a media consulta), para /_metrics.
+    Además descarta las conexiones heredadas al hacer fork (gunicorn --preload) para
+    que cada worker abra las suyas.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.lock = threading.Lock()
+        self.desconexiones = {'pre_ping': 0, 'consulta': 0}
+        self._fork_registrado = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['metricas_pool'] = self
+        if not event.contains(Engine, 'handle_error', _error_de_conexion):
+            event.listen(Engine, 'handle_error', _error_de_conexion)
+        if not self._fork_registrado and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._despues_de_fork)
+            self._fork_registrado = True
+
+    def reiniciar(self):
+        with self.lock:
+            self.desconexiones = {'pre_ping': 0, 'consulta': 0}
+
+    def registrar_desconexion(self, pre_ping):
+        with self.lock:
+            self.desconexiones['pre_ping' if pre_ping else 'consulta'] += 1
+
+    def _despues_de_fork(self):
+        with self.app.app_context():
+            for engine in self._motores().values():
+                engine.dispose(close=False)
+
+    def _motores(self):
+        """Engines de Flask-SQLAlchemy por nombre de bind ('default' para el principal)."""
+        return {nombre or 'default': engine
+                for nombre, engine in self.app.extensions['sqlalchemy'].engines.items()}
+
+    def exportar(self):
+        """Estado de los pools en formato Prometheus; los pools sin cola (SQLite) se omiten."""
+        pools = {nombre: engine.pool for nombre, engine in sorted(self._motores().items())
+                 if isinstance(engine.pool, QueuePool)}
+        lineas = [
+            '# HELP galleteria_pool_conexiones Conexiones del pool por estado.',
+            '# TYPE galleteria_pool_conexiones gauge',
+        ]
+        for nombre, pool in pools.items():
+            etiqueta = f'engine="{_escapar(nombre)}"'
+            lineas.append(f'galleteria_pool_conexiones{{{etiqueta},estado="en_uso"}} {pool.checkedout()}')
+            lineas.append(f'galleteria_pool_conexiones{{{etiqueta},estado="libres"}} {pool.checkedin()}')
+            lineas.append(f'galleteria_pool_conexiones{{{etiqueta},estado="overflow"}} {max(pool.overflow(), 0)}')
+        lineas.append('# HELP galleteria_pool_tamano Conexiones permanentes del pool (pool_size).')
+        lineas.append('# TYPE galleteria_pool_tamano gauge')
+        for nombre, pool in pools.items():
+            lineas.append(f'galleteria_pool_tamano{{engine="{_escapar(nombre)}"}} {pool.size()}')
+
+        medidos = {nombre: pool.estadisticas for nombre, pool in pools.items() if isinstance(pool, PoolMedido)}
+        lineas.append('# HELP galleteria_pool_espera_segundos Tiempo para obtener una conexión del pool.')
+        lineas.append('# TYPE galleteria_pool_espera_segundos summary')
+        for nombre, estadisticas in medidos.items():
+            etiqueta = f'engine="{_escapar(nombre)}"'
+            with estadisticas.lock:
+                for p in PERCENTILES:
+                    lineas.append(f'galleteria_pool_espera_segundos{{{etiqueta},quantile="{p / 100}"}} '
+                                  f'{estadisticas.espera.percentil(p):.6f}')
+                lineas.append(f'galleteria_pool_espera_segundos_sum{{{etiqueta}}} {estadisticas.espera.suma:.6f}')
+                lineas.append(f'galleteria_pool_espera_segundos_count{{{etiqueta}}} {estadisticas.espera.cuenta}')
+        lineas.append('# HELP galleteria_pool_agotado_total Checkouts que fallaron por pool_timeout.')
+        lineas.append('# TYPE galleteria_pool_agotado_total counter')
+        for nombre, estadisticas in medidos.items():
+            lineas.append(f'galleteria_pool_agotado_total{{engine="{_escapar(nombre)}"}} {estadisticas.agotado}')
+
+        lineas.append('# HELP galleteria_db_desconexiones_total Conexiones caídas detectadas y descartadas.')
+        lineas.append('# TYPE galleteria_db_desconexiones_total counter')
+        with self.lock:
+            for origen, cantidad in self.desconexiones.items():
+                lineas.append(f'galleteria_db_desconexiones_total{{origen="{origen}"}} {cantidad}')
+        return lineas
+
+
+metricas_pool = MetricasPool()
+
+
+def _error_de_conexion(contexto):
+    # Con pool_pre_ping una conexión caída (p. ej. por wait_timeout de MySQL) se detecta
+    # al sacarla del pool y se reemplaza sin que el request lo note
+    if contexto.is_disconnect:
+        if metricas_pool.app is not None:
+            metricas_pool.registrar_desconexion(contexto.is_pre_ping)
+        logger.warning("Conexión a la base de datos caída%s: %s",
+                       " (pre-ping)" if contexto.is_pre_ping else "", contexto.original_exception)
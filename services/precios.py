@@ -0,0 +1,106 @@
+"""
+Lista de precios por galleta y presentación.
+
+La tabla listaPrecios guarda el precio y las piezas por empaque de cada
+(galleta, tipo de galleta). El catálogo en memoria (services/catalogo.py) la
+compila junto con los tipos y galletas en dos mapas: el precio de cada galleta en
+su propia presentación, que usa el cobro, y la lista de presentaciones de cada
+galleta, que usa la página de galletas. Mientras una galleta no tenga renglones en
+la lista se usan el costo de su tipo y las presentaciones de PRESENTACIONES;
+las galletas que se crean desde la página de galletas ya reciben sus renglones.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+import click
+from extensions import db
+from model.galleta import Galleta
+from model.lista_precio import ListaPrecios
+from model.tipo_galleta import TipoGalleta
+
+# Presentaciones conocidas por nombre de tipo (en minúsculas): etiqueta, precio y piezas por empaque.
+# Precio None es el costo del tipo.
+PRESENTACIONES = {
+    'unidad': ('Unidad', None, 1),
+    'caja de kilo': ('Caja de Kilo', Decimal('230.00'), 25),
+    'caja de 700 gramos': ('Caja de 700 gramos', Decimal('160.00'), 20),
+}
+
+
+def _presentacion(clave, tipo, precio, unidades):
+    etiqueta = PRESENTACIONES.get(clave, (tipo['nombre'],))[0]
+    return {'clave': clave, 'etiqueta': etiqueta, 'tipo_galleta_id': tipo['id_tipo_galleta'],
+            'precio': precio, 'unidades': unidades}
+
+
+def compilar(tipos, galletas, filas):
+    """
+    Compila la lista de precios. `tipos` y `galletas` son los dicts del catálogo y
+    `filas` los renglones (galleta_id, tipo_galleta_id, precio, unidades) de listaPrecios.
+    Los renglones sin piezas por empaque (unidades < 1) se ignoran.
+    Regresa ({id_galleta: (precio, unidades)}, {id_galleta: [presentaciones]}).
+    """
+    por_galleta = defaultdict(dict)
+    for galleta_id, tipo_id, precio, unidades in filas:
+        if tipo_id in tipos and unidades and unidades > 0:
+            por_galleta[galleta_id][tipo_id] = (precio, unidades)
+
+    precios, presentaciones = {}, {}
+    for id_galleta, galleta in galletas.items():
+        propio = tipos.get(galleta['tipo_galleta_id'])
+        lista = por_galleta.get(id_galleta)
+        if lista:
+            precios[id_galleta] = lista.get(galleta['tipo_galleta_id'],
+                                            (propio['costo'] if propio else None, 1))
+            presentaciones[id_galleta] = [
+                _presentacion(tipos[tipo_id]['nombre'].lower(), tipos[tipo_id], precio, unidades)
+                for tipo_id, (precio, unidades) in sorted(lista.items())
+            ]
+        else:
+            precios[id_galleta] = (propio['costo'] if propio else None, 1)
+            presentaciones[id_galleta] = [
+                {'clave': clave, 'etiqueta': etiqueta, 'tipo_galleta_id': None,
+                 'precio': propio['costo'] if precio is None and propio else precio, 'unidades': unidades}
+                for clave, (etiqueta, precio, unidades) in PRESENTACIONES.items()
+            ]
+    return precios, presentaciones
+
+
+def filas_iniciales(galletas=None):
+    """
+    Renglones que faltan en la lista con los precios actuales: cada galleta a su
+    costo de tipo y, para las de Unidad, también sus cajas con los precios de PRESENTACIONES.
+    Sin `galletas` revisa todas.
+    """
+    tipos = {tipo.id_tipo_galleta: tipo for tipo in TipoGalleta.query.all()}
+    existentes = set(db.session.query(ListaPrecios.galleta_id, ListaPrecios.tipo_galleta_id))
+
+    filas = []
+    for galleta in Galleta.query.all() if galletas is None else galletas:
+        propio = tipos.get(galleta.tipo_galleta_id)
+        if propio is None:
+            continue
+        destinos = tipos.values() if propio.nombre.lower() == 'unidad' else [propio]
+        for tipo in destinos:
+            clave = tipo.nombre.lower()
+            if clave not in PRESENTACIONES and tipo is not propio:
+                continue
+            _, precio, unidades = PRESENTACIONES.get(clave, (None, None, 1))
+            if tipo is propio or precio is None:
+                precio = tipo.costo
+            if (galleta.id_galleta, tipo.id_tipo_galleta) not in existentes:
+                filas.append(ListaPrecios(galleta_id=galleta.id_galleta, tipo_galleta_id=tipo.id_tipo_galleta,
+                                          precio=precio, unidades=unidades))
+    return filas
+
+
+@click.command('cargar-precios')
+def cargar_precios_command():
+    """Llena la lista de precios con los precios vigentes de las galletas que no la tienen."""
+    from services import catalogo
+
+    filas = filas_iniciales()
+    db.session.add_all(filas)
+    catalogo.invalidar()
+    db.session.commit()
+    click.echo(f"Precios agregados: {len(filas)}")
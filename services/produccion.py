@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from sqlalchemy import bindparam, update
+from extensions import db
+from model.lote_insumo import LoteInsumo
+from services import recetas
+
+
+class ConsumoIncompleto(Exception):
+    """Otro proceso consumió los lotes entre el plan y la actualización."""
+
+
+def requerimientos(bom, cantidad_galletas):
+    """Cantidad de cada insumo ({id_insumo: (nombre, unidad, cantidad)}) para producir `cantidad_galletas`."""
+    requeridos = {}
+    for linea in bom['insumos']:
+        nombre, unidad, cantidad = requeridos.get(linea['id_insumo'], (linea['insumo'], linea['unidad'], 0))
+        cantidad += int(linea['cantidad'] * cantidad_galletas // bom['cantidad_galletas'])
+        requeridos[linea['id_insumo']] = (nombre, unidad, cantidad)
+    return requeridos
+
+
+def planear_consumo(receta, cantidad_galletas):
+    """
+    Calcula el consumo FIFO de insumos para producir `cantidad_galletas` sin tocar
+    existencias. Los insumos salen de la lista de materiales compilada de la receta
+    y una sola consulta trae todos sus lotes con existencia ordenados por fecha de ingreso.
+
+    Regresa un dict con:
+      descuentos: [(idLote, cantidad)] a descontar
+      faltantes: [{insumo, unidad, requerido, disponible}]
+      no_encontrados: [(insumo, unidad)] sin registro en insumos
+    """
+    bom = recetas.bom(receta.idReceta)
+    plan = {'descuentos': [], 'faltantes': [], 'no_encontrados': list(bom['no_encontrados'])}
+    if plan['no_encontrados']:
+        return plan
+
+    requeridos = requerimientos(bom, cantidad_galletas)
+    if not requeridos:
+        return plan
+
+    lotes = (db.session.query(LoteInsumo.id_insumo, LoteInsumo.idLote, LoteInsumo.cantidad)
+             .filter(LoteInsumo.id_insumo.in_(requeridos))
+             .filter(LoteInsumo.cantidad > 0)
+             .order_by(LoteInsumo.id_insumo, LoteInsumo.fechaIngreso, LoteInsumo.idLote)
+             .all())
+    lotes_por_insumo = defaultdict(list)
+    for id_insumo, id_lote, existencia in lotes:
+        lotes_por_insumo[id_insumo].append((id_lote, existencia))
+
+    for id_insumo, (nombre, unidad, requerido) in requeridos.items():
+        faltante = requerido
+        disponible = 0
+        for id_lote, existencia in lotes_por_insumo[id_insumo]:
+            disponible += existencia
+            if faltante <= 0:
+                continue
+            tomar = min(existencia, faltante)
+            plan['descuentos'].append((id_lote, tomar))
+            faltante -= tomar
+        if faltante > 0:
+            plan['faltantes'].append({
+                'insumo': nombre, 'unidad': unidad,
+                'requerido': requerido, 'disponible': disponible
+            })
+    return plan
+
+
+def aplicar_consumo(plan):
+    """
+    Descuenta los lotes del plan con un solo UPDATE condicional (executemany).
+    El commit lo hace quien llama; si algún lote ya no alcanza lanza ConsumoIncompleto.
+    """
+    if not plan['descuentos']:
+        return
+    lotes = LoteInsumo.__table__
+    resultado = db.session.execute(
+        update(lotes)
+        .where(lotes.c.idLote == bindparam('b_lote'))
+        .where(lotes.c.cantidad >= bindparam('b_cantidad'))
+        .values(cantidad=lotes.c.cantidad - bindparam('b_cantidad')),
+        [{'b_lote': id_lote, 'b_cantidad': cantidad} for id_lote, cantidad in plan['descuentos']]
+    )
+    if resultado.rowcount not in (-1, len(plan['descuentos'])):
+        raise ConsumoIncompleto("La existencia de insumos cambió durante la producción.")
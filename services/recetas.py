@@ -0,0 +1,163 @@
+import json
+import threading
+from decimal import Decimal, InvalidOperation
+
+import click
+from sqlalchemy import and_, or_
+from extensions import db
+from model.insumo import Insumos
+from model.receta import Receta
+from model.receta_insumo import RecetaInsumo
+from services import catalogo
+
+# Lista de materiales compilada por idReceta junto con la generación del catálogo
+# con que se armó; si otro worker sube la generación (catalogo.invalidar) se recompila
+_boms = {}
+_lock = threading.Lock()
+
+
+def ingredientes_json(receta):
+    """Ingredientes guardados en Receta.ingredientes como lista de dicts {insumo, unidad, cantidad}."""
+    ingredientes = receta.ingredientes
+    if isinstance(ingredientes, str):
+        ingredientes = json.loads(ingredientes)
+    return ingredientes or []
+
+
+def resolver_insumos(ingredientes):
+    """
+    Busca en una sola consulta los insumos por nombre y unidad.
+    Regresa ({(nombre, unidad): id_insumo}, [(nombre, unidad) no encontrados]).
+    """
+    claves = list(dict.fromkeys((i['insumo'], i['unidad']) for i in ingredientes))
+    if not claves:
+        return {}, []
+
+    ids = {}
+    insumos = (db.session.query(Insumos.id_insumo, Insumos.nombreInsumo, Insumos.unidad)
+               .filter(or_(*[and_(Insumos.nombreInsumo == nombre, Insumos.unidad == unidad)
+                             for nombre, unidad in claves]))
+               .order_by(Insumos.id_insumo)
+               .all())
+    for id_insumo, nombre, unidad in insumos:
+        # Si hay insumos repetidos se toma el primero
+        ids.setdefault((nombre, unidad), id_insumo)
+    return ids, [clave for clave in claves if clave not in ids]
+
+
+def cantidad_decimal(valor):
+    """Cantidad de un ingrediente como Decimal, o None si no es un número mayor a cero."""
+    try:
+        cantidad = Decimal(str(valor).strip())
+    except InvalidOperation:
+        return None
+    return cantidad if cantidad.is_finite() and cantidad > 0 else None
+
+
+def cantidades_invalidas(ingredientes):
+    """Ingredientes cuya cantidad no es un número mayor a cero."""
+    return [ingrediente for ingrediente in ingredientes if cantidad_decimal(ingrediente['cantidad']) is None]
+
+
+def guardar_ingredientes(receta, ingredientes):
+    """
+    Guarda los ingredientes en Receta.ingredientes (lo que muestran las vistas) y en
+    receta_insumo. Si algún insumo no está registrado la receta se queda solo con
+    el JSON, como antes de receta_insumo, y la producción lo reporta como no
+    encontrado; regresa la lista de (nombre, unidad) faltantes. Las cantidades se
+    validan antes con cantidades_invalidas. El commit lo hace quien llama.
+    """
+    receta.ingredientes = ingredientes
+    ids, no_encontrados = resolver_insumos(ingredientes)
+    if no_encontrados:
+        receta.insumos_receta = []
+        return no_encontrados
+
+    receta.insumos_receta = [
+        RecetaInsumo(
+            insumo_id=ids[(ingrediente['insumo'], ingrediente['unidad'])],
+            cantidad=cantidad_decimal(ingrediente['cantidad']),
+            unidad=ingrediente['unidad']
+        )
+        for ingrediente in ingredientes
+    ]
+    return []
+
+
+def compilar(id_receta):
+    """
+    Arma la lista de materiales de la receta con un join a insumos.
+    Las recetas que aún no se migran a receta_insumo se resuelven por nombre y unidad.
+    """
+    receta = db.session.get(Receta, id_receta)
+    if receta is None:
+        return None
+
+    filas = (db.session.query(RecetaInsumo.insumo_id, Insumos.nombreInsumo,
+                              RecetaInsumo.unidad, RecetaInsumo.cantidad)
+             .join(Insumos, Insumos.id_insumo == RecetaInsumo.insumo_id)
+             .filter(RecetaInsumo.receta_id == id_receta)
+             .order_by(RecetaInsumo.id_receta_insumo)
+             .all())
+    no_encontrados = []
+
+    if not filas:
+        ingredientes = ingredientes_json(receta)
+        ids, no_encontrados = resolver_insumos(ingredientes)
+        filas = [
+            (ids[(i['insumo'], i['unidad'])], i['insumo'], i['unidad'], Decimal(str(i['cantidad'])))
+            for i in ingredientes if (i['insumo'], i['unidad']) in ids
+        ]
+
+    return {
+        'cantidad_galletas': receta.cantidad_galletas,
+        'insumos': [
+            {'id_insumo': id_insumo, 'insumo': nombre, 'unidad': unidad, 'cantidad': cantidad}
+            for id_insumo, nombre, unidad, cantidad in filas
+        ],
+        'no_encontrados': no_encontrados,
+    }
+
+
+def bom(id_receta):
+    """
+    Lista de materiales compilada de la receta, guardada en memoria del proceso
+    mientras no cambie la generación del catálogo.
+    """
+    generacion = catalogo.catalogo()['generacion']
+    with _lock:
+        guardado = _boms.get(id_receta)
+    if guardado is not None and guardado[0] == generacion:
+        return guardado[1]
+
+    compilado = compilar(id_receta)
+    # Las recetas sin migrar o con insumos faltantes se vuelven a resolver cada vez
+    if compilado is not None and not compilado['no_encontrados']:
+        with _lock:
+            _boms[id_receta] = (generacion, compilado)
+    return compilado
+
+
+def invalidar(id_receta=None):
+    """Descarta la lista de materiales de una receta, o de todas."""
+    with _lock:
+        if id_receta is None:
+            _boms.clear()
+        else:
+            _boms.pop(id_receta, None)
+
+
+@click.command('migrar-recetas')
+def migrar_recetas_command():
+    """Copia los ingredientes JSON de las recetas a la tabla receta_insumo."""
+    migradas = 0
+    for receta in Receta.query.filter(~Receta.insumos_receta.any()).all():
+        no_encontrados = guardar_ingredientes(receta, ingredientes_json(receta))
+        if no_encontrados:
+            faltantes = ", ".join(f"{nombre} ({unidad})" for nombre, unidad in no_encontrados)
+            click.echo(f"Receta {receta.idReceta} '{receta.nombreReceta}' sin migrar, faltan insumos: {faltantes}")
+        else:
+            migradas += 1
+    db.session.commit()
+    invalidar()
+    click.echo(f"Recetas migradas: {migradas}")
@@ -0,0 +1,110 @@
+"""
+Lecturas en la réplica para los reportes y catálogos.
+
+Las vistas marcadas con @solo_lectura leen de la base configurada en el bind
+'replica' (DATABASE_REPLICA_URL) cuando se piden con GET; todo lo demás, y
+cualquier escritura, va a la principal. Después de que un usuario escribe, sus
+lecturas siguen en la principal durante REPLICA_PEGAJOSA segundos para que vea
+sus propios cambios aunque la réplica vaya atrasada.
+
+Las vistas que antes de leer pueden tener que crear algo usan en su lugar el
+bloque `with en_replica():` solo alrededor de las consultas de lectura.
+"""
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+BIND_REPLICA = 'replica'
+
+
+def solo_lectura(vista):
+    """Marca la vista para que sus consultas GET se lean de la réplica."""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.solo_lectura = True
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+@contextmanager
+def en_replica():
+    """Las consultas GET dentro del bloque se leen de la réplica; las de antes y después, de la principal."""
+    anterior = g.get('solo_lectura', False)
+    g.solo_lectura = request.method in ('GET', 'HEAD')
+    try:
+        yield
+    finally:
+        g.solo_lectura = anterior
+
+
+def marcar_escritura():
+    """Desde este momento el request, y el usuario por un rato, leen de la principal."""
+    if has_request_context():
+        g.hubo_escritura = True
+
+
+def _es_lectura(clause):
+    if clause is None:
+        return True
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None  # SELECT ... FOR UPDATE bloquea en la principal
+    if isinstance(clause, UpdateBase):
+        return False
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith(('SELECT', 'WITH'))
+    return True
+
+
+class SesionEnrutada(Session):
+    """Session de Flask-SQLAlchemy que manda a la réplica las lecturas de vistas @solo_lectura."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._usar_replica(clause):
+            replica = self._motor_replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _motor_replica(self):
+        return self._db.engines.get(BIND_REPLICA)
+
+    def _usar_replica(self, clause):
+        if not has_request_context():
+            return False
+        if self._flushing or not _es_lectura(clause):
+            marcar_escritura()
+            return False
+        if not g.get('solo_lectura') or g.get('hubo_escritura'):
+            return False
+        escritura = session.get('ultima_escritura')
+        return not escritura or time.time() - escritura > current_app.config.get('REPLICA_PEGAJOSA', 5)
+
+
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _despues_de_flush(sesion, contexto):
+    marcar_escritura()
+
+
+def _iniciar_request():
+    g.solo_lectura = False
+    g.hubo_escritura = False
+
+
+def recordar_escritura(response):
+    """Guarda en la sesión del usuario cuándo escribió por última vez."""
+    if g.get('hubo_escritura'):
+        session['ultima_escritura'] = time.time()
+    return response
+
+
+def init_app(app):
+    app.before_request(_iniciar_request)
+    app.after_request(recordar_escritura)
@@ -0,0 +1,164 @@
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from extensions import db
+from model.lote_galleta import LoteGalletas
+from model.reserva_lote import ReservaLote
+
+
+def _vencimiento():
+    return datetime.utcnow() + timedelta(minutes=current_app.config.get('RESERVAS_TTL', 30))
+
+
+def apartado_por_lote():
+    """Subconsulta con la cantidad apartada vigente por lote, de todos los carritos."""
+    return (db.session.query(
+                ReservaLote.lote_id,
+                db.func.sum(ReservaLote.cantidad).label('apartado'))
+            .filter(ReservaLote.expira > datetime.utcnow())
+            .group_by(ReservaLote.lote_id)
+            .subquery())
+
+
+def apartado_de_otros(carrito, lote_ids):
+    """
+    Cantidad apartada vigente por lote ({lote_id: apartado}) de los carritos
+    distintos a `carrito`; con carrito None cuenta lo apartado por todos.
+    """
+    query = (db.session.query(ReservaLote.lote_id, db.func.sum(ReservaLote.cantidad))
+             .filter(ReservaLote.lote_id.in_(lote_ids), ReservaLote.expira > datetime.utcnow()))
+    if carrito is not None:
+        query = query.filter(ReservaLote.carrito != carrito)
+    return {lote_id: int(apartado) for lote_id, apartado in query.group_by(ReservaLote.lote_id).all()}
+
+
+def disponibles(galleta_id, hoy=None):
+    """
+    Lotes vigentes de la galleta con su existencia disponible (existencia - apartado)
+    en una sola consulta. Regresa tuplas (lote, disponible) con disponible > 0.
+    """
+    hoy = hoy or date.today()
+    apartado = apartado_por_lote()
+    disponible = LoteGalletas.existencia - db.func.coalesce(apartado.c.apartado, 0)
+
+    return (db.session.query(LoteGalletas, disponible.label('disponible'))
+            .outerjoin(apartado, apartado.c.lote_id == LoteGalletas.id_lote)
+            .filter(LoteGalletas.galleta_id == galleta_id)
+            .filter(LoteGalletas.fechaCaducidad >= hoy)
+            .filter(disponible > 0)
+            .all())
+
+
+def planear_fefo(solicitudes, hoy=None):
+    """
+    Reparte las cantidades pedidas por galleta ({galleta_id: cantidad}) entre sus lotes
+    vigentes, primero los que caducan antes (FEFO) y descontando lo apartado.
+    Es una sola consulta sobre el índice (galleta_id, fechaCaducidad).
+    Regresa {galleta_id: (plan, faltante)} con plan = [(lote_id, cantidad), ...].
+    """
+    hoy = hoy or date.today()
+    resultado = {galleta_id: ([], cantidad) for galleta_id, cantidad in solicitudes.items()}
+    if not solicitudes:
+        return resultado
+
+    apartado = apartado_por_lote()
+    disponible = LoteGalletas.existencia - db.func.coalesce(apartado.c.apartado, 0)
+
+    lotes = (db.session.query(LoteGalletas.galleta_id, LoteGalletas.id_lote, disponible.label('disponible'))
+             .outerjoin(apartado, apartado.c.lote_id == LoteGalletas.id_lote)
+             .filter(LoteGalletas.galleta_id.in_(solicitudes))
+             .filter(LoteGalletas.fechaCaducidad >= hoy)
+             .filter(disponible > 0)
+             .order_by(LoteGalletas.galleta_id, LoteGalletas.fechaCaducidad, LoteGalletas.id_lote)
+             .all())
+
+    for galleta_id, lote_id, existencia in lotes:
+        plan, faltante = resultado[galleta_id]
+        if faltante <= 0:
+            continue
+        tomar = min(int(existencia), faltante)
+        plan.append((lote_id, tomar))
+        resultado[galleta_id] = (plan, faltante - tomar)
+    return resultado
+
+
+def asignar_fefo(galleta_id, cantidad, hoy=None):
+    """Plan FEFO de una sola galleta; regresa (plan, faltante)."""
+    return planear_fefo({galleta_id: cantidad}, hoy)[galleta_id]
+
+
+def reservar(carrito, lote_id, cantidad):
+    """
+    Aparta `cantidad` piezas del lote para el carrito. Solo bloquea el renglón del
+    lote mientras se valida. Regresa (True, disponible_restante) o (False, disponible).
+    El commit lo hace quien llama.
+    """
+    lote = (db.session.query(LoteGalletas)
+            .filter(LoteGalletas.id_lote == lote_id)
+            .with_for_update()
+            .first())
+    if not lote:
+        return False, 0
+
+    ahora = datetime.utcnow()
+    apartado = (db.session.query(db.func.coalesce(db.func.sum(ReservaLote.cantidad), 0))
+                .filter(ReservaLote.lote_id == lote_id, ReservaLote.expira > ahora)
+                .scalar())
+    disponible = lote.existencia - apartado
+    if cantidad > disponible:
+        return False, disponible
+
+    reserva = (ReservaLote.query
+               .filter_by(carrito=carrito, lote_id=lote_id)
+               .first())
+    # Apartar renueva todas las reservas del carrito
+    renovar(carrito)
+
+    if reserva and reserva.expira > ahora:
+        reserva.cantidad += cantidad
+    elif reserva:
+        reserva.cantidad = cantidad
+    else:
+        reserva = ReservaLote(carrito=carrito, lote_id=lote_id, cantidad=cantidad)
+        db.session.add(reserva)
+    reserva.expira = _vencimiento()
+    return True, disponible - cantidad
+
+
+def renovar(carrito):
+    """Extiende la vigencia de las reservas del carrito mientras siga activo."""
+    (ReservaLote.query
+     .filter(ReservaLote.carrito == carrito, ReservaLote.expira > datetime.utcnow())
+     .update({ReservaLote.expira: _vencimiento()}, synchronize_session=False))
+
+
+def liberar(carrito, lote_id=None, cantidad=None):
+    """Libera las reservas del carrito; con lote y cantidad solo libera esa parte."""
+    query = ReservaLote.query.filter(ReservaLote.carrito == carrito)
+    if lote_id is None:
+        query.delete(synchronize_session=False)
+        return
+
+    reserva = query.filter(ReservaLote.lote_id == lote_id).first()
+    if not reserva:
+        return
+    if cantidad is None or reserva.cantidad <= cantidad:
+        db.session.delete(reserva)
+    else:
+        reserva.cantidad -= cantidad
+
+
+def purgar_vencidas():
+    """Borra las reservas vencidas; ya no cuentan pero ocupan espacio."""
+    return (ReservaLote.query
+            .filter(ReservaLote.expira <= datetime.utcnow())
+            .delete(synchronize_session=False))
+
+
+@click.command('purgar-reservas')
+def purgar_reservas_command():
+    """Borra las reservas de lotes vencidas."""
+    borradas = purgar_vencidas()
+    db.session.commit()
+    click.echo(f"Reservas vencidas borradas: {borradas}")
@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import click
+from sqlalchemy import insert, literal
+from extensions import db
+from model.venta import Venta
+from model.detalle_venta import DetalleVentaGalletas
+from model.lote_galleta import LoteGalletas
+from model.galleta import Galleta
+from model.venta_diaria import VentaDiaria
+from services.acumulados import sumar_o_insertar
+
+
+def acumular(fecha, lineas):
+    """
+    Suma los renglones de una venta ({lote_id, cantidad, subtotal}) al resumen diario.
+    Se llama dentro de la transacción de la venta; el commit lo hace quien llama.
+    """
+    if not lineas:
+        return
+
+    lotes = {linea['lote_id'] for linea in lineas}
+    galletas = dict(
+        (id_lote, (galleta_id, tipo_id)) for id_lote, galleta_id, tipo_id in
+        db.session.query(LoteGalletas.id_lote, Galleta.id_galleta, Galleta.tipo_galleta_id)
+        .join(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
+        .filter(LoteGalletas.id_lote.in_(lotes))
+        .all()
+    )
+
+    acumulado = defaultdict(lambda: [0, Decimal('0')])
+    for linea in lineas:
+        if linea['lote_id'] not in galletas:
+            continue
+        renglon = acumulado[galletas[linea['lote_id']]]
+        renglon[0] += linea['cantidad']
+        renglon[1] += Decimal(str(linea['subtotal']))
+
+    ahora = datetime.utcnow()
+    sumar_o_insertar(VentaDiaria, [
+        {'fecha': fecha, 'galleta_id': galleta_id, 'tipo_galleta_id': tipo_id,
+         'cantidad': cantidad, 'total': total, 'actualizado': ahora}
+        for (galleta_id, tipo_id), (cantidad, total) in acumulado.items()
+    ], llaves=('fecha', 'galleta_id', 'tipo_galleta_id'), sumar=('cantidad', 'total'), asignar=('actualizado',))
+
+
+def reconstruir(desde=None):
+    """Vuelve a calcular el resumen desde los detalles de venta con un solo INSERT ... SELECT."""
+    borrar = db.session.query(VentaDiaria)
+    if desde:
+        borrar = borrar.filter(VentaDiaria.fecha >= desde)
+    borrar.delete(synchronize_session=False)
+
+    consulta = (db.session.query(
+                    Venta.fecha,
+                    Galleta.id_galleta,
+                    Galleta.tipo_galleta_id,
+                    db.func.sum(DetalleVentaGalletas.cantidad),
+                    db.func.sum(DetalleVentaGalletas.subtotal),
+                    literal(datetime.utcnow(), db.DateTime))
+                .join(DetalleVentaGalletas, DetalleVentaGalletas.venta_id == Venta.id_venta)
+                .join(LoteGalletas, LoteGalletas.id_lote == DetalleVentaGalletas.lote_id)
+                .join(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
+                .group_by(Venta.fecha, Galleta.id_galleta, Galleta.tipo_galleta_id))
+    if desde:
+        consulta = consulta.filter(Venta.fecha >= desde)
+
+    tabla = VentaDiaria.__table__
+    db.session.execute(insert(tabla).from_select(
+        ['fecha', 'galleta_id', 'tipo_galleta_id', 'cantidad', 'total', 'actualizado'], consulta.statement))
+
+
+@click.command('reconstruir-resumen-ventas')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), help='Solo a partir de esta fecha.')
+def reconstruir_resumen_command(desde):
+    """Recalcula el resumen diario de ventas a partir de los detalles."""
+    reconstruir(desde.date() if desde else None)
+    db.session.commit()
+    click.echo("Resumen de ventas reconstruido.")
@@ -0,0 +1,204 @@
+"""
+Existencias de galletas.
+
+Toda operación que mueve la existencia de un lote (venta, merma, producción o
+borrado del lote) pasa por este módulo, que en la misma transacción ajusta
+Galleta.existencia. Así ese contador es la existencia total de la galleta y las
+pantallas lo leen directo en lugar de sumar los lotes. `flask conciliar-existencias`
+compara el contador contra la suma de los lotes y, con --corregir, lo repara.
+"""
+from collections import defaultdict
+
+import click
+from sqlalchemy import bindparam, func, insert, update
+from extensions import db
+from model.detalle_venta import DetalleVentaGalletas
+from model.galleta import Galleta
+from model.lote_galleta import LoteGalletas
+from services import alertas, reservas
+
+
+class ExistenciaInsuficiente(Exception):
+    """Uno o más lotes no alcanzan para la venta; `faltantes` trae el detalle por lote."""
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        super().__init__(", ".join(
+            f"lote {f['lote_id']}: se piden {f['solicitado']}, hay {f['existencia']}"
+            for f in faltantes
+        ))
+
+
+def cantidades_por_lote(lineas):
+    """Suma las cantidades de los renglones por lote (un lote puede venir en varios renglones)."""
+    cantidades = defaultdict(int)
+    for linea in lineas:
+        cantidades[linea['lote_id']] += linea['cantidad']
+    return dict(cantidades)
+
+
+def descontar_lotes(lineas, carrito=None):
+    """
+    Descuenta de los lotes la cantidad de todos los renglones: un SELECT ... FOR UPDATE
+    de todos los lotes involucrados, una consulta de lo apartado y un solo UPDATE
+    condicional (executemany) con `existencia >= cantidad`.
+    Con los lotes bloqueados, a cada uno solo se le puede vender su existencia menos
+    lo apartado vigente por los demás carritos (todos si `carrito` es None); así una
+    reserva propia que ya venció solo se cobra si la existencia sigue libre.
+    Si algún lote no alcanza lanza ExistenciaInsuficiente sin tocar nada.
+    El commit lo hace quien llama.
+    """
+    solicitadas = cantidades_por_lote(lineas)
+    if not solicitadas:
+        return
+
+    filas = (db.session.query(LoteGalletas.id_lote, LoteGalletas.galleta_id, LoteGalletas.existencia)
+             .filter(LoteGalletas.id_lote.in_(solicitadas))
+             .with_for_update()
+             .all())
+    apartado = reservas.apartado_de_otros(carrito, solicitadas)
+    existencias = {lote_id: existencia - apartado.get(lote_id, 0) for lote_id, _, existencia in filas}
+    galleta_de = {lote_id: galleta_id for lote_id, galleta_id, _ in filas}
+
+    faltantes = [
+        {'lote_id': lote_id, 'solicitado': cantidad, 'existencia': max(existencias.get(lote_id, 0), 0)}
+        for lote_id, cantidad in solicitadas.items()
+        if existencias.get(lote_id, 0) < cantidad
+    ]
+    if faltantes:
+        raise ExistenciaInsuficiente(faltantes)
+
+    lotes = LoteGalletas.__table__
+    resultado = db.session.execute(
+        update(lotes)
+        .where(lotes.c.id_lote == bindparam('b_lote'))
+        .where(lotes.c.existencia >= bindparam('b_cantidad'))
+        .values(existencia=lotes.c.existencia - bindparam('b_cantidad')),
+        [{'b_lote': lote_id, 'b_cantidad': cantidad} for lote_id, cantidad in solicitadas.items()]
+    )
+
+    # Sin FOR UPDATE (p. ej. SQLite) otra caja pudo vender primero; la condición lo detecta
+    if resultado.rowcount not in (-1, len(solicitadas)):
+        raise ExistenciaInsuficiente(faltantes_actuales(solicitadas))
+
+    cambios = defaultdict(int)
+    for lote_id, cantidad in solicitadas.items():
+        cambios[galleta_de[lote_id]] -= cantidad
+    ajustar_galletas(cambios)
+
+
+def ajustar_galletas(cambios):
+    """
+    Suma a Galleta.existencia los cambios {galleta_id: cantidad} con un solo UPDATE
+    (executemany), en orden de id para que dos transacciones no se bloqueen cruzadas.
+    """
+    cambios = {galleta_id: cantidad for galleta_id, cantidad in cambios.items() if cantidad}
+    if not cambios:
+        return
+    alertas.invalidar()
+    galletas = Galleta.__table__
+    db.session.execute(
+        update(galletas)
+        .where(galletas.c.id_galleta == bindparam('b_galleta'))
+        .values(existencia=galletas.c.existencia + bindparam('b_cantidad')),
+        [{'b_galleta': galleta_id, 'b_cantidad': cantidad} for galleta_id, cantidad in sorted(cambios.items())]
+    )
+
+
+def agregar_lote(lote):
+    """Agrega a la sesión un lote recién producido y suma su existencia a la galleta."""
+    db.session.add(lote)
+    ajustar_galletas({lote.galleta_id: lote.existencia})
+
+
+def mermar(lote, cantidad):
+    """
+    Descuenta una merma del lote y de su galleta. El UPDATE del lote es condicional,
+    así que si otra operación lo dejó sin existencia lanza ExistenciaInsuficiente.
+    """
+    lotes = LoteGalletas.__table__
+    resultado = db.session.execute(
+        update(lotes)
+        .where(lotes.c.id_lote == lote.id_lote)
+        .where(lotes.c.existencia >= cantidad)
+        .values(existencia=lotes.c.existencia - cantidad)
+    )
+    db.session.expire(lote, ['existencia'])
+    if resultado.rowcount == 0:
+        raise ExistenciaInsuficiente(faltantes_actuales({lote.id_lote: cantidad}))
+    ajustar_galletas({lote.galleta_id: -cantidad})
+
+
+def eliminar_lote(lote):
+    """Borra el lote y resta de su galleta lo que le quedaba."""
+    ajustar_galletas({lote.galleta_id: -lote.existencia})
+    db.session.delete(lote)
+
+
+def faltantes_actuales(solicitadas):
+    """Vuelve a leer los lotes para reportar cuáles ya no alcanzan."""
+    existencias = dict(db.session.query(LoteGalletas.id_lote, LoteGalletas.existencia)
+                       .filter(LoteGalletas.id_lote.in_(solicitadas))
+                       .all())
+    return [
+        {'lote_id': lote_id, 'solicitado': cantidad, 'existencia': existencias.get(lote_id, 0)}
+        for lote_id, cantidad in solicitadas.items()
+        if existencias.get(lote_id, 0) < cantidad
+    ]
+
+
+def insertar_detalles(venta_id, lineas):
+    """Inserta todos los detalles de la venta con un solo INSERT de varios renglones."""
+    if not lineas:
+        return
+    db.session.execute(insert(DetalleVentaGalletas), [
+        {
+            'venta_id': venta_id,
+            'lote_id': linea['lote_id'],
+            'cantidad': linea['cantidad'],
+            'subtotal': linea['subtotal'],
+            # Se guarda el precio vigente para que cambios de lista no alteren ventas pasadas
+            'precioUnitario': linea.get('precio_unitario') or linea['subtotal'] / linea['cantidad'],
+        }
+        for linea in lineas
+    ])
+
+
+def diferencias():
+    """
+    Galletas cuyo contador no coincide con la suma de sus lotes, en una sola consulta.
+    Regresa [{galleta_id, galleta, registrada, lotes}].
+    """
+    suma = (db.session.query(LoteGalletas.galleta_id, func.sum(LoteGalletas.existencia).label('total'))
+            .group_by(LoteGalletas.galleta_id)
+            .subquery())
+    en_lotes = func.coalesce(suma.c.total, 0)
+    filas = (db.session.query(Galleta.id_galleta, Galleta.galleta, Galleta.existencia, en_lotes)
+             .outerjoin(suma, suma.c.galleta_id == Galleta.id_galleta)
+             .filter(Galleta.existencia != en_lotes)
+             .order_by(Galleta.id_galleta)
+             .all())
+    return [{'galleta_id': galleta_id, 'galleta': nombre, 'registrada': registrada, 'lotes': int(lotes)}
+            for galleta_id, nombre, registrada, lotes in filas]
+
+
+def conciliar(corregir=False):
+    """Busca diferencias y, si se pide, deja cada contador igual a la suma de sus lotes."""
+    encontradas = diferencias()
+    if corregir:
+        ajustar_galletas({d['galleta_id']: d['lotes'] - d['registrada'] for d in encontradas})
+    return encontradas
+
+
+@click.command('conciliar-existencias')
+@click.option('--corregir', is_flag=True, help='Iguala el contador de cada galleta a la suma de sus lotes.')
+def conciliar_existencias_command(corregir):
+    """Compara Galleta.existencia contra la suma de sus lotes."""
+    encontradas = conciliar(corregir)
+    for d in encontradas:
+        click.echo(f"{d['galleta']} ({d['galleta_id']}): registrada {d['registrada']}, en lotes {d['lotes']}")
+    if corregir:
+        db.session.commit()
+        click.echo(f"Galletas corregidas: {len(encontradas)}")
+    else:
+        click.echo(f"Galletas con diferencia: {len(encontradas)}")
@@ -0,0 +1,292 @@
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+import pdfkit
+from flask import current_app, render_template, request, has_request_context
+from extensions import db
+from model.venta import Venta
+from model.detalle_venta import DetalleVentaGalletas
+from model.lote_galleta import LoteGalletas
+from model.galleta import Galleta
+from model.tipo_galleta import TipoGalleta
+from model.trabajo_ticket import TrabajoTicket
+from services.almacen_tickets import almacen_actual
+from services.metricas import medir
+
+logger = logging.getLogger(__name__)
+
+# Estatus de los trabajos de ticket
+PENDIENTE = 0
+EN_PROCESO = 1
+LISTO = 2
+ERROR = 3
+
+MAX_INTENTOS = 3
+
+# Opciones para PDF
+OPCIONES_PDF = {
+    'page-size': 'A7',
+    'margin-top': '0mm',
+    'margin-right': '0mm',
+    'margin-bottom': '0mm',
+    'margin-left': '0mm',
+    'encoding': "UTF-8",
+    'no-outline': None,
+    'enable-local-file-access': ''
+}
+
+
+def renderizar_pdf(html):
+    """Convierte el HTML del ticket a PDF con wkhtmltopdf."""
+    config = pdfkit.configuration(wkhtmltopdf=current_app.config['WKHTMLTOPDF_PATH'])
+    with medir('pdf'):
+        return pdfkit.from_string(html, False, options=OPCIONES_PDF, configuration=config)
+
+
+def datos_ticket(venta_id):
+    """
+    Datos del ticket en una sola consulta: la venta con sus detalles, lotes, galletas y tipos.
+    Regresa {venta_id, ticket_num, fecha, hora, total, items} o None si la venta no existe.
+    """
+    filas = (db.session.query(
+                Venta.fecha,
+                Venta.hora,
+                Venta.total,
+                Venta.ticket,
+                DetalleVentaGalletas.cantidad,
+                DetalleVentaGalletas.subtotal,
+                DetalleVentaGalletas.precioUnitario,
+                Galleta.galleta,
+                TipoGalleta.nombre)
+             .outerjoin(DetalleVentaGalletas, DetalleVentaGalletas.venta_id == Venta.id_venta)
+             .outerjoin(LoteGalletas, LoteGalletas.id_lote == DetalleVentaGalletas.lote_id)
+             .outerjoin(Galleta, Galleta.id_galleta == LoteGalletas.galleta_id)
+             .outerjoin(TipoGalleta, TipoGalleta.id_tipo_galleta == Galleta.tipo_galleta_id)
+             .filter(Venta.id_venta == venta_id)
+             .order_by(DetalleVentaGalletas.id_detalleVentaGalletas)
+             .all())
+    if not filas:
+        return None
+
+    fecha, hora, total, ticket_num = filas[0][:4]
+    items = [
+        {
+            'nombre': galleta,
+            'tipo': tipo,
+            'cantidad': cantidad,
+            'precio': precio if precio is not None else subtotal / cantidad,
+            'subtotal': subtotal
+        }
+        for _, _, _, _, cantidad, subtotal, precio, galleta, tipo in filas
+        if galleta  # Detalles sin lote o galleta no se imprimen
+    ]
+    return {
+        'venta_id': venta_id,
+        'ticket_num': ticket_num,
+        'fecha': fecha,
+        'hora': hora,
+        'total': total,
+        'items': items
+    }
+
+
+class ColaTickets:
+    """
+    Cola de generación de tickets fuera del request.
+    Cada venta registra un TrabajoTicket en la misma transacción y un pool
+    de hilos genera el PDF después del commit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get('TICKET_WORKERS', 2),
+            thread_name_prefix='tickets'
+        )
+        app.extensions['cola_tickets'] = self
+        app.cli.add_command(reanudar_tickets)
+        app.cli.add_command(migrar_tickets)
+
+    def encolar(self, venta_id):
+        """Agrega el trabajo a la sesión actual; se despacha con `despachar` después del commit."""
+        trabajo = TrabajoTicket(
+            venta_id=venta_id,
+            estatus=PENDIENTE,
+            url_base=request.host_url if has_request_context() else None
+        )
+        db.session.add(trabajo)
+        db.session.flush()
+        return trabajo
+
+    def despachar(self, trabajo):
+        id_trabajo = trabajo.id_trabajo
+        if self.app.config.get('TICKETS_SINCRONOS'):
+            return self.procesar(id_trabajo)
+        self.executor.submit(self._ejecutar, id_trabajo)
+
+    def _ejecutar(self, id_trabajo):
+        with self.app.app_context():
+            try:
+                self.procesar(id_trabajo)
+            except Exception:
+                logger.exception("Error inesperado procesando el trabajo de ticket %s", id_trabajo)
+
+    def procesar(self, id_trabajo):
+        """Genera el PDF de un trabajo pendiente. Regresa True si quedó listo."""
+        # Reclamar el trabajo de forma atómica para que dos hilos no lo procesen a la vez
+        reclamado = (db.session.query(TrabajoTicket)
+                     .filter(TrabajoTicket.id_trabajo == id_trabajo,
+                             TrabajoTicket.estatus == PENDIENTE)
+                     .update({
+                         TrabajoTicket.estatus: EN_PROCESO,
+                         TrabajoTicket.fechaInicio: datetime.utcnow(),
+                         TrabajoTicket.intentos: TrabajoTicket.intentos + 1
+                     }, synchronize_session=False))
+        db.session.commit()
+        if not reclamado:
+            return False
+
+        trabajo = db.session.get(TrabajoTicket, id_trabajo)
+        try:
+            datos = datos_ticket(trabajo.venta_id)
+            if datos is None:
+                raise LookupError(f"La venta {trabajo.venta_id} no existe")
+
+            # El template usa url_for(_external=True), por eso se simula el request original
+            with self.app.test_request_context(base_url=trabajo.url_base or 'http://localhost/'):
+                html = render_template(
+                    'ventas/ticket.html',
+                    fecha=datos['fecha'].strftime("%d/%m/%Y"),
+                    hora=datos['hora'].strftime("%H:%M:%S"),
+                    items=datos['items'],
+                    total=datos['total'],
+                    ticket_num=datos['ticket_num']
+                )
+
+            pdf_bytes = renderizar_pdf(html)
+
+            venta = db.session.get(Venta, trabajo.venta_id)
+            venta.ticket_ref = almacen_actual().guardar(pdf_bytes)
+            trabajo.estatus = LISTO
+            trabajo.error = None
+            trabajo.fechaFin = datetime.utcnow()
+            db.session.commit()
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            trabajo = db.session.get(TrabajoTicket, id_trabajo)
+            trabajo.estatus = ERROR
+            trabajo.error = str(e)[:255]
+            trabajo.fechaFin = datetime.utcnow()
+            db.session.commit()
+            logger.warning("No se pudo generar el ticket de la venta %s: %s", trabajo.venta_id, e)
+            return False
+
+    def revisar(self, trabajo, atascado=timedelta(minutes=5)):
+        """Vuelve a despachar un trabajo con error o atascado (p. ej. si el worker murió)."""
+        ahora = datetime.utcnow()
+        reintentar = (
+            (trabajo.estatus == ERROR and trabajo.intentos < MAX_INTENTOS) or
+            (trabajo.estatus == EN_PROCESO and trabajo.fechaInicio and trabajo.fechaInicio < ahora - atascado) or
+            (trabajo.estatus == PENDIENTE and trabajo.fechaAlta < ahora - atascado)
+        )
+        if not reintentar:
+            return False
+
+        trabajo.estatus = PENDIENTE
+        db.session.commit()
+        self.despachar(trabajo)
+        return True
+
+    def reanudar(self):
+        """Despacha de nuevo todos los trabajos que quedaron sin terminar."""
+        trabajos = (TrabajoTicket.query
+                    .filter(TrabajoTicket.estatus != LISTO)
+                    .filter(TrabajoTicket.intentos < MAX_INTENTOS)
+                    .all())
+        for trabajo in trabajos:
+            trabajo.estatus = PENDIENTE
+        db.session.commit()
+
+        for trabajo in trabajos:
+            self.despachar(trabajo)
+        return len(trabajos)
+
+
+cola_tickets = ColaTickets()
+
+
+def estatus_ticket(venta_id):
+    """Regresa el último trabajo de ticket de la venta, o None si nunca se encoló."""
+    return (TrabajoTicket.query
+            .filter_by(venta_id=venta_id)
+            .order_by(TrabajoTicket.id_trabajo.desc())
+            .first())
+
+
+@click.command('reanudar-tickets')
+def reanudar_tickets():
+    """Vuelve a encolar los tickets pendientes o con error."""
+    total = cola_tickets.reanudar()
+    cola_tickets.executor.shutdown(wait=True)
+    click.echo(f"Tickets reanudados: {total}")
+
+
+def es_pdf_base64(ticket):
+    """Los tickets anteriores al almacén guardaban el PDF en base64 dentro de Venta.ticket."""
+    return bool(ticket) and ticket.startswith('JVBER')
+
+
+def leer_ticket(venta):
+    """Regresa (clave, ruta, datos) del PDF de la venta; ruta o datos pueden ser None."""
+    if venta.ticket_ref:
+        almacen = almacen_actual()
+        ruta = almacen.ruta(venta.ticket_ref)
+        datos = None if ruta else almacen.leer(venta.ticket_ref)
+        return venta.ticket_ref, ruta, datos
+
+    if es_pdf_base64(venta.ticket):
+        datos = base64.b64decode(venta.ticket)
+        return almacen_actual().calcular_clave(datos), None, datos
+
+    return None, None, None
+
+
+@click.command('migrar-tickets')
+@click.option('--lote', default=200, help='Ventas procesadas por transacción.')
+def migrar_tickets(lote):
+    """Mueve los PDFs guardados en Venta.ticket al almacén de tickets."""
+    almacen = almacen_actual()
+    ultimo_id = 0
+    migrados = 0
+
+    while True:
+        ventas = (Venta.query
+                  .filter(Venta.id_venta > ultimo_id)
+                  .filter(Venta.ticket_ref.is_(None))
+                  .filter(Venta.ticket.like('JVBER%'))
+                  .order_by(Venta.id_venta)
+                  .limit(lote)
+                  .all())
+        if not ventas:
+            break
+
+        for venta in ventas:
+            venta.ticket_ref = almacen.guardar(base64.b64decode(venta.ticket))
+            venta.ticket = f"Venta-{venta.id_venta}"
+            migrados += 1
+        ultimo_id = ventas[-1].id_venta
+        db.session.commit()
+        db.session.expunge_all()
+
+    click.echo(f"Tickets migrados: {migrados}")
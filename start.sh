@@ -1,4 +1,4 @@
 #!/bin/bash
 apt-get update
 apt-get install -y wkhtmltopdf
-gunicorn --bind=0.0.0.0:8000 app:app
\ No newline at end of file
+APP_CONFIG=${APP_CONFIG:-production} gunicorn --bind=0.0.0.0:8000 app:app
\ No newline at end of file
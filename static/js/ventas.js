@@ -44,6 +44,13 @@ document.addEventListener("DOMContentLoaded", function() {
             fetch(`/venta/obtener_lotes/${galletaId}`)
                 .then(response => response.json())
                 .then(data => {
+                    if (data.length) {
+                        // El servidor reparte entre lotes, primero los que caducan antes
+                        let automatico = document.createElement("option");
+                        automatico.value = "fefo";
+                        automatico.textContent = "Automático (primero en caducar)";
+                        loteSelect.appendChild(automatico);
+                    }
                     data.forEach(lote => {
                         let option = document.createElement("option");
                         option.value = lote.id;
@@ -60,7 +67,7 @@ document.addEventListener("DOMContentLoaded", function() {
 
     // Actualizar campos ocultos cuando seleccionan un lote
     loteSelect.addEventListener("change", function() {
-        if (this.value) {
+        if (this.value && this.value !== "fefo") {
             const selectedOption = this.options[this.selectedIndex];
             existenciaInput.value = selectedOption.dataset.existencia;
             fechaCaducidadInput.value = selectedOption.dataset.fechaCaducidad;
@@ -81,20 +88,21 @@ document.addEventListener("DOMContentLoaded", function () {
             const ventaId = this.getAttribute("data-id");
 
             try {
-                // Obtener el ticket en Base64 desde el backend
+                // Obtener el PDF del ticket desde el backend
                 const response = await fetch(`obtener_ticket/${ventaId}`);
-                const data = await response.json();
 
-                if (!data.ticket_base64) {
+                // El PDF se genera en segundo plano
+                if (response.status === 202) {
+                    alert("El ticket se está generando, intenta de nuevo en unos segundos.");
+                    return;
+                }
+
+                if (!response.ok) {
                     alert("No se encontró el ticket.");
                     return;
                 }
 
-                // Convertir Base64 a Blob (PDF)
-                const byteCharacters = atob(data.ticket_base64);
-                const byteNumbers = new Array(byteCharacters.length).fill(0).map((_, i) => byteCharacters.charCodeAt(i));
-                const byteArray = new Uint8Array(byteNumbers);
-                const blob = new Blob([byteArray], { type: "application/pdf" });
+                const blob = await response.blob();
 
                 // Crear una URL y abrirla en nueva ventana
                 const pdfUrl = URL.createObjectURL(blob);
@@ -44,10 +44,45 @@ def db_session(app):
     for table in reversed(db.metadata.sorted_tables):
         session.execute(table.delete())
     session.commit()
+    session.expunge_all()
+    # Los ids se reutilizan entre pruebas; no deben quedar listas de materiales compiladas
+    from services import recetas, catalogo, alertas
+    from model import dashboard_model
+    recetas.invalidar()
+    catalogo.limpiar()
+    alertas.limpiar()
+    dashboard_model.limpiar_cache()
     yield session
     # Rollback para limpiar cualquier cambio no commitado
     session.rollback()
 
+@pytest.fixture(scope='function')
+def contar_consultas(app):
+    """
+    Cuenta las sentencias SQL ejecutadas dentro del bloque y falla si pasan del máximo.
+    Uso: with contar_consultas(5) as sentencias: ...
+    """
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from extensions import db
+
+    @contextmanager
+    def contar(maximo):
+        sentencias = []
+
+        def registrar(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            yield sentencias
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+        assert len(sentencias) <= maximo, \
+            f"Se ejecutaron {len(sentencias)} consultas (máximo {maximo}):\n" + "\n".join(sentencias)
+
+    return contar
+
 @pytest.fixture(scope='function')
 def sample_persona(db_session):
     """Fixture para crear una persona de prueba"""
@@ -99,4 +134,79 @@ def sample_cliente(db_session, sample_persona, sample_usuario):
     
     db_session.add(cliente)
     db_session.commit()
-    return cliente
\ No newline at end of file
+    return cliente
+
+@pytest.fixture(scope='function')
+def sample_lote(db_session):
+    """Fixture para crear una galleta con un lote de prueba"""
+    from model.tipo_galleta import TipoGalleta
+    from model.receta import Receta
+    from model.galleta import Galleta
+    from model.lote_galleta import LoteGalletas
+
+    tipo = TipoGalleta(nombre="Unidad", costo=10)
+    receta = Receta(nombreReceta="Chispas", ingredientes=[], cantidad_galletas=50)
+    db_session.add_all([tipo, receta])
+    db_session.commit()
+
+    galleta = Galleta(
+        tipo_galleta_id=tipo.id_tipo_galleta,
+        galleta="Chispas",
+        existencia=100,
+        receta_id=receta.idReceta
+    )
+    db_session.add(galleta)
+    db_session.commit()
+
+    lote = LoteGalletas(
+        galleta_id=galleta.id_galleta,
+        fechaProduccion=date.today(),
+        fechaCaducidad=date.today(),
+        cantidad=100,
+        costo=450,
+        existencia=100
+    )
+    db_session.add(lote)
+    db_session.commit()
+    return lote
+
+@pytest.fixture(scope='function')
+def sample_venta(db_session, sample_lote):
+    """Fixture para crear una venta con un detalle de prueba"""
+    from model.venta import Venta
+    from model.detalle_venta import DetalleVentaGalletas
+
+    ahora = datetime.now()
+    venta = Venta(
+        total=30,
+        fecha=ahora.date(),
+        hora=ahora.time(),
+        ticket="TK-PRUEBA",
+        tipoVenta="Punto de Venta"
+    )
+    db_session.add(venta)
+    db_session.commit()
+
+    detalle = DetalleVentaGalletas(
+        venta_id=venta.id_venta,
+        lote_id=sample_lote.id_lote,
+        cantidad=3,
+        subtotal=30
+    )
+    db_session.add(detalle)
+    db_session.commit()
+    return venta
+
+@pytest.fixture
+def linea():
+    """Fábrica de renglones de carrito: linea(lote_id, cantidad, precio=10.0, galleta_id=1)"""
+    def crear(lote_id, cantidad, precio=10.0, galleta_id=1):
+        return {
+            "id_galleta": galleta_id,
+            "nombre": "Chispas",
+            "cantidad": cantidad,
+            "precio_unitario": precio,
+            "subtotal": precio * cantidad,
+            "lote_id": lote_id
+        }
+    return crear
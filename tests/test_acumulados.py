@@ -0,0 +1,47 @@
+from datetime import date
+from decimal import Decimal
+
+
+class TestActualizarOInsertar:
+    """Pruebas para la suma de acumulados en motores sin upsert"""
+
+    def test_inserta_y_suma(self, db_session):
+        """Test: La primera fila se inserta y las siguientes se suman"""
+        from model.caja_diaria import CajaDiaria
+        from services.acumulados import _actualizar_o_insertar
+
+        fila = {'fecha': date.today(), 'tipoVenta': 'Punto de Venta', 'hora': 10, 'total': 50, 'ventas': 1}
+        _actualizar_o_insertar(CajaDiaria.__table__, [fila, fila], ('fecha', 'tipoVenta', 'hora'),
+                               ('total', 'ventas'))
+        db_session.commit()
+
+        renglon = CajaDiaria.query.one()
+        assert (renglon.total, renglon.ventas) == (Decimal('100'), 2)
+
+    def test_otra_transaccion_inserta_primero(self, app, db_session):
+        """Test: Si otra venta inserta el renglón entre el UPDATE y el INSERT, se suma en lugar de fallar"""
+        from sqlalchemy import event
+        from extensions import db
+        from model.caja_diaria import CajaDiaria
+        from services.acumulados import _actualizar_o_insertar
+
+        fila = {'fecha': date.today(), 'tipoVenta': 'Punto de Venta', 'hora': 10, 'total': 50, 'ventas': 1}
+        competidor = []
+
+        def insertar_antes(conn, cursor, statement, parameters, context, executemany):
+            # Justo después del UPDATE sin renglones, antes del INSERT (o de su SAVEPOINT)
+            if statement.startswith(('SAVEPOINT', 'INSERT INTO "cajaDiaria"')) and not competidor:
+                competidor.append(True)
+                cursor.execute('INSERT INTO "cajaDiaria" (fecha, "tipoVenta", hora, total, ventas) '
+                               'VALUES (?, ?, ?, ?, ?)', (date.today().isoformat(), 'Punto de Venta', 10, 30, 1))
+
+        event.listen(db.engine, 'before_cursor_execute', insertar_antes)
+        try:
+            _actualizar_o_insertar(CajaDiaria.__table__, [fila], ('fecha', 'tipoVenta', 'hora'),
+                                   ('total', 'ventas'))
+            db_session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', insertar_antes)
+
+        renglon = CajaDiaria.query.one()
+        assert (renglon.total, renglon.ventas) == (Decimal('80'), 2)
@@ -0,0 +1,63 @@
+class TestAlertas:
+    """Pruebas para las alertas de agotamiento y caducidad"""
+
+    def test_endpoint_y_umbral(self, client, sample_lote):
+        """Test: El JSON trae los lotes por caducar y el umbral propio de la galleta cambia el agotamiento"""
+        galleta_id, lote_id = sample_lote.galleta_id, sample_lote.id_lote
+
+        datos = client.get('/produccion/alertas').get_json()
+        assert datos['agotamiento'] == []
+        assert [(a['lote_id'], a['existencia'], a['dias_restantes']) for a in datos['caducidad']] == [(lote_id, 100, 0)]
+
+        response = client.post('/produccion/alertas/umbral', data={'galleta_id': galleta_id, 'umbral': 120})
+        assert response.status_code == 200
+
+        datos = client.get('/produccion/alertas').get_json()
+        assert [(a['nombre'], a['total'], a['umbral']) for a in datos['agotamiento']] == [('Chispas', 100, 120)]
+
+    def test_umbral_invalido(self, client, db_session, sample_lote):
+        """Test: Un umbral negativo o que no es entero se rechaza y no cambia el guardado"""
+        from model.galleta import Galleta
+
+        galleta_id = sample_lote.galleta_id
+        assert client.post('/produccion/alertas/umbral', data={'galleta_id': galleta_id, 'umbral': 40}).status_code == 200
+
+        for umbral in ('-5', 'diez', '2.5'):
+            response = client.post('/produccion/alertas/umbral', data={'galleta_id': galleta_id, 'umbral': umbral})
+            assert response.status_code == 400
+
+        db_session.expunge_all()
+        assert db_session.get(Galleta, galleta_id).umbral_alerta == 40
+
+    def test_cache_hasta_movimiento(self, app, db_session, sample_lote, contar_consultas):
+        """Test: Las alertas no se recalculan hasta que se confirma un movimiento de existencias"""
+        from services import alertas, stock
+
+        lote = sample_lote
+        assert alertas.alertas()['agotamiento'] == []
+
+        with contar_consultas(0):
+            alertas.alertas()
+
+        stock.mermar(lote, 80)
+        db_session.commit()
+
+        assert [a['total'] for a in alertas.alertas()['agotamiento']] == [20]
+        assert alertas.alertas()['caducidad'][0]['existencia'] == 20
+
+    def test_resumen_ignora_lotes_agotados(self, app, db_session, sample_lote):
+        """Test: Los lotes caducados sin existencia no aparecen en el resumen"""
+        from datetime import date, timedelta
+        from model.lote_galleta import LoteGalletas
+        from services.alertas import alertas_resumen_command
+
+        db_session.add(LoteGalletas(galleta_id=sample_lote.galleta_id, fechaProduccion=date.today() - timedelta(days=60),
+                                    fechaCaducidad=date.today() - timedelta(days=53), cantidad=50, costo=450,
+                                    existencia=0))
+        db_session.commit()
+
+        resultado = app.test_cli_runner().invoke(alertas_resumen_command)
+
+        assert 'Por agotarse: 0' in resultado.output
+        assert 'Por caducar: 1' in resultado.output
+        assert f'lote {sample_lote.id_lote}: 100 piezas' in resultado.output
@@ -0,0 +1,37 @@
+class TestComparar:
+    """Pruebas para la comparación contra la línea base de los benchmarks"""
+
+    BASE = {'punto_de_venta': {'operaciones': 100, 'errores': 0, 'por_segundo': 40.0, 'p50_ms': 60.0,
+                               'p95_ms': 200.0, 'p99_ms': 300.0, 'consultas_por_operacion': 19.0}}
+
+    def test_sin_cambios(self):
+        """Test: Variaciones dentro de la tolerancia no son regresión"""
+        from benchmarks.correr import comparar
+
+        actual = dict(self.BASE['punto_de_venta'], p95_ms=280.0, por_segundo=25.0)
+        assert comparar({'punto_de_venta': actual}, self.BASE, 0.5) == []
+
+    def test_regresiones(self):
+        """Test: Más consultas, más errores o más latencia se reportan"""
+        from benchmarks.correr import comparar
+
+        actual = dict(self.BASE['punto_de_venta'], p95_ms=400.0, errores=3, consultas_por_operacion=25.0)
+        regresiones = comparar({'punto_de_venta': actual}, self.BASE, 0.5)
+
+        assert len(regresiones) == 3
+        assert any('consultas' in regresion for regresion in regresiones)
+
+    def test_escenario_nuevo(self):
+        """Test: Un escenario sin línea base no se compara"""
+        from benchmarks.correr import comparar
+
+        assert comparar({'produccion': self.BASE['punto_de_venta']}, self.BASE, 0.5) == []
+
+    def test_envolvente(self):
+        """Test: La línea base guarda el peor valor de cada métrica entre corridas"""
+        from benchmarks.correr import envolvente
+
+        otra = dict(self.BASE['punto_de_venta'], p95_ms=260.0, por_segundo=45.0, p50_ms=50.0)
+        peor = envolvente([self.BASE, {'punto_de_venta': otra}])['punto_de_venta']
+
+        assert (peor['p95_ms'], peor['p50_ms'], peor['por_segundo']) == (260.0, 60.0, 40.0)
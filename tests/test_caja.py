@@ -0,0 +1,120 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+def nueva_venta(db_session, total, tipo="Punto de Venta", fecha=None, hora=time(10, 30)):
+    from model.venta import Venta
+
+    venta = Venta(total=total, fecha=fecha or date.today(), hora=hora, ticket="TK", tipoVenta=tipo)
+    db_session.add(venta)
+    db_session.commit()
+    return venta
+
+class TestCajaDiaria:
+    """Pruebas para la caja acumulada por día"""
+
+    def test_registrar_suma_por_tipo_y_hora(self, db_session):
+        """Test: Las ventas se juntan por tipo de venta y hora"""
+        from services import caja
+
+        for total, tipo, hora in [(30, "Punto de Venta", time(10, 5)), (20, "Punto de Venta", time(10, 50)),
+                                  (15, "Portal", time(12, 0))]:
+            caja.registrar_venta(nueva_venta(db_session, total, tipo, hora=hora))
+        db_session.commit()
+
+        assert caja.total_dia(date.today()) == Decimal('65')
+        desglose = caja.desglose_dia(date.today())
+        assert desglose['por_tipo']['Punto de Venta'] == {'total': Decimal('50'), 'ventas': 2}
+        assert desglose['por_tipo']['Portal'] == {'total': Decimal('15'), 'ventas': 1}
+        assert list(desglose['por_hora']) == [10, 12]
+
+    def test_total_dia_sin_ventas(self, db_session):
+        """Test: Sin ventas el total es None"""
+        from services import caja
+
+        assert caja.total_dia(date.today()) is None
+
+    def test_reconstruir_igual_a_acumulado(self, db_session):
+        """Test: Reconstruir desde las ventas da lo mismo que acumular"""
+        from services import caja
+        from model.caja_diaria import CajaDiaria
+
+        for total, hora in [(30, time(9, 0)), (12.5, time(9, 45)), (40, time(18, 10))]:
+            caja.registrar_venta(nueva_venta(db_session, total, hora=hora))
+        db_session.commit()
+        acumulado = [(r.fecha, r.tipoVenta, r.hora, r.total, r.ventas) for r in CajaDiaria.query.order_by(CajaDiaria.hora)]
+
+        caja.reconstruir()
+        db_session.commit()
+        reconstruido = [(r.fecha, r.tipoVenta, r.hora, r.total, r.ventas) for r in CajaDiaria.query.order_by(CajaDiaria.hora)]
+
+        assert acumulado == reconstruido
+
+    def test_finalizar_venta_acumula(self, app, client, db_session, sample_lote, monkeypatch):
+        """Test: Cerrar una venta en el punto de venta la suma a la caja"""
+        from services.carritos import carritos
+        from services import caja
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', {"lote_id": sample_lote.id_lote, "cantidad": 2, "subtotal": 20.0})
+
+        client.post('/venta/finalizar')
+        assert caja.total_dia(date.today()) == Decimal('20')
+
+class TestCorteCaja:
+    """Pruebas para el corte de caja"""
+
+    def test_corte_usa_caja_acumulada(self, client, db_session):
+        """Test: El total del corte sale de la caja del día"""
+        from services import caja
+        from model.corte_caja import CorteCaja
+
+        caja.registrar_venta(nueva_venta(db_session, 80))
+        db_session.commit()
+
+        response = client.post('/venta/corte-caja', data={
+            'fecha': date.today().isoformat(), 'cantidadCaja': '75', 'observaciones': ''})
+        assert response.status_code == 302
+
+        corte = CorteCaja.query.one()
+        assert (corte.totalVenta, corte.diferencial) == (80.0, Decimal('5'))
+
+    def test_paginar_cortes(self, db_session):
+        """Test: Los cortes se paginan del más reciente al más antiguo"""
+        from controller.controller_venta import paginar_cortes
+        from model.corte_caja import CorteCaja
+
+        hoy = date.today()
+        db_session.add_all([
+            CorteCaja(fecha=hoy - timedelta(days=dias), totalVenta=10, cantidadCaja=10, diferencial=0)
+            for dias in range(5)
+        ])
+        db_session.commit()
+
+        pagina, siguiente = paginar_cortes(limite=2)
+        assert [c.fecha for c in pagina] == [hoy, hoy - timedelta(days=1)]
+        assert siguiente == (hoy - timedelta(days=1)).isoformat()
+
+        pagina, siguiente = paginar_cortes(antes=date.fromisoformat(siguiente), limite=2)
+        assert [c.fecha for c in pagina] == [hoy - timedelta(days=2), hoy - timedelta(days=3)]
+
+        pagina, siguiente = paginar_cortes(antes=hoy - timedelta(days=3), limite=2)
+        assert len(pagina) == 1 and siguiente is None
+
+    def test_actualizar_esquema_llena_historial(self, app, db_session):
+        """Test: Al crear la caja diaria en una base con ventas se llena con los días anteriores"""
+        from extensions import db
+        from model.caja_diaria import CajaDiaria
+        from services.esquema import actualizar_esquema
+
+        ayer = date.today() - timedelta(days=1)
+        nueva_venta(db_session, 30, fecha=ayer)
+        nueva_venta(db_session, 20, fecha=ayer, hora=time(10, 45))
+        db_session.close()
+        CajaDiaria.__table__.drop(db.engine)
+
+        agregadas = actualizar_esquema()
+
+        assert 'cajaDiaria (llenada con el historial de ventas)' in agregadas
+        assert [(r.fecha, r.hora, r.total, r.ventas) for r in CajaDiaria.query.all()] == [(ayer, 10, Decimal('50'), 2)]
@@ -0,0 +1,120 @@
+import pytest
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def backend(request, tmp_path):
+    """Cada prueba se corre contra los backends que no requieren servidor"""
+    from services.carritos import CarritosMemoria, CarritosSQLite
+
+    if request.param == 'sqlite':
+        return CarritosSQLite(str(tmp_path / 'carritos.db'), ttl=60)
+    return CarritosMemoria(ttl=60, maximo=100)
+
+@pytest.fixture
+def almacen(backend):
+    from services.carritos import Carritos
+
+    carritos = Carritos()
+    carritos.backend = backend
+    return carritos
+
+class TestCarritos:
+    """Pruebas para los carritos del lado del servidor"""
+
+    def test_agregar_y_obtener(self, almacen, linea):
+        """Test: Los renglones agregados se recuperan en orden"""
+        almacen.agregar('venta:a', linea(1, 2))
+        almacen.agregar('venta:a', linea(2, 3))
+
+        lineas = almacen.obtener('venta:a')
+        assert [l['lote_id'] for l in lineas] == [1, 2]
+
+    def test_carritos_independientes(self, almacen, linea):
+        """Test: Cada clave tiene su propio carrito"""
+        almacen.agregar('venta:a', linea(1, 2))
+        assert almacen.obtener('venta:b') == []
+
+    def test_quitar_por_indice_y_criterio(self, almacen, linea):
+        """Test: Quitar un renglón por posición o por campo"""
+        almacen.agregar('venta:a', linea(1, 2, galleta_id=1))
+        almacen.agregar('venta:a', linea(2, 3, galleta_id=2))
+        almacen.agregar('venta:a', linea(3, 4, galleta_id=3))
+
+        almacen.quitar('venta:a', indice=0)
+        almacen.quitar('venta:a', id_galleta=3)
+
+        assert [l['lote_id'] for l in almacen.obtener('venta:a')] == [2]
+
+    def test_quitar_indice_invalido(self, almacen, linea):
+        """Test: Un índice fuera de rango no modifica el carrito"""
+        almacen.agregar('venta:a', linea(1, 2))
+        almacen.quitar('venta:a', indice=5)
+        assert len(almacen.obtener('venta:a')) == 1
+
+    def test_limpiar(self, almacen, linea):
+        """Test: Limpiar deja el carrito vacío"""
+        almacen.agregar('venta:a', linea(1, 2))
+        almacen.limpiar('venta:a')
+        assert almacen.obtener('venta:a') == []
+
+    def test_reservas_por_lote(self, almacen, linea):
+        """Test: Las reservas suman las cantidades por lote"""
+        almacen.agregar('venta:a', linea(1, 2))
+        almacen.agregar('venta:a', linea(1, 3))
+        almacen.agregar('venta:a', linea(2, 4))
+
+        assert almacen.reservas('venta:a') == {1: 5, 2: 4}
+
+    def test_carrito_grande(self, almacen, linea):
+        """Test: El carrito admite cientos de renglones"""
+        for i in range(300):
+            almacen.agregar('venta:a', linea(i, 1))
+        assert len(almacen.obtener('venta:a')) == 300
+
+    def test_agregar_concurrente(self, almacen, linea):
+        """Test: Agregar desde varios hilos a la vez no pierde renglones"""
+        import threading
+
+        def agregar(lote_id):
+            for _ in range(20):
+                almacen.agregar('venta:a', linea(lote_id, 1))
+
+        hilos = [threading.Thread(target=agregar, args=(lote_id,)) for lote_id in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert almacen.reservas('venta:a') == {0: 20, 1: 20, 2: 20, 3: 20}
+
+    def test_modificar_sin_cambios(self, almacen, linea):
+        """Test: Si el cambio regresa None el carrito queda igual"""
+        almacen.agregar('venta:a', linea(1, 2))
+
+        assert almacen.modificar('venta:a', lambda lineas: None) is None
+        assert [l['cantidad'] for l in almacen.obtener('venta:a')] == [2]
+
+class TestCarritoVentas:
+    """Pruebas del carrito desde las rutas de ventas"""
+
+    def test_eliminar_detalle_quita_renglon(self, client, db_session, sample_lote, linea):
+        """Test: Eliminar un detalle lo quita del carrito del servidor"""
+        from services.carritos import carritos
+
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 30))
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 5))
+
+        client.post('/venta/eliminar_detalle/0')
+        assert [l['cantidad'] for l in carritos.obtener('venta:prueba')] == [5]
+
+    def test_cancelar_venta_limpia_carrito(self, client, db_session, sample_lote, linea):
+        """Test: Cancelar la venta vacía el carrito del servidor"""
+        from services.carritos import carritos
+
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 30))
+
+        client.post('/venta/cancelar_venta')
+        assert carritos.obtener('venta:prueba') == []
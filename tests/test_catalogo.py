@@ -0,0 +1,57 @@
+class TestCatalogo:
+    """Pruebas para el catálogo en memoria"""
+
+    def test_sin_consultas_despues_de_cargar(self, app, sample_lote, contar_consultas):
+        """Test: Una vez cargado, nombre, tipo y precio salen de memoria"""
+        from services import catalogo
+
+        galleta_id = sample_lote.galleta_id
+        catalogo.catalogo()
+
+        with contar_consultas(0):
+            galleta = catalogo.galleta(str(galleta_id))
+            assert (galleta['galleta'], galleta['tipo'], galleta['costo']) == ('Chispas', 'Unidad', 10)
+            assert catalogo.tipo_por_nombre('Unidad')['id_tipo_galleta'] == galleta['tipo_galleta_id']
+            assert [r['nombreReceta'] for r in catalogo.recetas()] == ['Chispas']
+            assert catalogo.galleta('abc') is None
+
+    def test_otro_worker_invalida(self, app, db_session, sample_lote, monkeypatch):
+        """Test: Si otro worker sube la generación, el catálogo se recarga en la siguiente revisión"""
+        from model.catalogo_version import CatalogoVersion
+        from model.tipo_galleta import TipoGalleta
+        from services import catalogo
+
+        galleta_id = sample_lote.galleta_id
+        catalogo.catalogo()
+
+        # Otro worker cambia el precio y sube la generación en la base
+        db_session.query(TipoGalleta).update({'costo': 12})
+        db_session.add(CatalogoVersion(id=1, generacion=1))
+        db_session.commit()
+
+        monkeypatch.setitem(app.config, 'CATALOGO_REVISION', 60)
+        assert catalogo.galleta(galleta_id)['costo'] == 10
+
+        monkeypatch.setitem(app.config, 'CATALOGO_REVISION', 0)
+        assert catalogo.galleta(galleta_id)['costo'] == 12
+
+    def test_admin_invalida(self, client, sample_lote):
+        """Test: Desactivar una receta la quita del catálogo de inmediato"""
+        from services import catalogo
+
+        receta_id = sample_lote.galleta_lotes.receta_id
+        assert catalogo.receta(receta_id)['estatus'] == 1
+
+        client.get(f'/administracion/recetas/eliminar?idReceta={receta_id}')
+        assert catalogo.recetas() == []
+
+    def test_agregar_al_carrito_portal(self, client, sample_lote, contar_consultas):
+        """Test: Agregar al carrito del portal solo consulta la existencia"""
+        galleta_id = sample_lote.galleta_id
+        client.get('/portal/portal-cliente')
+
+        with contar_consultas(1) as sentencias:
+            response = client.post('/portal/portal-cliente', data={'action': 'agregar', 'galleta_id': galleta_id,
+                                                                  'cantidad': 3})
+        assert response.status_code == 302
+        assert 'existencia' in sentencias[0]
@@ -0,0 +1,138 @@
+import pytest
+from datetime import date, timedelta
+
+class TestResumenVentas:
+    """Pruebas para el resumen diario de ventas"""
+
+    def test_acumular_suma_por_galleta(self, db_session, sample_lote, linea):
+        """Test: Varias ventas del mismo día se suman en un renglón"""
+        from services import resumen_ventas
+        from model.venta_diaria import VentaDiaria
+
+        hoy = date.today()
+        resumen_ventas.acumular(hoy, [linea(sample_lote.id_lote, 2), linea(sample_lote.id_lote, 3)])
+        resumen_ventas.acumular(hoy, [linea(sample_lote.id_lote, 5)])
+        db_session.commit()
+
+        renglon = VentaDiaria.query.one()
+        assert (renglon.cantidad, float(renglon.total)) == (10, 100.0)
+
+    def test_reconstruir_igual_a_acumulado(self, db_session, sample_lote, sample_venta, linea):
+        """Test: Reconstruir desde los detalles da lo mismo que acumular"""
+        from services import resumen_ventas
+        from model.venta_diaria import VentaDiaria
+
+        resumen_ventas.acumular(sample_venta.fecha, [linea(sample_lote.id_lote, 3)])
+        db_session.commit()
+        acumulado = [(r.fecha, r.galleta_id, r.cantidad, float(r.total)) for r in VentaDiaria.query.all()]
+
+        resumen_ventas.reconstruir()
+        db_session.commit()
+        reconstruido = [(r.fecha, r.galleta_id, r.cantidad, float(r.total)) for r in VentaDiaria.query.all()]
+
+        assert acumulado == reconstruido
+
+    def test_finalizar_venta_acumula(self, app, client, db_session, sample_lote, monkeypatch, linea):
+        """Test: Cerrar una venta la suma al resumen"""
+        from services.carritos import carritos
+        from model.venta_diaria import VentaDiaria
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 4))
+
+        client.post('/venta/finalizar')
+        assert VentaDiaria.query.one().cantidad == 4
+
+class TestDashboardModel:
+    """Pruebas para las consultas del dashboard"""
+
+    def test_consultas_desde_resumen(self, db_session, sample_lote, linea):
+        """Test: Las gráficas salen del resumen diario"""
+        from services import resumen_ventas
+        from model import dashboard_model
+
+        hoy = date.today()
+        resumen_ventas.acumular(hoy - timedelta(days=1), [linea(sample_lote.id_lote, 2)])
+        resumen_ventas.acumular(hoy, [linea(sample_lote.id_lote, 5)])
+        resumen_ventas.acumular(hoy - timedelta(days=30), [linea(sample_lote.id_lote, 7)])
+        db_session.commit()
+
+        fechas, totales = dashboard_model.get_ventas_diarias()
+        assert totales == [20.0, 50.0]
+        assert dashboard_model.get_productos_mas_vendidos() == (['Chispas'], [14])
+        assert dashboard_model.get_presentaciones_mas_vendidas() == (['Unidad'], [14])
+
+    def test_resultados_en_cache(self, db_session, sample_lote, linea):
+        """Test: Las consultas se guardan en memoria hasta que vence la cache"""
+        from services import resumen_ventas
+        from model import dashboard_model
+
+        resumen_ventas.acumular(date.today(), [linea(sample_lote.id_lote, 2)])
+        db_session.commit()
+        assert dashboard_model.get_productos_mas_vendidos() == (['Chispas'], [2])
+
+        resumen_ventas.acumular(date.today(), [linea(sample_lote.id_lote, 3)])
+        db_session.commit()
+        assert dashboard_model.get_productos_mas_vendidos() == (['Chispas'], [2])
+
+        dashboard_model.limpiar_cache()
+        assert dashboard_model.get_productos_mas_vendidos() == (['Chispas'], [5])
+
+@pytest.fixture
+def resumen_mes(db_session, sample_lote, linea):
+    """Ventas de una galleta en varios días de enero de 2024"""
+    from services import resumen_ventas
+
+    for dia, cantidad in [(1, 2), (2, 3), (8, 4), (31, 1)]:
+        resumen_ventas.acumular(date(2024, 1, dia), [linea(sample_lote.id_lote, cantidad)])
+    resumen_ventas.acumular(date(2024, 2, 1), [linea(sample_lote.id_lote, 6)])
+    db_session.commit()
+
+class TestDashboardEndpoints:
+    """Pruebas para los endpoints JSON del dashboard"""
+
+    def test_ventas_por_semana(self, client, resumen_mes):
+        """Test: Los días se agrupan en semanas que inician en lunes"""
+        data = client.get('/dashboard/ventas', query_string={
+            'desde': '2024-01-01', 'hasta': '2024-01-31', 'granularidad': 'semana'}).get_json()
+
+        assert data['periodos'] == ['2024-01-01', '2024-01-08', '2024-01-29']
+        assert data['cantidades'] == [5, 4, 1]
+        assert data['totales'] == [50.0, 40.0, 10.0]
+
+    def test_ventas_por_mes(self, client, resumen_mes):
+        """Test: Agrupación mensual"""
+        data = client.get('/dashboard/ventas', query_string={
+            'desde': '2024-01-01', 'hasta': '2024-02-29', 'granularidad': 'mes'}).get_json()
+
+        assert data['periodos'] == ['2024-01', '2024-02']
+        assert data['cantidades'] == [10, 6]
+
+    def test_productos_y_presentaciones_por_rango(self, client, resumen_mes):
+        """Test: Los más vendidos respetan el rango de fechas"""
+        productos = client.get('/dashboard/productos', query_string={'desde': '2024-02-01'}).get_json()
+        presentaciones = client.get('/dashboard/presentaciones').get_json()
+
+        assert productos == {'nombres': ['Chispas'], 'cantidades': [6]}
+        assert presentaciones == {'nombres': ['Unidad'], 'cantidades': [16]}
+
+    def test_etag_y_last_modified(self, client, resumen_mes):
+        """Test: Si los datos no cambiaron se responde 304"""
+        consulta = {'desde': '2024-01-01', 'hasta': '2024-01-31'}
+        primera = client.get('/dashboard/ventas', query_string=consulta)
+        assert primera.headers.get('ETag')
+        assert primera.headers.get('Last-Modified')
+
+        segunda = client.get('/dashboard/ventas', query_string=consulta,
+                             headers={'If-None-Match': primera.headers['ETag']})
+        assert segunda.status_code == 304
+        assert segunda.data == b''
+
+    def test_parametros_invalidos(self, client, db_session):
+        """Test: Fechas o granularidad inválidas responden 400"""
+        assert client.get('/dashboard/ventas?desde=ayer').status_code == 400
+        assert client.get('/dashboard/ventas?granularidad=anio').status_code == 400
+        assert client.get('/dashboard/ventas?desde=2024-02-01&hasta=2024-01-01').status_code == 400
+        assert client.get('/dashboard/productos?limite=0').status_code == 400
@@ -0,0 +1,66 @@
+VOLUMEN = dict(clientes=5, empleados=3, proveedores=2, insumos=8, galletas=6, lotes=12,
+               ordenes=20, pendientes=5, ventas=200, renglones=3)
+
+class TestDatosSinteticos:
+    """Pruebas para el generador de datos de volumen"""
+
+    def test_datos_consistentes(self, db_session):
+        """Test: Cada venta sale de un lote vigente y las existencias cuadran con lo vendido"""
+        from sqlalchemy import func
+        from model.venta import Venta
+        from model.detalle_venta import DetalleVentaGalletas
+        from model.lote_galleta import LoteGalletas
+        from model.galleta import Galleta
+        from model.orden import Orden
+        from model.detalle_venta_orden import DetalleVentaOrden
+        from model.empleado import Empleado
+        from model.solicitud_produccion import SolicitudProduccion
+        from services import caja
+        from services.datos_sinteticos import generar
+
+        resultado = generar('chica', semilla=3, **VOLUMEN)
+        db_session.commit()
+
+        assert resultado['renglones']['ventas'] == Venta.query.count() == 200 + 15
+        assert Orden.query.count() == 20 and Empleado.query.count() == 3
+        assert len(resultado['ordenes_pendientes']) == 5
+        renglones_pendientes = (DetalleVentaOrden.query
+                                .filter(DetalleVentaOrden.orden_id.in_(resultado['ordenes_pendientes'])).count())
+        assert SolicitudProduccion.query.filter_by(estatus=1).count() == renglones_pendientes
+
+        fuera_de_vigencia = (db_session.query(DetalleVentaGalletas)
+                             .join(Venta).join(LoteGalletas)
+                             .filter((Venta.fecha < LoteGalletas.fechaProduccion) |
+                                     (Venta.fecha > LoteGalletas.fechaCaducidad))
+                             .count())
+        assert fuera_de_vigencia == 0
+
+        vendidos = dict(db_session.query(DetalleVentaGalletas.lote_id, func.sum(DetalleVentaGalletas.cantidad))
+                        .group_by(DetalleVentaGalletas.lote_id).all())
+        for lote in LoteGalletas.query.all():
+            assert lote.cantidad == vendidos.get(lote.id_lote, 0) + lote.existencia
+        for galleta in Galleta.query.all():
+            assert galleta.existencia == sum(l.existencia for l in LoteGalletas.query.filter_by(galleta_id=galleta.id_galleta))
+
+        total = db_session.query(func.sum(Venta.total)).filter(Venta.fecha == Venta.query.first().fecha).scalar()
+        assert caja.total_dia(Venta.query.first().fecha) == total
+
+    def test_misma_semilla_mismos_datos(self, db_session):
+        """Test: Con la misma semilla se generan las mismas ventas"""
+        from model.venta import Venta
+        from services.datos_sinteticos import generar
+
+        generar('chica', semilla=7, **VOLUMEN)
+        primera = [(v.fecha, v.hora, v.total) for v in Venta.query.order_by(Venta.id_venta)]
+        db_session.rollback()
+
+        generar('chica', semilla=7, **VOLUMEN)
+        assert [(v.fecha, v.hora, v.total) for v in Venta.query.order_by(Venta.id_venta)] == primera
+
+    def test_comando_rechaza_base_con_datos(self, app, db_session, sample_lote):
+        """Test: El comando no mezcla los datos generados con los existentes"""
+        from services.datos_sinteticos import generar_datos_command
+
+        resultado = app.test_cli_runner().invoke(generar_datos_command, [])
+        assert resultado.exit_code != 0
+        assert 'base vacía' in resultado.output
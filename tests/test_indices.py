@@ -0,0 +1,36 @@
+class TestIndices:
+    """Pruebas para los índices de las consultas frecuentes"""
+
+    def test_consultas_usan_indices(self, db_session):
+        """Test: Con los índices declarados ninguna consulta frecuente recorre tablas completas"""
+        from services import indices
+
+        assert indices.revisar() == []
+
+    def test_reporta_recorrido_completo(self, db_session, monkeypatch):
+        """Test: Una consulta por una columna sin índice se reporta"""
+        from services import indices
+        from model.venta import Venta
+        from extensions import db
+
+        monkeypatch.setattr(indices, 'consultas', lambda: [
+            ('ventas por tipo', db.select(Venta.id_venta).where(Venta.tipoVenta == 'Portal'))
+        ])
+        assert indices.revisar() == [('ventas por tipo', ['ventas'])]
+
+    def test_crear_indices_faltantes(self, app, db_session):
+        """Test: Con --crear se agregan los índices que no existen en la base"""
+        from services.indices import revisar_indices_command
+        from services.esquema import indices_faltantes
+        from extensions import db
+
+        db_session.execute(db.text('DROP INDEX ix_ventas_fecha_hora'))
+        db_session.commit()
+
+        resultado = app.test_cli_runner().invoke(revisar_indices_command)
+        assert "Falta: ventas.ix_ventas_fecha_hora" in resultado.output
+
+        resultado = app.test_cli_runner().invoke(revisar_indices_command, ['--crear'])
+        assert "Creado: ventas.ix_ventas_fecha_hora" in resultado.output
+        assert "Ninguna consulta recorre tablas completas." in resultado.output
+        assert indices_faltantes() == []
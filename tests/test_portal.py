@@ -0,0 +1,68 @@
+import pytest
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def historial(db_session, sample_cliente, sample_lote, monkeypatch):
+    """Crea `n` pedidos de dos renglones para el cliente del portal"""
+    from controller import portal_controller
+    from model.orden import Orden
+    from model.detalle_venta_orden import DetalleVentaOrden
+
+    monkeypatch.setattr(portal_controller, 'CLIENTE_PRUEBA_ID', sample_cliente.idCliente)
+    inicio = datetime(2024, 1, 1, 10, 0)
+
+    def crear(n):
+        ordenes = [
+            Orden(total=50, fechaAlta=inicio + timedelta(days=dia), fechaEntrega=inicio + timedelta(days=dia + 2),
+                  tipoVenta="Portal Cliente", cliente_id=sample_cliente.idCliente)
+            for dia in range(n)
+        ]
+        db_session.add_all(ordenes)
+        db_session.commit()
+        db_session.add_all([
+            DetalleVentaOrden(galletas_id=sample_lote.galleta_id, cantidad=cantidad, subtotal=cantidad * 10,
+                              orden_id=orden.id_orden)
+            for orden in ordenes for cantidad in (2, 3)
+        ])
+        db_session.commit()
+        ids = [orden.id_orden for orden in ordenes]
+        db_session.expunge_all()
+        return ids
+
+    return crear
+
+class TestMisPedidos:
+    """Pruebas para el historial de pedidos del portal"""
+
+    @pytest.mark.parametrize('pedidos', [1, 15])
+    def test_consultas_no_crecen_con_historial(self, client, historial, contar_consultas, pedidos):
+        """Test: El número de consultas es el mismo con 1 o 15 pedidos"""
+        historial(pedidos)
+
+        with contar_consultas(5):
+            response = client.get('/portal/mis-pedidos')
+        assert response.status_code == 200
+        assert 'Chispas (Unidad)'.encode() in response.data
+
+    def test_paginar_ordenes(self, app, historial, sample_cliente):
+        """Test: Las órdenes se paginan de la más reciente a la más antigua"""
+        from controller.portal_controller import paginar_ordenes
+
+        cliente_id = sample_cliente.idCliente
+        ids = historial(5)
+
+        pagina, siguiente = paginar_ordenes(cliente_id, limite=2)
+        assert [o.id_orden for o in pagina] == ids[::-1][:2]
+        assert len(pagina[0].detalles) == 2
+
+        pagina, siguiente = paginar_ordenes(cliente_id, cursor=siguiente, limite=2)
+        assert [o.id_orden for o in pagina] == ids[::-1][2:4]
+
+        pagina, siguiente = paginar_ordenes(cliente_id, cursor=siguiente, limite=2)
+        assert [o.id_orden for o in pagina] == ids[:1]
+        assert siguiente is None
+
+    def test_cursor_invalido(self, client, historial):
+        """Test: Un cursor mal formado regresa a la primera página"""
+        response = client.get('/portal/mis-pedidos?cursor=abc')
+        assert response.status_code == 302
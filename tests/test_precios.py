@@ -0,0 +1,124 @@
+import pytest
+from decimal import Decimal
+
+
+class TestListaPrecios:
+    """Pruebas para la lista de precios y el precio guardado en cada venta"""
+
+    def test_sin_lista_usa_costo_del_tipo(self, app, sample_lote):
+        """Test: Sin renglones en la lista el precio es el costo del tipo y las cajas las de siempre"""
+        from services import catalogo
+
+        galleta_id = sample_lote.galleta_id
+
+        assert catalogo.precio(galleta_id) == 10
+        assert [(p['clave'], p['precio'], p['unidades']) for p in catalogo.presentaciones(galleta_id)] == [
+            ('unidad', 10, 1), ('caja de kilo', Decimal('230.00'), 25), ('caja de 700 gramos', Decimal('160.00'), 20)]
+
+    def test_cargar_precios(self, app, db_session, sample_lote):
+        """Test: El comando llena la lista con los precios vigentes una sola vez"""
+        from model.lista_precio import ListaPrecios
+        from model.tipo_galleta import TipoGalleta
+        from services import catalogo
+        from services.precios import cargar_precios_command
+
+        galleta_id = sample_lote.galleta_id
+        db_session.add(TipoGalleta(nombre='Caja de Kilo', costo=250))
+        db_session.commit()
+
+        resultado = app.test_cli_runner().invoke(cargar_precios_command)
+        assert 'Precios agregados: 2' in resultado.output
+        assert ListaPrecios.query.count() == 2
+        assert [(p['etiqueta'], p['precio'], p['unidades']) for p in catalogo.presentaciones(galleta_id)] == [
+            ('Unidad', 10, 1), ('Caja de Kilo', Decimal('230.00'), 25)]
+
+        resultado = app.test_cli_runner().invoke(cargar_precios_command)
+        assert 'Precios agregados: 0' in resultado.output
+
+    def test_pagina_de_galletas(self, client, db_session, sample_lote):
+        """Test: La tabla de presentaciones sale de la lista de precios"""
+        from model.lista_precio import ListaPrecios
+        from model.tipo_galleta import TipoGalleta
+        from services import catalogo
+
+        caja = TipoGalleta(nombre='Caja de Kilo', costo=250)
+        db_session.add(caja)
+        db_session.commit()
+        db_session.add(ListaPrecios(galleta_id=sample_lote.galleta_id, tipo_galleta_id=caja.id_tipo_galleta,
+                                    precio=199, unidades=50))
+        catalogo.invalidar()
+        db_session.commit()
+
+        response = client.get('/galletas/')
+        html = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert '199' in html
+        assert '230' not in html
+
+    def test_venta_guarda_precio(self, app, client, db_session, sample_lote, monkeypatch):
+        """Test: La venta guarda el precio de lista y el ticket no cambia si después cambia la lista"""
+        from model.lista_precio import ListaPrecios
+        from services import catalogo
+        from services.carritos import carritos
+        from services.tickets import datos_ticket
+        from model.detalle_venta import DetalleVentaGalletas
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        galleta_id, tipo_id = sample_lote.galleta_id, sample_lote.galleta_lotes.tipo_galleta_id
+        precio = ListaPrecios(galleta_id=galleta_id, tipo_galleta_id=tipo_id, precio=12, unidades=1)
+        db_session.add(precio)
+        catalogo.invalidar()
+        db_session.commit()
+        assert catalogo.precio(galleta_id) == 12
+
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', {'lote_id': sample_lote.id_lote, 'cantidad': 3,
+                                          'precio_unitario': float(catalogo.precio(galleta_id)), 'subtotal': 36.0})
+        client.post('/venta/finalizar')
+
+        precio.precio = 15
+        catalogo.invalidar()
+        db_session.commit()
+
+        detalle = DetalleVentaGalletas.query.one()
+        assert detalle.precioUnitario == 12
+        assert datos_ticket(detalle.venta_id)['items'][0]['precio'] == 12
+
+    def test_unidades_positivas(self, app, db_session, sample_lote):
+        """Test: La tabla no acepta empaques sin piezas y el catálogo ignora los que ya existan"""
+        from sqlalchemy.exc import IntegrityError
+        from model.lista_precio import ListaPrecios
+        from services import precios
+
+        tipo_id = sample_lote.galleta_lotes.tipo_galleta_id
+        db_session.add(ListaPrecios(galleta_id=sample_lote.galleta_id, tipo_galleta_id=tipo_id, precio=12, unidades=0))
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+        db_session.rollback()
+
+        tipos = {tipo_id: {'id_tipo_galleta': tipo_id, 'nombre': 'Unidad', 'costo': 10}}
+        galletas = {1: {'tipo_galleta_id': tipo_id}}
+        lista, presentaciones = precios.compilar(tipos, galletas, [(1, tipo_id, 12, 0)])
+        assert lista[1] == (10, 1)
+        assert [p['unidades'] for p in presentaciones[1]] == [1, 25, 20]
+
+    def test_galleta_nueva_con_precios(self, client, db_session, sample_lote):
+        """Test: Crear una galleta también crea sus renglones en la lista de precios"""
+        from model.galleta import Galleta
+        from model.lista_precio import ListaPrecios
+        from model.tipo_galleta import TipoGalleta
+        from services import catalogo
+
+        db_session.add(TipoGalleta(nombre='Caja de Kilo', costo=250))
+        db_session.commit()
+        receta_id = sample_lote.galleta_lotes.receta_id
+
+        client.post('/galletas/agregar-galleta', data={'nombre_galleta': 'Avena', 'receta_id': receta_id})
+
+        unidad, caja = Galleta.query.filter_by(galleta='Avena').order_by(Galleta.tipo_galleta_id).all()
+        assert ListaPrecios.query.filter_by(galleta_id=unidad.id_galleta).count() == 2
+        assert ListaPrecios.query.filter_by(galleta_id=caja.id_galleta).count() == 1
+        assert [(p['etiqueta'], p['precio'], p['unidades']) for p in catalogo.presentaciones(unidad.id_galleta)] == [
+            ('Unidad', 10, 1), ('Caja de Kilo', Decimal('230.00'), 25)]
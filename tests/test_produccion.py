@@ -0,0 +1,148 @@
+import pytest
+from datetime import date, timedelta
+
+@pytest.fixture
+def receta_con_insumos(db_session):
+    """Receta de 50 galletas con dos insumos; la harina viene en dos lotes"""
+    from model.insumo import Insumos
+    from model.lote_insumo import LoteInsumo
+    from model.receta import Receta
+    from model.galleta import Galleta
+    from model.tipo_galleta import TipoGalleta
+
+    harina = Insumos(nombreInsumo="Harina", marca="Selecta", unidad="g", total=0, id_proveedor=1)
+    azucar = Insumos(nombreInsumo="Azúcar", marca="Zulka", unidad="g", total=0, id_proveedor=1)
+    receta = Receta(
+        nombreReceta="Chispas",
+        ingredientes=[
+            {'insumo': 'Harina', 'cantidad': '400', 'unidad': 'g'},
+            {'insumo': 'Azúcar', 'cantidad': '100', 'unidad': 'g'},
+        ],
+        cantidad_galletas=50
+    )
+    tipo = TipoGalleta(nombre="Unidad", costo=10)
+    db_session.add_all([harina, azucar, receta, tipo])
+    db_session.commit()
+
+    hoy = date.today()
+    lotes = [
+        LoteInsumo(id_insumo=harina.id_insumo, fechaIngreso=hoy, fechaCaducidad=hoy + timedelta(days=30),
+                   cantidad=500, costo=50),
+        LoteInsumo(id_insumo=harina.id_insumo, fechaIngreso=hoy - timedelta(days=3),
+                   fechaCaducidad=hoy + timedelta(days=30), cantidad=300, costo=30),
+        LoteInsumo(id_insumo=azucar.id_insumo, fechaIngreso=hoy, fechaCaducidad=hoy + timedelta(days=30),
+                   cantidad=100, costo=20),
+    ]
+    galleta = Galleta(tipo_galleta_id=tipo.id_tipo_galleta, galleta="Chispas", existencia=0,
+                      receta_id=receta.idReceta)
+    db_session.add_all(lotes + [galleta])
+    db_session.commit()
+    return {
+        'receta': receta,
+        'galleta_id': galleta.id_galleta,
+        'harina_nuevo': lotes[0].idLote,
+        'harina_viejo': lotes[1].idLote,
+        'azucar': lotes[2].idLote,
+    }
+
+class TestConsumoInsumos:
+    """Pruebas para el consumo FIFO de insumos en producción"""
+
+    def test_plan_fifo(self, db_session, receta_con_insumos):
+        """Test: Se toma primero del lote de harina más antiguo"""
+        from services import produccion
+
+        datos = receta_con_insumos
+        plan = produccion.planear_consumo(datos['receta'], 50)
+
+        assert plan['faltantes'] == [] and plan['no_encontrados'] == []
+        assert sorted(plan['descuentos']) == sorted([
+            (datos['harina_viejo'], 300), (datos['harina_nuevo'], 100), (datos['azucar'], 100)
+        ])
+
+    def test_plan_reporta_faltantes(self, db_session, receta_con_insumos):
+        """Test: La simulación reporta el insumo que no alcanza"""
+        from services import produccion
+
+        plan = produccion.planear_consumo(receta_con_insumos['receta'], 100)
+        assert plan['faltantes'] == [
+            {'insumo': 'Azúcar', 'unidad': 'g', 'requerido': 200, 'disponible': 100}
+        ]
+
+    def test_insumo_no_encontrado(self, db_session, receta_con_insumos):
+        """Test: Un ingrediente sin insumo registrado se reporta"""
+        from services import produccion
+
+        receta = receta_con_insumos['receta']
+        receta.ingredientes = receta.ingredientes + [{'insumo': 'Canela', 'cantidad': '5', 'unidad': 'g'}]
+        db_session.commit()
+        plan = produccion.planear_consumo(receta, 50)
+        assert plan['no_encontrados'] == [('Canela', 'g')]
+
+    def test_aplicar_consumo(self, db_session, receta_con_insumos):
+        """Test: El plan se aplica con una sola actualización"""
+        from services import produccion
+        from model.lote_insumo import LoteInsumo
+
+        datos = receta_con_insumos
+        produccion.aplicar_consumo(produccion.planear_consumo(datos['receta'], 50))
+        db_session.commit()
+
+        cantidades = {l.idLote: l.cantidad for l in LoteInsumo.query.all()}
+        assert cantidades == {datos['harina_viejo']: 0, datos['harina_nuevo']: 400, datos['azucar']: 0}
+
+    def test_aplicar_consumo_detecta_cambios(self, db_session, receta_con_insumos):
+        """Test: Si otro proceso consumió el lote no se aplica el plan"""
+        from services import produccion
+        from model.lote_insumo import LoteInsumo
+
+        datos = receta_con_insumos
+        plan = produccion.planear_consumo(datos['receta'], 50)
+        LoteInsumo.query.filter_by(idLote=datos['azucar']).update({LoteInsumo.cantidad: 10})
+
+        with pytest.raises(produccion.ConsumoIncompleto):
+            produccion.aplicar_consumo(plan)
+
+    def test_simular_no_toca_existencias(self, client, db_session, receta_con_insumos):
+        """Test: La simulación responde el plan sin descontar"""
+        from model.lote_insumo import LoteInsumo
+
+        response = client.get('/produccion/simular', query_string={
+            'galleta_id': receta_con_insumos['galleta_id'], 'cantidad': 100})
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data['suficiente'] is False
+        assert data['faltantes'][0]['insumo'] == 'Azúcar'
+        assert sum(l.cantidad for l in LoteInsumo.query.all()) == 900
+
+
+class TestPaginaProduccion:
+    """Pruebas para la lista de lotes de la página de producción"""
+
+    def test_lotes_listados(self, client, db_session, sample_lote):
+        """Test: Se listan los lotes con existencia y los agotados recientes, no el historial completo"""
+        from model.lote_galleta import LoteGalletas
+
+        hoy = date.today()
+
+        def lote(dias, existencia):
+            nuevo = LoteGalletas(galleta_id=sample_lote.galleta_id, fechaProduccion=hoy - timedelta(days=dias),
+                                 fechaCaducidad=hoy - timedelta(days=dias - 7), cantidad=50, costo=450,
+                                 existencia=existencia)
+            db_session.add(nuevo)
+            db_session.commit()
+            return nuevo.id_lote
+
+        viejo_agotado, reciente_agotado, viejo_con_existencia = lote(60, 0), lote(5, 0), lote(60, 7)
+
+        html = client.get('/produccion/').get_data(as_text=True)
+
+        listados = {id_lote for id_lote in (sample_lote.id_lote, viejo_agotado, reciente_agotado, viejo_con_existencia)
+                    if f'name="lote_id" value="{id_lote}"' in html}
+        assert listados == {sample_lote.id_lote, reciente_agotado, viejo_con_existencia}
+        assert 'agotados de los últimos 30 días' in html
+
+        # En el select de merma solo aparecen los lotes que todavía tienen existencia
+        assert f'<option value="{reciente_agotado}">' not in html
+        assert f'<option value="{viejo_con_existencia}">' in html
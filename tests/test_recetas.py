@@ -0,0 +1,168 @@
+import pytest
+from decimal import Decimal
+
+@pytest.fixture
+def insumos(db_session):
+    """Insumos registrados para armar recetas"""
+    from model.insumo import Insumos
+
+    harina = Insumos(nombreInsumo="Harina", marca="Selecta", unidad="Gramos", total=0, id_proveedor=1)
+    huevo = Insumos(nombreInsumo="Huevo", marca="San Juan", unidad="Unidad", total=0, id_proveedor=1)
+    db_session.add_all([harina, huevo])
+    db_session.commit()
+    return {'harina': harina.id_insumo, 'huevo': huevo.id_insumo}
+
+@pytest.fixture
+def receta_json(db_session, insumos):
+    """Receta con los ingredientes solo en JSON, como antes de receta_insumo"""
+    from model.receta import Receta
+
+    receta = Receta(
+        nombreReceta="Avena",
+        Descripccion="Galleta de avena",
+        ingredientes=[
+            {'insumo': 'Harina', 'cantidad': '250', 'unidad': 'Gramos'},
+            {'insumo': 'Huevo', 'cantidad': '2', 'unidad': 'Unidad'},
+        ],
+        cantidad_galletas=25
+    )
+    db_session.add(receta)
+    db_session.commit()
+    return receta.idReceta
+
+class TestListaMateriales:
+    """Pruebas para los ingredientes normalizados de las recetas"""
+
+    def test_migrar_recetas(self, app, db_session, receta_json, insumos):
+        """Test: El comando copia los ingredientes JSON a receta_insumo"""
+        from model.receta_insumo import RecetaInsumo
+        from services.recetas import migrar_recetas_command
+
+        resultado = app.test_cli_runner().invoke(migrar_recetas_command)
+        assert "Recetas migradas: 1" in resultado.output
+
+        filas = {f.insumo_id: f.cantidad for f in RecetaInsumo.query.filter_by(receta_id=receta_json)}
+        assert filas == {insumos['harina']: Decimal('250'), insumos['huevo']: Decimal('2')}
+
+    def test_migrar_reporta_insumos_faltantes(self, app, db_session, receta_json):
+        """Test: Una receta con insumos no registrados se queda sin migrar"""
+        from model.receta import Receta
+        from model.receta_insumo import RecetaInsumo
+        from services.recetas import migrar_recetas_command
+
+        receta = db_session.get(Receta, receta_json)
+        receta.ingredientes = receta.ingredientes + [{'insumo': 'Canela', 'cantidad': '5', 'unidad': 'Gramos'}]
+        db_session.commit()
+
+        resultado = app.test_cli_runner().invoke(migrar_recetas_command)
+        assert "Canela (Gramos)" in resultado.output
+        assert RecetaInsumo.query.count() == 0
+
+    def test_bom_sin_migrar_y_migrada(self, db_session, receta_json, insumos):
+        """Test: La lista de materiales es la misma antes y después de migrar"""
+        from model.receta import Receta
+        from services import recetas
+
+        antes = recetas.compilar(receta_json)
+        receta = db_session.get(Receta, receta_json)
+        recetas.guardar_ingredientes(receta, recetas.ingredientes_json(receta))
+        db_session.commit()
+        despues = recetas.compilar(receta_json)
+
+        assert antes == despues
+        assert [l['id_insumo'] for l in despues['insumos']] == [insumos['harina'], insumos['huevo']]
+
+    def test_bom_en_cache(self, db_session, receta_json):
+        """Test: La lista compilada se reutiliza hasta invalidarla"""
+        from model.receta import Receta
+        from services import recetas
+
+        primera = recetas.bom(receta_json)
+        db_session.get(Receta, receta_json).cantidad_galletas = 50
+        db_session.commit()
+
+        assert recetas.bom(receta_json) is primera
+        recetas.invalidar(receta_json)
+        assert recetas.bom(receta_json)['cantidad_galletas'] == 50
+
+    def test_modificar_invalida_bom(self, client, db_session, receta_json):
+        """Test: Modificar la receta actualiza receta_insumo y la lista compilada"""
+        from services import recetas
+
+        recetas.bom(receta_json)
+        client.post(f'/administracion/recetas/modificar?idReceta={receta_json}', data={
+            'nombreReceta': 'Avena', 'descripcion': 'Galleta de avena', 'cantidad_galletas': '25',
+            'insumo[]': ['Harina'], 'cantidad[]': ['300'], 'unidad[]': ['Gramos'],
+        })
+
+        bom = recetas.bom(receta_json)
+        assert [(l['insumo'], l['cantidad']) for l in bom['insumos']] == [('Harina', Decimal('300'))]
+
+    def test_modificar_con_insumo_desconocido(self, client, db_session, receta_json):
+        """Test: Una receta con un insumo no registrado se guarda y la lista de materiales lo reporta"""
+        from model.receta import Receta
+        from model.receta_insumo import RecetaInsumo
+        from services import recetas
+
+        client.post(f'/administracion/recetas/modificar?idReceta={receta_json}', data={
+            'nombreReceta': 'Avena', 'descripcion': 'Galleta de avena', 'cantidad_galletas': '25',
+            'insumo[]': ['Harina', 'Canela'], 'cantidad[]': ['300', '5'], 'unidad[]': ['Gramos', 'Gramos'],
+        })
+
+        db_session.expunge_all()
+        assert [i['insumo'] for i in db_session.get(Receta, receta_json).ingredientes] == ['Harina', 'Canela']
+        assert RecetaInsumo.query.filter_by(receta_id=receta_json).count() == 0
+        assert recetas.bom(receta_json)['no_encontrados'] == [('Canela', 'Gramos')]
+
+    def test_agregar_con_insumo_desconocido(self, client, db_session, insumos):
+        """Test: Agregar una receta con un insumo no registrado la guarda solo con el JSON"""
+        from model.receta import Receta
+
+        client.post('/administracion/recetas/agregar', data={
+            'nombreReceta': 'Canela', 'descripcion': 'Galleta de canela', 'cantidad_galletas': '20',
+            'insumo[]': ['Harina', 'Canela'], 'cantidad[]': ['200', '5'], 'unidad[]': ['Gramos', 'Gramos'],
+        })
+
+        receta = Receta.query.filter_by(nombreReceta='Canela').one()
+        assert [i['insumo'] for i in receta.ingredientes] == ['Harina', 'Canela']
+        assert receta.insumos_receta == []
+
+    def test_cantidad_invalida(self, client, db_session, receta_json, insumos):
+        """Test: Una cantidad que no es un número mayor a cero se rechaza sin guardar la receta"""
+        from model.receta import Receta
+
+        response = client.post('/administracion/recetas/agregar', data={
+            'nombreReceta': 'Canela', 'descripcion': 'Galleta de canela', 'cantidad_galletas': '20',
+            'insumo[]': ['Harina'], 'cantidad[]': ['dos tazas'], 'unidad[]': ['Gramos'],
+        })
+        assert response.status_code == 200
+        assert 'dos tazas' in response.get_data(as_text=True)
+        assert Receta.query.filter_by(nombreReceta='Canela').count() == 0
+
+        response = client.post(f'/administracion/recetas/modificar?idReceta={receta_json}', data={
+            'nombreReceta': 'Avena integral', 'descripcion': 'Galleta de avena', 'cantidad_galletas': '25',
+            'insumo[]': ['Harina'], 'cantidad[]': ['-300'], 'unidad[]': ['Gramos'],
+        })
+        assert response.status_code == 200
+        db_session.expunge_all()
+        receta = db_session.get(Receta, receta_json)
+        assert receta.nombreReceta == 'Avena'
+        assert [i['cantidad'] for i in receta.ingredientes] == ['250', '2']
+
+    def test_otro_worker_invalida_bom(self, app, db_session, receta_json, monkeypatch):
+        """Test: Si otro worker sube la generación del catálogo, la lista de materiales se recompila"""
+        from model.catalogo_version import CatalogoVersion
+        from model.receta import Receta
+        from services import recetas
+
+        monkeypatch.setitem(app.config, 'CATALOGO_REVISION', 0)
+        primera = recetas.bom(receta_json)
+
+        # Otro worker modifica la receta y sube la generación; este proceso no se entera directo
+        db_session.get(Receta, receta_json).cantidad_galletas = 50
+        db_session.add(CatalogoVersion(id=1, generacion=1))
+        db_session.commit()
+
+        segunda = recetas.bom(receta_json)
+        assert segunda is not primera
+        assert segunda['cantidad_galletas'] == 50
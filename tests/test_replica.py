@@ -0,0 +1,98 @@
+import time
+import pytest
+from datetime import date, time as hora
+
+@pytest.fixture
+def replica(app, db_session, tmp_path, monkeypatch):
+    """
+    Réplica en un SQLite aparte con el mismo esquema, registrada como el bind de réplica
+    en la configuración de la app y en sus engines. Cuenta las sentencias que recibe.
+    """
+    from sqlalchemy import create_engine, event
+    from extensions import db
+    from services.replica import BIND_REPLICA
+
+    url = f'sqlite:///{tmp_path}/replica.db'
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    engine.sentencias = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: engine.sentencias.append(statement))
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_BINDS', {BIND_REPLICA: url})
+    monkeypatch.setitem(db.engines, BIND_REPLICA, engine)
+    yield engine
+    engine.dispose()
+
+def venta_en_replica(replica):
+    """Una venta que solo existe en la réplica"""
+    from sqlalchemy import insert
+    from model.venta import Venta
+
+    with replica.begin() as conexion:
+        conexion.execute(insert(Venta), {'id_venta': 77, 'total': 10, 'fecha': date.today(), 'hora': hora(10, 0),
+                                         'ticket': 'TK', 'tipoVenta': 'Punto de Venta'})
+
+class TestReplica:
+    """Pruebas para el enrutamiento de lecturas a la réplica"""
+
+    def test_sin_replica_usa_principal(self, client, db_session):
+        """Test: Sin bind de réplica las vistas de solo lectura leen de la principal"""
+        from extensions import db
+        from services.replica import BIND_REPLICA
+
+        assert BIND_REPLICA not in db.engines
+        assert client.get('/venta/catalogo/json').get_json()['ventas'] == []
+
+    def test_vista_solo_lectura_lee_de_replica(self, client, replica):
+        """Test: El listado de ventas se lee de la réplica"""
+        venta_en_replica(replica)
+
+        datos = client.get('/venta/catalogo/json').get_json()
+        assert [venta['id_venta'] for venta in datos['ventas']] == [77]
+
+    def test_lee_sus_escrituras(self, client, replica):
+        """Test: Después de escribir, el usuario lee de la principal unos segundos"""
+        venta_en_replica(replica)
+        replica.sentencias.clear()
+        with client.session_transaction() as sesion:
+            sesion['ultima_escritura'] = time.time()
+
+        assert client.get('/venta/catalogo/json').get_json()['ventas'] == []
+        assert replica.sentencias == []
+
+    def test_vistas_sin_marca_usan_principal(self, client, replica):
+        """Test: Las vistas que no son de solo lectura no tocan la réplica"""
+        client.get('/venta/registrar')
+        assert replica.sentencias == []
+
+    def test_mis_pedidos_busca_cliente_en_principal(self, client, db_session, replica, sample_cliente, monkeypatch):
+        """Test: El cliente del portal se busca en la principal; solo las órdenes se leen de la réplica"""
+        from controller import portal_controller
+        from model.cliente import Cliente
+
+        monkeypatch.setattr(portal_controller, 'CLIENTE_PRUEBA_ID', sample_cliente.idCliente)
+        db_session.expunge_all()
+
+        assert client.get('/portal/mis-pedidos').status_code == 200
+        assert Cliente.query.count() == 1
+        assert not any('FROM cliente' in sentencia for sentencia in replica.sentencias)
+        assert any('FROM orden' in sentencia for sentencia in replica.sentencias)
+
+    def test_escrituras_van_a_principal(self, app, db_session, replica):
+        """Test: Un INSERT o un SELECT FOR UPDATE van a la principal y la marcan para el resto del request"""
+        from flask import g, session
+        from sqlalchemy import insert, select
+        from extensions import db
+        from model.venta import Venta
+        from services.replica import recordar_escritura
+
+        with app.test_request_context('/venta/catalogo/json'):
+            app.preprocess_request()
+            g.solo_lectura = True
+            assert db.session.get_bind(clause=select(Venta)) is replica
+            assert db.session.get_bind(clause=select(Venta).with_for_update()) is not replica
+
+            assert db.session.get_bind(clause=insert(Venta)) is not replica
+            assert db.session.get_bind(clause=select(Venta)) is not replica
+            recordar_escritura(None)
+            assert 'ultima_escritura' in session
@@ -0,0 +1,202 @@
+import pytest
+from datetime import datetime, timedelta
+
+class TestReservasLote:
+    """Pruebas para el registro de lotes apartados"""
+
+    def test_reservar_descuenta_disponible(self, db_session, sample_lote):
+        """Test: Lo apartado por un carrito deja de estar disponible para los demás"""
+        from services import reservas
+
+        ok, restante = reservas.reservar('venta:a', sample_lote.id_lote, 60)
+        db_session.commit()
+        assert ok is True
+        assert restante == 40
+
+        ok, disponible = reservas.reservar('venta:b', sample_lote.id_lote, 50)
+        assert ok is False
+        assert disponible == 40
+
+    def test_reservas_se_acumulan_por_carrito(self, db_session, sample_lote):
+        """Test: Apartar dos veces del mismo lote suma la cantidad"""
+        from services import reservas
+        from model.reserva_lote import ReservaLote
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 10)
+        reservas.reservar('venta:a', sample_lote.id_lote, 15)
+        db_session.commit()
+
+        reserva = ReservaLote.query.filter_by(carrito='venta:a').one()
+        assert reserva.cantidad == 25
+
+    def test_disponibles_en_una_consulta(self, db_session, sample_lote):
+        """Test: Los lotes disponibles restan lo apartado de todos los carritos"""
+        from services import reservas
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 30)
+        reservas.reservar('venta:b', sample_lote.id_lote, 20)
+        db_session.commit()
+
+        [(lote, disponible)] = reservas.disponibles(sample_lote.galleta_id)
+        assert lote.id_lote == sample_lote.id_lote
+        assert disponible == 50
+
+    def test_lote_agotado_no_aparece(self, db_session, sample_lote):
+        """Test: Un lote apartado por completo no se ofrece"""
+        from services import reservas
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 100)
+        db_session.commit()
+
+        assert reservas.disponibles(sample_lote.galleta_id) == []
+
+    def test_reservas_vencidas_no_cuentan(self, db_session, sample_lote):
+        """Test: Una reserva vencida libera la existencia"""
+        from services import reservas
+        from model.reserva_lote import ReservaLote
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 100)
+        db_session.commit()
+        ReservaLote.query.update({ReservaLote.expira: datetime.utcnow() - timedelta(minutes=1)})
+        db_session.commit()
+
+        ok, _ = reservas.reservar('venta:b', sample_lote.id_lote, 100)
+        assert ok is True
+
+    def test_liberar_parcial_y_total(self, db_session, sample_lote):
+        """Test: Liberar una parte o todo lo apartado por el carrito"""
+        from services import reservas
+        from model.reserva_lote import ReservaLote
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 30)
+        db_session.commit()
+
+        reservas.liberar('venta:a', sample_lote.id_lote, 10)
+        db_session.commit()
+        assert ReservaLote.query.filter_by(carrito='venta:a').one().cantidad == 20
+
+        reservas.liberar('venta:a')
+        db_session.commit()
+        assert ReservaLote.query.filter_by(carrito='venta:a').count() == 0
+
+    def test_purgar_vencidas(self, db_session, sample_lote):
+        """Test: Purgar borra solo las reservas vencidas"""
+        from services import reservas
+        from model.reserva_lote import ReservaLote
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 10)
+        reservas.reservar('venta:b', sample_lote.id_lote, 10)
+        db_session.commit()
+        (ReservaLote.query.filter_by(carrito='venta:a')
+         .update({ReservaLote.expira: datetime.utcnow() - timedelta(minutes=1)}))
+        db_session.commit()
+
+        assert reservas.purgar_vencidas() == 1
+        assert ReservaLote.query.count() == 1
+
+class TestReservasVentas:
+    """Pruebas de las reservas desde las rutas de ventas"""
+
+    def test_cancelar_venta_libera_reservas(self, client, db_session, sample_lote):
+        """Test: Cancelar la venta libera lo apartado por el carrito"""
+        from services import reservas
+        from model.reserva_lote import ReservaLote
+
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        reservas.reservar('venta:prueba', sample_lote.id_lote, 30)
+        db_session.commit()
+
+        client.post('/venta/cancelar_venta')
+        assert ReservaLote.query.count() == 0
+
+    def test_obtener_lotes_considera_otras_cajas(self, client, db_session, sample_lote):
+        """Test: Los lotes muestran lo apartado por otras cajas"""
+        from services import reservas
+
+        reservas.reservar('venta:otra-caja', sample_lote.id_lote, 40)
+        db_session.commit()
+
+        data = client.get(f'/venta/obtener_lotes/{sample_lote.galleta_id}').get_json()
+        assert data[0]['existencia'] == 60
+
+@pytest.fixture
+def lotes_fefo(db_session, sample_lote):
+    """Lotes de la galleta con distintas caducidades, uno ya caducado"""
+    from datetime import date
+    from model.lote_galleta import LoteGalletas
+
+    hoy = date.today()
+    lotes = {}
+    for nombre, dias, existencia in [('caducado', -1, 50), ('tarde', 10, 30), ('pronto', 3, 20)]:
+        lote = LoteGalletas(
+            galleta_id=sample_lote.galleta_id,
+            fechaProduccion=hoy - timedelta(days=5),
+            fechaCaducidad=hoy + timedelta(days=dias),
+            cantidad=existencia,
+            costo=450,
+            existencia=existencia
+        )
+        db_session.add(lote)
+        lotes[nombre] = lote
+    db_session.commit()
+    lotes['hoy'] = sample_lote
+    return {nombre: lote.id_lote for nombre, lote in lotes.items()}
+
+class TestAsignacionFefo:
+    """Pruebas para el reparto de ventas entre lotes por caducidad"""
+
+    def test_primero_lo_que_caduca_antes(self, db_session, sample_lote, lotes_fefo):
+        """Test: Se toma del lote que caduca antes y se omiten los caducados"""
+        from services import reservas
+
+        plan, faltante = reservas.asignar_fefo(sample_lote.galleta_id, 130)
+        assert faltante == 0
+        assert plan == [(lotes_fefo['hoy'], 100), (lotes_fefo['pronto'], 20), (lotes_fefo['tarde'], 10)]
+
+    def test_reporta_faltante(self, db_session, sample_lote, lotes_fefo):
+        """Test: Lo caducado no cuenta como existencia"""
+        from services import reservas
+
+        plan, faltante = reservas.asignar_fefo(sample_lote.galleta_id, 200)
+        assert sum(cantidad for _, cantidad in plan) == 150
+        assert faltante == 50
+
+    def test_descuenta_lo_apartado(self, db_session, sample_lote, lotes_fefo):
+        """Test: Lo apartado por otras cajas no se asigna"""
+        from services import reservas
+
+        reservas.reservar('venta:otra-caja', lotes_fefo['hoy'], 95)
+        db_session.commit()
+
+        plan, faltante = reservas.asignar_fefo(sample_lote.galleta_id, 10)
+        assert plan == [(lotes_fefo['hoy'], 5), (lotes_fefo['pronto'], 5)]
+
+    def test_varias_galletas(self, db_session, sample_lote, lotes_fefo):
+        """Test: Una galleta sin lotes queda con todo faltante"""
+        from services import reservas
+
+        planes = reservas.planear_fefo({sample_lote.galleta_id: 5, 9999: 3})
+        assert planes[sample_lote.galleta_id] == ([(lotes_fefo['hoy'], 5)], 0)
+        assert planes[9999] == ([], 3)
+
+    def test_disponibles_omite_caducados(self, db_session, sample_lote, lotes_fefo):
+        """Test: Los lotes caducados no se ofrecen aunque tengan existencia"""
+        from services import reservas
+
+        ids = [lote.id_lote for lote, _ in reservas.disponibles(sample_lote.galleta_id)]
+        assert lotes_fefo['caducado'] not in ids
+        assert sorted(ids) == sorted([lotes_fefo['hoy'], lotes_fefo['pronto'], lotes_fefo['tarde']])
+
+    def test_lote_manual_caducado(self, client, db_session, sample_lote, lotes_fefo):
+        """Test: Un lote caducado elegido a mano se rechaza aunque el formulario mande otra fecha"""
+        from model.reserva_lote import ReservaLote
+
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        response = client.post('/venta/registrar', data={
+            'tipo_venta': 1, 'cantidad': 5, 'tipo_galleta': sample_lote.galleta_id,
+            'lote': lotes_fefo['caducado'], 'fecha_caducidad_lote': '2099/01/01'})
+
+        assert 'caducado'.encode() in response.data
+        assert ReservaLote.query.count() == 0
@@ -0,0 +1,237 @@
+import pytest
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def otro_lote(db_session, sample_lote):
+    """Segundo lote de la misma galleta con poca existencia"""
+    from model.lote_galleta import LoteGalletas
+
+    lote = LoteGalletas(
+        galleta_id=sample_lote.galleta_id,
+        cantidad=5,
+        existencia=5,
+        costo=sample_lote.costo,
+        fechaProduccion=sample_lote.fechaProduccion,
+        fechaCaducidad=sample_lote.fechaCaducidad
+    )
+    db_session.add(lote)
+    db_session.commit()
+    return lote
+
+class TestDescontarLotes:
+    """Pruebas para el descuento de existencias en lote"""
+
+    def test_descuenta_varios_renglones(self, db_session, sample_lote, otro_lote, linea):
+        """Test: Los renglones del mismo lote se suman y se descuentan juntos"""
+        from services import stock
+        from model.lote_galleta import LoteGalletas
+
+        lote_a, lote_b = sample_lote.id_lote, otro_lote.id_lote
+        stock.descontar_lotes([linea(lote_a, 10), linea(lote_b, 5), linea(lote_a, 20)])
+        db_session.commit()
+        db_session.expunge_all()
+
+        assert db_session.get(LoteGalletas, lote_a).existencia == 70
+        assert db_session.get(LoteGalletas, lote_b).existencia == 0
+
+    def test_reporta_renglones_faltantes(self, db_session, sample_lote, otro_lote, linea):
+        """Test: Si un lote no alcanza se reporta y no se descuenta ninguno"""
+        from services import stock
+        from model.lote_galleta import LoteGalletas
+
+        with pytest.raises(stock.ExistenciaInsuficiente) as error:
+            stock.descontar_lotes([
+                linea(sample_lote.id_lote, 10),
+                linea(otro_lote.id_lote, 3),
+                linea(otro_lote.id_lote, 3),
+            ])
+        db_session.rollback()
+
+        assert error.value.faltantes == [
+            {'lote_id': otro_lote.id_lote, 'solicitado': 6, 'existencia': 5}
+        ]
+        assert db_session.get(LoteGalletas, sample_lote.id_lote).existencia == 100
+
+    def test_lote_inexistente(self, db_session, sample_lote, linea):
+        """Test: Un lote que no existe cuenta como existencia cero"""
+        from services import stock
+
+        with pytest.raises(stock.ExistenciaInsuficiente) as error:
+            stock.descontar_lotes([linea(9999, 1)])
+        assert error.value.faltantes[0]['existencia'] == 0
+
+    def test_respeta_lo_apartado_por_otros(self, db_session, sample_lote, linea):
+        """Test: La reserva vigente del carrito cubre su venta aunque otro carrito aparte el resto"""
+        from services import reservas, stock
+        from model.lote_galleta import LoteGalletas
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 30)
+        reservas.reservar('venta:b', sample_lote.id_lote, 70)
+        db_session.commit()
+
+        with pytest.raises(stock.ExistenciaInsuficiente):
+            stock.descontar_lotes([linea(sample_lote.id_lote, 30)])
+        db_session.rollback()
+
+        stock.descontar_lotes([linea(sample_lote.id_lote, 30)], 'venta:a')
+        db_session.commit()
+        assert db_session.get(LoteGalletas, sample_lote.id_lote).existencia == 70
+
+    def test_reserva_vencida_y_otro_carrito(self, db_session, sample_lote, linea):
+        """Test: Si la reserva del carrito venció y otro carrito apartó la existencia, no se vende"""
+        from services import reservas, stock
+        from model.lote_galleta import LoteGalletas
+        from model.reserva_lote import ReservaLote
+
+        reservas.reservar('venta:a', sample_lote.id_lote, 30)
+        db_session.commit()
+        ReservaLote.query.update({ReservaLote.expira: datetime.utcnow() - timedelta(minutes=1)})
+        db_session.commit()
+        ok, _ = reservas.reservar('venta:b', sample_lote.id_lote, 80)
+        db_session.commit()
+        assert ok is True
+
+        with pytest.raises(stock.ExistenciaInsuficiente) as error:
+            stock.descontar_lotes([linea(sample_lote.id_lote, 30)], 'venta:a')
+        db_session.rollback()
+
+        assert error.value.faltantes == [{'lote_id': sample_lote.id_lote, 'solicitado': 30, 'existencia': 20}]
+        assert db_session.get(LoteGalletas, sample_lote.id_lote).existencia == 100
+
+    def test_insertar_detalles(self, db_session, sample_lote, sample_venta, linea):
+        """Test: Todos los detalles se insertan de una vez"""
+        from services import stock
+        from model.detalle_venta import DetalleVentaGalletas
+
+        stock.insertar_detalles(sample_venta.id_venta, [
+            linea(sample_lote.id_lote, 2),
+            linea(sample_lote.id_lote, 4),
+        ])
+        db_session.commit()
+
+        detalles = DetalleVentaGalletas.query.filter_by(venta_id=sample_venta.id_venta).all()
+        assert sorted(d.cantidad for d in detalles) == [2, 3, 4]
+
+class TestFinalizarVenta:
+    """Pruebas de la ruta que cierra la venta del punto de venta"""
+
+    def test_finalizar_descuenta_existencia(self, app, client, db_session, sample_lote, monkeypatch, linea):
+        """Test: Finalizar la venta descuenta el lote y registra los detalles"""
+        from services.carritos import carritos
+        from model.lote_galleta import LoteGalletas
+        from model.detalle_venta import DetalleVentaGalletas
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        lote_id = sample_lote.id_lote
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', linea(lote_id, 4))
+        carritos.agregar('venta:prueba', linea(lote_id, 6))
+
+        client.post('/venta/finalizar')
+        db_session.expunge_all()
+
+        assert db_session.get(LoteGalletas, lote_id).existencia == 90
+        assert DetalleVentaGalletas.query.count() == 2
+        assert carritos.obtener('venta:prueba') == []
+
+    def test_finalizar_sin_existencia(self, app, client, db_session, sample_lote, monkeypatch, linea):
+        """Test: Si el lote no alcanza no se registra la venta"""
+        from services.carritos import carritos
+        from model.venta import Venta
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 150))
+
+        client.post('/venta/finalizar')
+
+        assert Venta.query.count() == 0
+        assert len(carritos.obtener('venta:prueba')) == 1
+        carritos.limpiar('venta:prueba')
+
+    def test_finalizar_con_reserva_vencida(self, app, client, db_session, sample_lote, monkeypatch, linea):
+        """Test: Con la reserva vencida y la existencia apartada por otra caja la venta no se registra"""
+        from services import reservas
+        from services.carritos import carritos
+        from model.reserva_lote import ReservaLote
+        from model.venta import Venta
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        with client.session_transaction() as sesion:
+            sesion['carrito_id'] = 'prueba'
+        reservas.reservar('venta:prueba', sample_lote.id_lote, 40)
+        db_session.commit()
+        carritos.agregar('venta:prueba', linea(sample_lote.id_lote, 40))
+        ReservaLote.query.update({ReservaLote.expira: datetime.utcnow() - timedelta(minutes=1)})
+        reservas.reservar('venta:otra-caja', sample_lote.id_lote, 100)
+        db_session.commit()
+
+        client.post('/venta/finalizar')
+
+        assert Venta.query.count() == 0
+        assert ReservaLote.query.filter_by(carrito='venta:otra-caja').one().cantidad == 100
+        carritos.limpiar('venta:prueba')
+
+
+class TestExistenciaGalleta:
+    """Pruebas para el contador de existencia por galleta"""
+
+    def test_venta_descuenta_galleta(self, db_session, sample_lote, linea):
+        """Test: Vender descuenta del lote y del contador de la galleta"""
+        from services import stock
+        from model.galleta import Galleta
+
+        galleta_id = sample_lote.galleta_id
+        stock.descontar_lotes([linea(sample_lote.id_lote, 30)])
+        db_session.commit()
+        db_session.expunge_all()
+
+        assert db_session.get(Galleta, galleta_id).existencia == 70
+        assert stock.diferencias() == []
+
+    def test_produccion_merma_y_borrado(self, db_session, sample_lote):
+        """Test: Producir, mermar y borrar un lote mantienen el contador igual a la suma de los lotes"""
+        from datetime import date
+        from services import stock
+        from model.galleta import Galleta
+        from model.lote_galleta import LoteGalletas
+
+        galleta_id = sample_lote.galleta_id
+        nuevo = LoteGalletas(galleta_id=galleta_id, fechaProduccion=date.today(), fechaCaducidad=date.today(),
+                             cantidad=40, costo=450, existencia=40)
+        stock.agregar_lote(nuevo)
+        db_session.commit()
+        stock.mermar(nuevo, 15)
+        db_session.commit()
+        assert nuevo.existencia == 25
+        assert db_session.get(Galleta, galleta_id).existencia == 125
+
+        with pytest.raises(stock.ExistenciaInsuficiente):
+            stock.mermar(nuevo, 26)
+        db_session.rollback()
+
+        stock.eliminar_lote(nuevo)
+        db_session.commit()
+        db_session.expunge_all()
+
+        assert db_session.get(Galleta, galleta_id).existencia == 100
+        assert stock.diferencias() == []
+
+    def test_conciliar(self, app, db_session, sample_lote, otro_lote):
+        """Test: El comando reporta las galletas desfasadas y con --corregir las repara"""
+        from services import stock
+        from model.galleta import Galleta
+
+        galleta_id = sample_lote.galleta_id
+        resultado = app.test_cli_runner().invoke(stock.conciliar_existencias_command)
+        assert 'registrada 100, en lotes 105' in resultado.output
+        assert 'Galletas con diferencia: 1' in resultado.output
+
+        resultado = app.test_cli_runner().invoke(stock.conciliar_existencias_command, ['--corregir'])
+        assert 'Galletas corregidas: 1' in resultado.output
+        db_session.expunge_all()
+
+        assert db_session.get(Galleta, galleta_id).existencia == 105
+        assert stock.diferencias() == []
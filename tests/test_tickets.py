@@ -0,0 +1,196 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def almacen_temporal(app, tmp_path, monkeypatch):
+    """Guarda los PDFs de las pruebas en un directorio temporal"""
+    from services.almacen_tickets import AlmacenLocal
+
+    almacen = AlmacenLocal(str(tmp_path))
+    monkeypatch.setitem(app.extensions, 'almacen_tickets', almacen)
+    return almacen
+
+@pytest.fixture
+def pdf_falso(app, monkeypatch):
+    """Evita llamar a wkhtmltopdf durante las pruebas"""
+    import services.tickets as tickets
+
+    monkeypatch.setattr(tickets, 'render_template', lambda *args, **kwargs: '<html></html>')
+    monkeypatch.setattr(tickets, 'renderizar_pdf', lambda html: b'%PDF-prueba')
+    app.config['TICKETS_SINCRONOS'] = True
+    yield
+    app.config['TICKETS_SINCRONOS'] = False
+
+class TestColaTickets:
+    """Pruebas para la generación de tickets en segundo plano"""
+
+    def test_encolar_crea_trabajo_pendiente(self, db_session, sample_venta):
+        """Test: Encolar un ticket registra el trabajo como pendiente"""
+        from services.tickets import cola_tickets, estatus_ticket, PENDIENTE
+
+        cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+
+        trabajo = estatus_ticket(sample_venta.id_venta)
+        assert trabajo is not None
+        assert trabajo.estatus == PENDIENTE
+
+    def test_procesar_guarda_pdf(self, db_session, sample_venta, pdf_falso):
+        """Test: Procesar el trabajo guarda el PDF y lo marca como listo"""
+        from services.tickets import cola_tickets, estatus_ticket, LISTO
+
+        trabajo = cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+
+        assert cola_tickets.procesar(trabajo.id_trabajo) is True
+        assert estatus_ticket(sample_venta.id_venta).estatus == LISTO
+        assert sample_venta.ticket == 'TK-PRUEBA'
+        assert sample_venta.ticket_ref is not None
+
+    def test_procesar_no_repite_trabajo(self, db_session, sample_venta, pdf_falso):
+        """Test: Un trabajo ya reclamado no se procesa dos veces"""
+        from services.tickets import cola_tickets
+
+        trabajo = cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+
+        assert cola_tickets.procesar(trabajo.id_trabajo) is True
+        assert cola_tickets.procesar(trabajo.id_trabajo) is False
+
+    def test_procesar_registra_error(self, db_session, sample_venta, pdf_falso, monkeypatch):
+        """Test: Si falla wkhtmltopdf el trabajo queda con error"""
+        import services.tickets as tickets
+
+        def falla(html):
+            raise OSError("wkhtmltopdf no encontrado")
+        monkeypatch.setattr(tickets, 'renderizar_pdf', falla)
+
+        trabajo = tickets.cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+
+        assert tickets.cola_tickets.procesar(trabajo.id_trabajo) is False
+        trabajo = tickets.estatus_ticket(sample_venta.id_venta)
+        assert trabajo.estatus == tickets.ERROR
+        assert "wkhtmltopdf" in trabajo.error
+
+class TestDatosTicket:
+    """Pruebas para los datos del ticket"""
+
+    def test_renglones_en_una_consulta(self, db_session, sample_venta, sample_lote, contar_consultas):
+        """Test: Los renglones del ticket salen de una sola consulta sin importar cuántos haya"""
+        from decimal import Decimal
+        from services.tickets import datos_ticket
+        from model.detalle_venta import DetalleVentaGalletas
+
+        venta_id = sample_venta.id_venta
+        db_session.add_all([
+            DetalleVentaGalletas(venta_id=venta_id, lote_id=sample_lote.id_lote, cantidad=2, subtotal=20)
+            for _ in range(10)
+        ])
+        db_session.commit()
+        db_session.expunge_all()
+
+        with contar_consultas(1):
+            datos = datos_ticket(venta_id)
+
+        assert datos['ticket_num'] == 'TK-PRUEBA'
+        assert len(datos['items']) == 11
+        assert datos['items'][0] == {'nombre': 'Chispas', 'tipo': 'Unidad', 'cantidad': 3,
+                                     'precio': Decimal('10'), 'subtotal': Decimal('30')}
+
+    def test_venta_inexistente(self, db_session):
+        """Test: Una venta que no existe no tiene datos de ticket"""
+        from services.tickets import datos_ticket
+
+        assert datos_ticket(9999) is None
+
+class TestObtenerTicket:
+    """Pruebas para la consulta del ticket"""
+
+    def test_obtener_ticket_pendiente(self, client, db_session, sample_venta):
+        """Test: Mientras el PDF no esté listo se responde 202"""
+        from services.tickets import cola_tickets
+
+        cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+
+        response = client.get(f'/venta/obtener_ticket/{sample_venta.id_venta}')
+        assert response.status_code == 202
+        assert response.get_json()['estatus'] == 'pendiente'
+
+    def test_obtener_ticket_listo(self, client, db_session, sample_venta, pdf_falso):
+        """Test: Con el trabajo terminado se regresa el ticket"""
+        from services.tickets import cola_tickets
+
+        trabajo = cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+        cola_tickets.despachar(trabajo)
+
+        response = client.get(f'/venta/obtener_ticket/{sample_venta.id_venta}')
+        assert response.status_code == 200
+        assert response.data == b'%PDF-prueba'
+
+    def test_obtener_ticket_etag_y_rango(self, client, db_session, sample_venta, pdf_falso):
+        """Test: El PDF se sirve con ETag y soporta peticiones por rango"""
+        from services.tickets import cola_tickets
+
+        trabajo = cola_tickets.encolar(sample_venta.id_venta)
+        db_session.commit()
+        cola_tickets.despachar(trabajo)
+        url = f'/venta/obtener_ticket/{sample_venta.id_venta}'
+
+        response = client.get(url)
+        assert response.mimetype == 'application/pdf'
+        assert response.data == b'%PDF-prueba'
+        etag = response.headers['ETag']
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+        response = client.get(url, headers={'Range': 'bytes=0-3'})
+        assert response.status_code == 206
+        assert response.data == b'%PDF'
+
+    def test_obtener_ticket_base64_anterior(self, client, db_session, sample_venta):
+        """Test: Los tickets guardados en base64 antes del almacén se siguen sirviendo"""
+        sample_venta.ticket = 'JVBERi1wcnVlYmE='
+        db_session.commit()
+
+        response = client.get(f'/venta/obtener_ticket/{sample_venta.id_venta}')
+        assert response.status_code == 200
+        assert response.data == b'%PDF-prueba'
+
+    def test_obtener_ticket_venta_inexistente(self, client, db_session):
+        """Test: Venta inexistente regresa 404"""
+        response = client.get('/venta/obtener_ticket/9999')
+        assert response.status_code == 404
+
+class TestAlmacenLocal:
+    """Pruebas para el almacén de PDFs en disco"""
+
+    def test_guardar_y_leer(self, tmp_path):
+        """Test: La clave es el hash del contenido y se reparte en subdirectorios"""
+        from services.almacen_tickets import AlmacenLocal
+
+        almacen = AlmacenLocal(str(tmp_path))
+        clave = almacen.guardar(b'%PDF-1')
+
+        assert clave == almacen.calcular_clave(b'%PDF-1')
+        assert almacen.leer(clave) == b'%PDF-1'
+        assert almacen.ruta(clave).startswith(str(tmp_path / clave[:2] / clave[2:4]))
+
+    def test_contenido_repetido_no_se_duplica(self, tmp_path):
+        """Test: Guardar el mismo PDF dos veces regresa la misma clave"""
+        from services.almacen_tickets import AlmacenLocal
+
+        almacen = AlmacenLocal(str(tmp_path))
+        assert almacen.guardar(b'%PDF-1') == almacen.guardar(b'%PDF-1')
+
+    def test_guardar_comprimido(self, tmp_path):
+        """Test: Con gzip el contenido se lee descomprimido y no se sirve por ruta"""
+        from services.almacen_tickets import AlmacenLocal
+
+        almacen = AlmacenLocal(str(tmp_path), comprimir=True)
+        clave = almacen.guardar(b'%PDF-1' * 100)
+
+        assert almacen.leer(clave) == b'%PDF-1' * 100
+        assert almacen.ruta(clave) is None
@@ -0,0 +1,124 @@
+import pytest
+from datetime import date, time
+
+@pytest.fixture
+def ventas_varias(db_session):
+    """Fixture para crear ventas en distintas fechas"""
+    from model.venta import Venta
+
+    ventas = []
+    for dia in range(1, 6):
+        for tipo in ("Punto de Venta", "Portal Cliente"):
+            ventas.append(Venta(
+                total=10 * dia,
+                fecha=date(2024, 1, dia),
+                hora=time(12, 0, 0),
+                ticket=f"TK-{dia}",
+                tipoVenta=tipo
+            ))
+    db_session.add_all(ventas)
+    db_session.commit()
+    return ventas
+
+class TestCatalogoVentas:
+    """Pruebas para el listado paginado de ventas"""
+
+    def test_paginacion_por_cursor(self, app, client, ventas_varias, monkeypatch):
+        """Test: Las páginas no se repiten y cubren todas las ventas"""
+        monkeypatch.setitem(app.config, 'VENTAS_POR_PAGINA', 4)
+
+        vistas = []
+        cursor = None
+        while True:
+            response = client.get('/venta/catalogo/json', query_string={'cursor': cursor} if cursor else {})
+            data = response.get_json()
+            assert len(data['ventas']) <= 4
+            vistas.extend(v['id_venta'] for v in data['ventas'])
+            cursor = data['siguiente']
+            if not cursor:
+                break
+
+        assert len(vistas) == len(ventas_varias)
+        assert len(set(vistas)) == len(vistas)
+
+    def test_orden_mas_reciente_primero(self, client, ventas_varias):
+        """Test: Las ventas más recientes aparecen primero"""
+        data = client.get('/venta/catalogo/json').get_json()
+        fechas = [v['fecha'] for v in data['ventas']]
+        assert fechas == sorted(fechas, reverse=True)
+
+    def test_filtros_fecha_y_tipo(self, client, ventas_varias):
+        """Test: Filtrar por rango de fechas y tipo de venta"""
+        data = client.get('/venta/catalogo/json', query_string={
+            'desde': '2024-01-02', 'hasta': '2024-01-03', 'tipo': 'Portal Cliente'
+        }).get_json()
+
+        assert len(data['ventas']) == 2
+        assert all(v['tipoVenta'] == 'Portal Cliente' for v in data['ventas'])
+        assert data['siguiente'] is None
+
+    def test_no_incluye_ticket(self, client, ventas_varias):
+        """Test: El listado no regresa la columna del ticket"""
+        data = client.get('/venta/catalogo/json').get_json()
+        assert 'ticket' not in data['ventas'][0]
+
+    def test_cursor_invalido(self, client, db_session):
+        """Test: Un cursor mal formado regresa 400"""
+        response = client.get('/venta/catalogo/json?cursor=abc')
+        assert response.status_code == 400
+
+@pytest.fixture
+def orden_portal(db_session, sample_lote):
+    """Pedido del portal por más galletas de las que tiene un solo lote"""
+    from datetime import datetime, timedelta
+    from model.lote_galleta import LoteGalletas
+    from model.orden import Orden
+    from model.detalle_venta_orden import DetalleVentaOrden
+
+    lote_tarde = LoteGalletas(
+        galleta_id=sample_lote.galleta_id,
+        fechaProduccion=date.today(),
+        fechaCaducidad=date.today() + timedelta(days=7),
+        cantidad=50,
+        costo=450,
+        existencia=50
+    )
+    orden = Orden(total=1200, fechaEntrega=datetime.now(), tipoVenta="Portal Cliente", cliente_id=1)
+    db_session.add_all([lote_tarde, orden])
+    db_session.commit()
+
+    db_session.add(DetalleVentaOrden(
+        galletas_id=sample_lote.galleta_id, cantidad=120, subtotal=1200, orden_id=orden.id_orden))
+    db_session.commit()
+    return orden.id_orden, sample_lote.id_lote, lote_tarde.id_lote
+
+class TestCobrarPedido:
+    """Pruebas para el cobro de pedidos del portal"""
+
+    def test_reparte_por_caducidad(self, app, client, db_session, orden_portal, monkeypatch):
+        """Test: El pedido se toma primero del lote que caduca antes"""
+        from model.detalle_venta import DetalleVentaGalletas
+        from model.lote_galleta import LoteGalletas
+
+        monkeypatch.setitem(app.config, 'TICKETS_SINCRONOS', True)
+        id_orden, lote_pronto, lote_tarde = orden_portal
+
+        client.post(f'/venta/cobrar/{id_orden}')
+        db_session.expunge_all()
+
+        detalles = {d.lote_id: (d.cantidad, float(d.subtotal)) for d in DetalleVentaGalletas.query.all()}
+        assert detalles == {lote_pronto: (100, 1000.0), lote_tarde: (20, 200.0)}
+        assert db_session.get(LoteGalletas, lote_pronto).existencia == 0
+        assert db_session.get(LoteGalletas, lote_tarde).existencia == 30
+
+    def test_sin_existencia_no_cobra(self, client, db_session, orden_portal):
+        """Test: Si no alcanza la existencia no se registra la venta"""
+        from model.lote_galleta import LoteGalletas
+        from model.venta import Venta
+
+        id_orden, lote_pronto, lote_tarde = orden_portal
+        LoteGalletas.query.filter_by(id_lote=lote_tarde).update({LoteGalletas.existencia: 10})
+        db_session.commit()
+
+        client.post(f'/venta/cobrar/{id_orden}')
+        assert Venta.query.count() == 0